@@ -125,7 +125,7 @@ class App:
                             btn_openfolder = gr.Button('📂', scale=1)
 
                         params = [input_file, tb_input_folder, dd_file_format, cb_timestamp]
-                        btn_run.click(fn=self.whisper_inf.transcribe_file,
+                        btn_run.click(fn=self.whisper_inf.transcribe_file_stream,
                                       inputs=params + pipeline_params,
                                       outputs=[tb_indicator, files_subtitles])
                         btn_openfolder.click(fn=lambda: self.open_folder("outputs"), inputs=None, outputs=None)
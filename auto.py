@@ -102,7 +102,11 @@ class Auto:
             defaults.get("batch_size",24),
         ]
 
-        inputs += faster_whisper_inputs + insanely_fast_whisper_inputs
+        batched_inference_inputs = [
+            defaults.get("batched_inference",False),
+        ]
+
+        inputs += faster_whisper_inputs + insanely_fast_whisper_inputs + batched_inference_inputs
 
         return inputs
 
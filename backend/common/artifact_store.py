@@ -0,0 +1,88 @@
+import os
+import wave
+import hashlib
+import uuid
+from typing import Optional, Tuple
+import numpy as np
+
+from backend.db.artifact.dao import add_artifact_to_db, get_artifact_from_db, delete_artifacts_from_db
+from backend.common.cache_manager import get_cache_manager
+
+
+class HashingWriter:
+    """File wrapper that computes the hash of the content while it's written"""
+    def __init__(self, file):
+        self.file = file
+        self.hash_func = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.hash_func.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def hexdigest(self) -> str:
+        return self.hash_func.hexdigest()
+
+
+def save_wav_artifact(
+    audio: np.ndarray,
+    sample_rate: int,
+    output_dir: str,
+    owner: Optional[str] = None
+) -> Tuple[str, str]:
+    """
+    Save audio as a 16-bit PCM WAV file named by its content hash and add it to the artifact index.
+    The hash is computed while the file is written, so the file doesn't have to be read again.
+
+    Args:
+        audio (np.ndarray): Float audio with the shape of (samples,) or (samples, channels).
+        sample_rate (int): Sample rate of the audio.
+        output_dir (str): Directory to save the file.
+        owner (Optional[str]): Identifier of the task that generated the file.
+
+    Returns:
+        A Tuple of
+        str: SHA-256 hash of the file.
+        str: Path of the file.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    num_channels = 1 if audio.ndim == 1 else audio.shape[1]
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+
+    temp_path = os.path.join(output_dir, f".{uuid.uuid4().hex}.tmp")
+    with open(temp_path, "wb") as f:
+        writer = HashingWriter(f)
+        # The writer is not seekable, so the header must be written with the number of frames in advance.
+        with wave.open(writer, "wb") as wav:
+            wav.setnchannels(num_channels)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            wav.setnframes(pcm.shape[0])
+            wav.writeframes(np.ascontiguousarray(pcm).tobytes())
+
+    file_hash = writer.hexdigest()
+    file_path = os.path.join(output_dir, f"{file_hash}.wav")
+    os.replace(temp_path, file_path)
+    add_artifact_to_db(hash=file_hash, path=file_path, size=writer.size)
+    get_cache_manager().add(file_path, owner=owner)
+    return file_hash, file_path
+
+
+def get_artifact_path(file_hash: str) -> Optional[str]:
+    """
+    Get file path by its hash from the artifact index and mark it as recently used in the cache.
+    Returns None if the file doesn't exist anymore.
+    """
+    artifact = get_artifact_from_db(hash=file_hash)
+    if artifact is None:
+        return None
+    if not get_cache_manager().touch(artifact.path):
+        if not os.path.exists(artifact.path):
+            delete_artifacts_from_db(paths=[artifact.path])
+            return None
+        get_cache_manager().add(artifact.path)
+    return artifact.path
@@ -1,4 +1,6 @@
-from io import BytesIO
+import os
+import hashlib
+import tempfile
 import numpy as np
 import httpx
 import faster_whisper
@@ -7,30 +9,67 @@ from fastapi import (
     HTTPException,
     UploadFile,
 )
+from starlette.concurrency import run_in_threadpool
 from typing import Annotated, Any, BinaryIO, Literal, Generator, Union, Optional, List, Tuple
 
+# Size of the chunks to write uploaded files to the disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 
 class AudioInfo(BaseModel):
     duration: float
 
 
-async def read_audio(
+async def save_audio(
+    output_path: str,
     file: Optional[UploadFile] = None,
     file_url: Optional[str] = None
-):
-    """Read audio from "UploadFile". This resamples sampling rates to 16000."""
+) -> str:
+    """
+    Save audio from "UploadFile" or url to the `output_path` in chunks without reading the whole file into memory.
+    The blocking file I/O is run in the threadpool so that it doesn't block the event loop.
+    Returns the SHA-256 hash of the file content, which is computed while the file is written.
+    """
     if (file and file_url) or (not file and not file_url):
         raise HTTPException(status_code=400, detail="Provide only one of file or file_url")
 
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    hash_func = hashlib.sha256()
+
     if file:
-        file_content = await file.read()
+        def copy_upload():
+            file.file.seek(0)
+            with open(output_path, "wb") as f:
+                for chunk in iter(lambda: file.file.read(UPLOAD_CHUNK_SIZE), b""):
+                    hash_func.update(chunk)
+                    f.write(chunk)
+
+        await run_in_threadpool(copy_upload)
     elif file_url:
         async with httpx.AsyncClient() as client:
-            file_response = await client.get(file_url)
-        if file_response.status_code != 200:
-            raise HTTPException(status_code=422, detail="Could not download the file")
-        file_content = file_response.content
-    file_bytes = BytesIO(file_content)
-    audio = faster_whisper.audio.decode_audio(file_bytes)
+            async with client.stream("GET", file_url) as file_response:
+                if file_response.status_code != 200:
+                    raise HTTPException(status_code=422, detail="Could not download the file")
+                with open(output_path, "wb") as f:
+                    async for chunk in file_response.aiter_bytes(UPLOAD_CHUNK_SIZE):
+                        hash_func.update(chunk)
+                        await run_in_threadpool(f.write, chunk)
+    return hash_func.hexdigest()
+
+
+def decode_audio(file_path: str) -> Tuple[np.ndarray, AudioInfo]:
+    """Decode audio file. This resamples sampling rates to 16000. This is blocking, so run it in the worker."""
+    audio = faster_whisper.audio.decode_audio(file_path)
     duration = len(audio) / 16000
     return audio, AudioInfo(duration=duration)
+
+
+async def read_audio(
+    file: Optional[UploadFile] = None,
+    file_url: Optional[str] = None
+):
+    """Read audio from "UploadFile". This resamples sampling rates to 16000."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, "audio")
+        await save_audio(output_path=file_path, file=file, file_url=file_url)
+        return await run_in_threadpool(decode_audio, file_path)
@@ -1,21 +1,176 @@
-import time
+import functools
 import os
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterator, Optional, List, Tuple
+from pydantic import BaseModel, Field
 
 from modules.utils.paths import BACKEND_CACHE_DIR
+from modules.utils.logger import get_backend_logger
+from backend.common.config_loader import load_server_config
+from backend.db.artifact.dao import delete_artifacts_from_db
+
+PLACE_HOLDER_NAME = "cached_files_are_generated_here"
+
+logger = get_backend_logger()
+
+
+class CacheEntry(BaseModel):
+    path: str
+    size: int
+    last_access: float
+    owner: Optional[str] = None
+
+
+class CacheStats(BaseModel):
+    entries: int = Field(..., description="Number of the cached files")
+    size: int = Field(..., description="Total size of the cached files in bytes")
+    max_size: int = Field(..., description="Maximum total size of the cached files in bytes")
+    hits: int = Field(..., description="Number of the accesses to the cached files")
+    misses: int = Field(..., description="Number of the accesses to the files that are expired or not found")
+    evictions: int = Field(..., description="Number of the files removed by the TTL or the size limit")
+
+
+class CacheManager:
+    """
+    Manage the files in the `cache` directory with the TTL and the maximum total size.
+    Files are indexed in memory in the order of the last access, so the least recently used files are evicted first.
+    Files that are written by the other code paths without `add()`, e.g. the outputs of the pipeline, are indexed
+    when the directory is scanned by `clean()`.
+    """
+    def __init__(self,
+                 cache_dir: str = BACKEND_CACHE_DIR,
+                 ttl: int = 600,
+                 max_size: int = 10 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Index the existing files in the cache directory by their modified time"""
+        entries = [CacheEntry(path=path, size=stat.st_size, last_access=stat.st_mtime) for path, stat in self.walk()]
+        with self.lock:
+            for entry in sorted(entries, key=lambda e: e.last_access):
+                self._put(entry)
+        self.evict()
 
+    def clean(self) -> List[str]:
+        """
+        Index the files that are not indexed yet, then evict the files. The new files are indexed as if they were
+        accessed now, since they're written after the last scan. Returns the removed file paths.
+        """
+        now = time.time()
+        with self.lock:
+            indexed = set(self.entries)
+        entries = [CacheEntry(path=path, size=stat.st_size, last_access=now)
+                   for path, stat in self.walk() if path not in indexed]
+        with self.lock:
+            for entry in entries:
+                # Skip the files that are added while scanning
+                if entry.path not in self.entries:
+                    self._put(entry)
+        return self.evict()
 
-def cleanup_old_files(cache_dir: str = BACKEND_CACHE_DIR, ttl: int = 60):
-    now = time.time()
-    place_holder_name = "cached_files_are_generated_here"
-    for root, dirs, files in os.walk(cache_dir):
-        for filename in files:
-            if filename == place_holder_name:
-                continue
-            filepath = os.path.join(root, filename)
-            if now - os.path.getmtime(filepath) > ttl:
+    def walk(self) -> Iterator[Tuple[str, os.stat_result]]:
+        """Paths and stats of the files in the cache directory"""
+        for root, dirs, files in os.walk(self.cache_dir):
+            for filename in files:
+                # Skip the placeholder and the temporary files that are being written
+                if filename == PLACE_HOLDER_NAME or filename.startswith(".") or filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, filename)
                 try:
-                    os.remove(filepath)
-                except Exception as e:
-                    print(f"Error removing {filepath}")
-                    raise
+                    yield path, os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+    def add(self, path: str, owner: Optional[str] = None):
+        """Index the newly generated file. Least recently used files are evicted if the size limit is exceeded."""
+        entry = CacheEntry(path=path, size=os.path.getsize(path), last_access=time.time(), owner=owner)
+        with self.lock:
+            self._put(entry)
+        self.evict()
+
+    def touch(self, path: str) -> bool:
+        """Mark the file as recently used. Returns whether the file is in the cache."""
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None or not os.path.exists(path):
+                self.misses += 1
+                if entry is not None:
+                    self._pop(path)
+                return False
+            entry.last_access = time.time()
+            self.entries.move_to_end(path)
+            self.hits += 1
+            return True
+
+    def evict(self) -> List[str]:
+        """
+        Remove the files that are expired or exceed the size limit, and their entries in the artifact index.
+        Only the least recently used entries are checked, so it stops at the first entry that can be kept.
+        Returns the removed file paths.
+        """
+        now = time.time()
+        evicted = []
+        with self.lock:
+            while self.entries:
+                path, entry = next(iter(self.entries.items()))
+                if self.size <= self.max_size and now - entry.last_access <= self.ttl:
+                    break
+                self._pop(path)
+                evicted.append(path)
+            self.evictions += len(evicted)
+
+        removed_files = []
+        for path in evicted:
+            try:
+                os.remove(path)
+                removed_files.append(path)
+            except FileNotFoundError:
+                removed_files.append(path)
+            except Exception as e:
+                logger.error(f"Error removing {path}: {e}")
+
+        delete_artifacts_from_db(paths=removed_files)
+        return removed_files
+
+    def stats(self) -> CacheStats:
+        with self.lock:
+            return CacheStats(
+                entries=len(self.entries),
+                size=self.size,
+                max_size=self.max_size,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions
+            )
+
+    def _put(self, entry: CacheEntry):
+        if entry.path in self.entries:
+            self._pop(entry.path)
+        self.entries[entry.path] = entry
+        self.size += entry.size
+
+    def _pop(self, path: str):
+        entry = self.entries.pop(path)
+        self.size -= entry.size
+
+
+@functools.lru_cache
+def get_cache_manager() -> CacheManager:
+    config = load_server_config()["cache"]
+    cache_manager = CacheManager(
+        cache_dir=BACKEND_CACHE_DIR,
+        ttl=config["ttl"],
+        max_size=int(config.get("max_size_mb", 10240) * 1024 ** 2)
+    )
+    cache_manager.load()
+    return cache_manager
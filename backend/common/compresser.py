@@ -1,31 +1,162 @@
 import os
+import io
+import uuid
 import zipfile
-from typing import List, Optional
+from typing import List, Optional, Generator
 import hashlib
+import soundfile as sf
 
+# Size of the chunks to stream the archive
+ARCHIVE_CHUNK_SIZE = 1024 * 1024
+# Number of the frames of the audio that are transcoded into FLAC at once
+FLAC_BLOCK_SIZE = 256 * 1024
+# Offset of the 8 bytes in the FLAC header that end with the 36 bits of the total number of the samples
+FLAC_TOTAL_SAMPLES_OFFSET = 18
+FLAC_TOTAL_SAMPLES_BITS = 36
 
-def compress_files(file_paths: List[str], output_zip_path: str) -> str:
+
+class ChunkWriter:
+    """Unseekable file-like object that keeps written chunks to be streamed and writes them to the file"""
+    def __init__(self, file):
+        self.file = file
+        self.chunks = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def pop_chunks(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class FlacStreamWriter:
+    """
+    Unseekable file-like object to write FLAC with soundfile and take the encoded bytes as soon as they're written.
+    libsndfile seeks back at the end to rewrite the header with the stats of the stream, which is dropped here because
+    the header has been streamed already. Instead, the total number of the samples is set in the header beforehand,
+    and the other stats are left as unknown, which is allowed by the FLAC format.
+    """
+    def __init__(self, num_frames: int):
+        self.num_frames = num_frames
+        self.data = bytearray()
+        self.position = 0
+        self.size = 0
+        self.is_header_written = False
+
+    def write(self, data: bytes) -> int:
+        if self.position == self.size:
+            self.data += data
+            self.size += len(data)
+        self.position += len(data)
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = offset
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+    def pop_chunks(self) -> bytes:
+        if not self.is_header_written:
+            end = FLAC_TOTAL_SAMPLES_OFFSET + 8
+            if len(self.data) < end:
+                return b""
+            value = int.from_bytes(self.data[FLAC_TOTAL_SAMPLES_OFFSET:end], "big")
+            value = (value >> FLAC_TOTAL_SAMPLES_BITS << FLAC_TOTAL_SAMPLES_BITS) | self.num_frames
+            self.data[FLAC_TOTAL_SAMPLES_OFFSET:end] = value.to_bytes(8, "big")
+            self.is_header_written = True
+        data = bytes(self.data)
+        self.data.clear()
+        return data
+
+
+def compress_files(file_paths: List[str],
+                   output_zip_path: str,
+                   arc_names: Optional[List[str]] = None,
+                   audio_format: str = "wav") -> str:
     """
     Compress multiple files into a single zip file.
 
     Args:
     file_paths (List[str]): List of paths to files to be compressed.
     output_zip (str): Path and name of the output zip file.
+    arc_names (Optional[List[str]]): Names of the files in the archive. Defaults to the base names of the files.
+    audio_format (str): Format of the audio files in the archive between ["wav", "flac"].
 
     Raises:
     FileNotFoundError: If any of the input files doesn't exist.
     """
+    for _ in stream_compressed_files(file_paths, output_zip_path, arc_names, audio_format):
+        pass
+    return output_zip_path
+
+
+def stream_compressed_files(file_paths: List[str],
+                            output_zip_path: str,
+                            arc_names: Optional[List[str]] = None,
+                            audio_format: str = "wav") -> Generator[bytes, None, None]:
+    """
+    Yield the zip archive of the files while it's produced, and save it to `output_zip_path` for the next requests.
+    Files are STORED without compression because audio is hardly compressed by deflate.
+    Use `audio_format="flac"` to transcode audio files into FLAC instead, which is lossless and about half the size.
+
+    Raises:
+    FileNotFoundError: If any of the input files doesn't exist.
+    """
+    for file_path in file_paths:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+    if arc_names is None:
+        arc_names = [os.path.basename(file_path) for file_path in file_paths]
+
     os.makedirs(os.path.dirname(output_zip_path), exist_ok=True)
-    compression = zipfile.ZIP_DEFLATED
+    temp_zip_path = f"{output_zip_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_zip_path, "wb") as f:
+            writer = ChunkWriter(f)
+            with zipfile.ZipFile(writer, "w", compression=zipfile.ZIP_STORED) as zipf:
+                for file_path, arc_name in zip(file_paths, arc_names):
+                    with zipf.open(arc_name, "w", force_zip64=True) as dst:
+                        for chunk in iter_audio_chunks(file_path, audio_format):
+                            dst.write(chunk)
+                            yield writer.pop_chunks()
+            yield writer.pop_chunks()
+        os.replace(temp_zip_path, output_zip_path)
+    finally:
+        if os.path.exists(temp_zip_path):
+            os.remove(temp_zip_path)
 
-    with zipfile.ZipFile(output_zip_path, 'w', compression=compression) as zipf:
-        for file_path in file_paths:
-            if not os.path.exists(file_path):
-                raise FileNotFoundError(f"File not found: {file_path}")
 
-            file_name = os.path.basename(file_path)
-            zipf.write(file_path, file_name)
-    return output_zip_path
+def iter_audio_chunks(file_path: str, audio_format: str = "wav") -> Generator[bytes, None, None]:
+    """
+    Yield the audio file in chunks. It's transcoded into FLAC block by block if `audio_format` is "flac", so the whole
+    audio is never loaded in memory.
+    """
+    if audio_format != "flac" or file_path.endswith(".flac"):
+        with open(file_path, "rb") as f:
+            yield from iter(lambda: f.read(ARCHIVE_CHUNK_SIZE), b"")
+        return
+
+    with sf.SoundFile(file_path) as src:
+        writer = FlacStreamWriter(num_frames=src.frames)
+        with sf.SoundFile(writer, "w", samplerate=src.samplerate, channels=src.channels,
+                          subtype="PCM_16", format="FLAC") as dst:
+            for block in src.blocks(blocksize=FLAC_BLOCK_SIZE, dtype="int16"):
+                dst.write(block)
+                chunk = writer.pop_chunks()
+                if chunk:
+                    yield chunk
+        yield writer.pop_chunks()
 
 
 def get_file_hash(file_path: str) -> str:
@@ -0,0 +1,68 @@
+import functools
+import hashlib
+import json
+import threading
+from datetime import datetime
+from typing import Dict, List
+
+from backend.common.config_loader import load_server_config
+from backend.common.progress import get_progress_broker
+from backend.db.task.models import Task, TaskStatus
+from backend.db.task.dao import update_task_status_in_db
+
+
+class SingleFlight:
+    """
+    Coalesce the identical tasks in flight onto one computation.
+    The first task with the key becomes the leader, and the others wait as the followers until the leader is done.
+    Followers are kept in memory, so they're only coalesced within the same server process.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.followers: Dict[str, List[str]] = {}
+
+    def join(self, key: str, identifier: str) -> bool:
+        """Returns True if the task is the leader that has to run the computation."""
+        with self.lock:
+            if key not in self.followers:
+                self.followers[key] = []
+                return True
+            self.followers[key].append(identifier)
+            return False
+
+    def done(self, key: str) -> List[str]:
+        """Release the key and return the identifiers of the followers"""
+        with self.lock:
+            return self.followers.pop(key, [])
+
+
+@functools.lru_cache
+def get_single_flight() -> SingleFlight:
+    return SingleFlight()
+
+
+def is_deduplication_enabled() -> bool:
+    return load_server_config().get("deduplication", {}).get("enable", False)
+
+
+def get_content_hash(file_hash: str, params: dict) -> str:
+    """Get hash of the input file and the canonical form of the task parameters"""
+    canonical_params = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{file_hash}:{canonical_params}".encode("utf-8")).hexdigest()
+
+
+def clone_task_result(source: Task, identifier: str):
+    """Complete the task with the result of the identical source task"""
+    update_task_status_in_db(
+        identifier=identifier,
+        update_data={
+            "uuid": identifier,
+            "status": TaskStatus.COMPLETED,
+            "result": source.result,
+            "result_type": source.result_type,
+            "audio_duration": source.audio_duration,
+            "duration": source.duration,
+            "updated_at": datetime.utcnow()
+        }
+    )
+    get_progress_broker().publish_status(identifier, TaskStatus.COMPLETED)
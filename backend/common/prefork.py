@@ -0,0 +1,176 @@
+import gc
+import os
+import signal
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+from pydantic import BaseModel, Field
+
+# Index of the worker process, which is set in the forked workers
+WORKER_ID_ENV = "PREFORK_WORKER_ID"
+# Set in the workers that are forked again after they exited, while the other workers keep running
+WORKER_RESTARTED_ENV = "PREFORK_WORKER_RESTARTED"
+
+
+class MemoryUsage(BaseModel):
+    pid: int = Field(..., description="Process ID")
+    rss: int = Field(..., description="Resident set size in bytes, which counts the shared pages in full")
+    pss: int = Field(..., description="Proportional set size in bytes, which divides the shared pages by the sharers")
+    shared: int = Field(..., description="Resident pages shared with the other processes in bytes")
+
+
+class MemoryReport(BaseModel):
+    processes: List[MemoryUsage] = Field(default_factory=list, description="Memory usage of each process")
+    rss: int = Field(..., description="Sum of the RSS of the processes in bytes")
+    pss: int = Field(..., description="Sum of the PSS of the processes, which is the actual memory usage in bytes")
+    saved: int = Field(..., description="Bytes saved by sharing the pages, compared to separate processes")
+
+
+def get_memory_usage(pid: int) -> MemoryUsage:
+    """Get the memory usage of the process from `/proc/{pid}/smaps_rollup`, which is only available on Linux"""
+    usage = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                usage[key] = int(value.split()[0]) * 1024
+    return MemoryUsage(
+        pid=pid,
+        rss=usage.get("Rss", 0),
+        pss=usage.get("Pss", 0),
+        shared=usage.get("Shared_Clean", 0) + usage.get("Shared_Dirty", 0)
+    )
+
+
+def get_memory_report(pids: List[int]) -> MemoryReport:
+    processes = []
+    for pid in pids:
+        try:
+            processes.append(get_memory_usage(pid))
+        except (FileNotFoundError, ProcessLookupError):
+            # The process has exited
+            continue
+    rss = sum(process.rss for process in processes)
+    pss = sum(process.pss for process in processes)
+    return MemoryReport(processes=processes, rss=rss, pss=pss, saved=rss - pss)
+
+
+def is_primary_worker() -> bool:
+    """Whether this process is the first worker, or it's not a forked worker"""
+    return os.getenv(WORKER_ID_ENV, "0") == "0"
+
+
+def should_recover_tasks() -> bool:
+    """
+    Whether this process re-queues the unfinished tasks of the previous run, which is done once when the server
+    starts. A restarted worker doesn't, since the tasks in the db are run by the other workers that are still running.
+    """
+    return is_primary_worker() and os.getenv(WORKER_RESTARTED_ENV) is None
+
+
+class PreforkServer:
+    """
+    Load the models once in the parent process and fork the workers, which share the memory of the models
+    copy-on-write instead of loading their own copies. The weights are only read by the inference, so their pages
+    stay shared and the memory of N workers is close to the memory of one worker.
+    Only the models whose runtime works after `fork()` can be preloaded. CTranslate2 models can't, since the threads
+    of their workers are not copied to the forked processes.
+    Each worker has its own in-process state, e.g. the task queue, the progress broker and the coalescing of the
+    identical tasks, which is not shared with the other workers.
+    """
+    def __init__(self,
+                 worker: Callable[[int], Any],
+                 num_workers: int = 2):
+        """
+        Parameters
+        ----------
+        worker: Callable[[int], Any]
+            Function that runs in each forked process with the index of the worker, e.g. serving the app
+        num_workers: int
+            Number of the worker processes
+        """
+        self.worker = worker
+        self.num_workers = num_workers
+        self.workers: Dict[int, int] = {}
+        self.spawned: Set[int] = set()
+        self.stopping = False
+
+    def preload(self, loaders: Dict[str, Callable[[], Any]]):
+        """Load the models in the parent process before the workers are forked"""
+        for name, loader in loaders.items():
+            start_time = time.time()
+            loader()
+            print(f"Preloaded the {name} model in {time.time() - start_time:.2f}s")
+        # Objects of the parent are excluded from the garbage collection, which would otherwise write to their
+        # pages in the workers and copy them
+        gc.collect()
+        gc.freeze()
+
+    def start(self):
+        for index in range(self.num_workers):
+            self.spawn(index)
+
+    def spawn(self, index: int) -> int:
+        is_restarted = index in self.spawned
+        self.spawned.add(index)
+        pid = os.fork()
+        if pid == 0:
+            os.environ[WORKER_ID_ENV] = str(index)
+            if is_restarted:
+                os.environ[WORKER_RESTARTED_ENV] = "1"
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                self.worker(index)
+            except BaseException as e:
+                print(f"Worker {index} failed: {e}", file=sys.stderr)
+                exit_code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(exit_code)
+        self.workers[pid] = index
+        return pid
+
+    def supervise(self, report_interval: float = 0):
+        """
+        Wait for the workers and fork the workers again if they exit, until `stop()` is called.
+
+        Parameters
+        ----------
+        report_interval: float
+            Interval in seconds to print the memory report of the workers. 0 to disable.
+        """
+        last_report = time.time()
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid in self.workers:
+                index = self.workers.pop(pid)
+                if not self.stopping:
+                    print(f"Worker {index} exited with the status {status}, restarting it")
+                    self.spawn(index)
+                continue
+
+            if report_interval > 0 and time.time() - last_report >= report_interval:
+                last_report = time.time()
+                self.print_memory_report()
+            time.sleep(0.5)
+
+    def stop(self, sig: int = signal.SIGTERM):
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                self.workers.pop(pid, None)
+
+    def memory_report(self) -> MemoryReport:
+        """Memory usage of the parent and the workers"""
+        return get_memory_report([os.getpid()] + list(self.workers))
+
+    def print_memory_report(self):
+        report = self.memory_report()
+        mb = 1024 ** 2
+        print(f"Memory of {len(report.processes)} processes: RSS {report.rss / mb:.1f}MB, "
+              f"PSS {report.pss / mb:.1f}MB, saved {report.saved / mb:.1f}MB by sharing")
@@ -0,0 +1,139 @@
+import asyncio
+import functools
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Any
+
+import gradio as gr
+from pydantic import BaseModel
+
+from backend.common.config_loader import load_server_config
+from backend.db.task.models import TaskStatus
+from modules.whisper.data_classes import Segment
+
+TERMINAL_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED)
+# Seconds to send a comment to keep the idle event stream alive
+EVENTS_KEEPALIVE_INTERVAL = 15
+
+
+class TaskEvent(BaseModel):
+    """Event of the task that is sent to the clients of `/task/{identifier}/events`"""
+    event: str
+    data: Dict[str, Any]
+
+    def to_sse(self) -> str:
+        return f"event: {self.event}\ndata: {json.dumps(self.data, default=str)}\n\n"
+
+
+class ProgressChannel:
+    """Latest progress and partial segments of a running task, and the clients that listen to the task"""
+    def __init__(self):
+        self.progress: Optional[TaskEvent] = None
+        self.segments: List[TaskEvent] = []
+        self.subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+
+    def snapshot(self) -> List[TaskEvent]:
+        return ([self.progress] if self.progress is not None else []) + self.segments
+
+
+class ProgressBroker:
+    """
+    Hold the progress of the running tasks in memory and push it to the subscribers.
+    Progress is reported from the worker threads, and the subscribers are the asyncio queues of the SSE responses.
+    The progress is only shared within the same server process.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels: Dict[str, ProgressChannel] = {}
+
+    def publish(self, identifier: str, event: TaskEvent):
+        with self.lock:
+            channel = self.channels.setdefault(identifier, ProgressChannel())
+            if event.event == "progress":
+                channel.progress = event
+            elif event.event == "segment":
+                channel.segments.append(event)
+            elif event.event == "status" and event.data["status"] in TERMINAL_STATUSES:
+                self.channels.pop(identifier, None)
+            subscribers = list(channel.subscribers)
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The event loop of the subscriber is already closed
+                pass
+
+    def publish_status(self, identifier: str, status: TaskStatus, error: Optional[str] = None):
+        data = {"status": status}
+        if error is not None:
+            data["error"] = error
+        self.publish(identifier, TaskEvent(event="status", data=data))
+
+    def subscribe(self, identifier: str) -> Tuple[asyncio.Queue, List[TaskEvent]]:
+        """Subscribe to the task in the running event loop. Returns the queue and the events reported so far."""
+        queue = asyncio.Queue()
+        with self.lock:
+            channel = self.channels.setdefault(identifier, ProgressChannel())
+            channel.subscribers.append((asyncio.get_running_loop(), queue))
+            return queue, channel.snapshot()
+
+    def unsubscribe(self, identifier: str, queue: asyncio.Queue):
+        with self.lock:
+            channel = self.channels.get(identifier)
+            if channel is None:
+                return
+            channel.subscribers = [(loop, q) for loop, q in channel.subscribers if q is not queue]
+            if not channel.subscribers and not channel.snapshot():
+                self.channels.pop(identifier, None)
+
+
+@functools.lru_cache
+def get_progress_broker() -> ProgressBroker:
+    return ProgressBroker()
+
+
+class TaskProgress(gr.Progress):
+    """
+    Progress sink that can be passed to the pipelines in place of `gr.Progress()`.
+    The progress is throttled by `progress.interval` in `backend/configs/config.yaml`, except for the stage changes.
+    """
+    def __init__(self, identifier: str, interval: Optional[float] = None):
+        super().__init__()
+        self.identifier = identifier
+        if interval is None:
+            interval = load_server_config().get("progress", {}).get("interval", 0.5)
+        self.interval = interval
+        self.stage = None
+        self.last_reported = 0.0
+
+    def __call__(self,
+                 progress: Optional[float | Tuple[int, Optional[int]]],
+                 desc: Optional[str] = None,
+                 total: Optional[float] = None,
+                 unit: str = "steps",
+                 _tqdm=None):
+        if isinstance(progress, tuple):
+            index, length = progress
+            progress = index / length if length else None
+        elif progress is not None and total:
+            progress = progress / total
+
+        now = time.monotonic()
+        is_done = progress is not None and progress >= 1
+        if desc == self.stage and not is_done and now - self.last_reported < self.interval:
+            return
+        self.stage = desc
+        self.last_reported = now
+        get_progress_broker().publish(self.identifier, TaskEvent(
+            event="progress",
+            data={"stage": desc, "progress": None if progress is None else round(min(max(progress, 0.0), 1.0), 4)}
+        ))
+
+    def add_segment(self, segment: Segment):
+        """Report the transcribed segment, which is generated by `run_stream()` of the pipeline"""
+        get_progress_broker().publish(self.identifier, TaskEvent(
+            event="segment",
+            data=segment.model_dump(exclude_none=True)
+        ))
@@ -0,0 +1,300 @@
+import functools
+import os
+import queue
+import shutil
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from fastapi import UploadFile
+
+from modules.utils.paths import BACKEND_QUEUE_DIR
+from modules.utils.logger import get_backend_logger
+from backend.common.audio import AudioInfo, decode_audio, save_audio
+from backend.common.config_loader import load_server_config
+from backend.common.progress import get_progress_broker
+from backend.db.task.models import TaskStatus, TaskType
+from backend.db.task.dao import get_tasks_by_status_from_db, get_task_status_from_db, update_task_status_in_db
+
+logger = get_backend_logger()
+
+
+class TaskQueueFullError(Exception):
+    """Raised when the queue of the task type has no room for a new task"""
+    pass
+
+
+class TaskHandler(NamedTuple):
+    """
+    Function that runs the task and the params model to restore the task params from the db.
+    `load_input` turns the task input path into the `audio` of the function and its info, which is None if the
+    duration is not known before running the task.
+    `on_failure` is called with `identifier` and `params` after the task is marked as failed, whether it has failed
+    in `load_input` or in the function.
+    """
+    func: Callable
+    params_model: Type[BaseModel]
+    load_input: Callable[[str], Tuple[Any, Optional[AudioInfo]]] = decode_audio
+    on_failure: Optional[Callable] = None
+
+
+class WorkerPool:
+    """
+    Pool of worker threads that take tasks from a bounded queue.
+    Workers are spawned lazily on the first submitted task.
+    The work that doesn't go through the queue, like the live transcription, shares the slots of the workers with
+    `run()`, so the number of the concurrent runs of the task type doesn't exceed the number of the workers.
+    """
+    def __init__(self,
+                 task_type: TaskType,
+                 handler: TaskHandler,
+                 num_workers: int = 1,
+                 max_size: int = 100):
+        self.task_type = task_type
+        self.handler = handler
+        self.num_workers = max(1, num_workers)
+        self.queue = queue.Queue(maxsize=max_size)
+        self.workers: List[threading.Thread] = []
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(self.num_workers)
+
+    def submit(self, identifier: str, params: BaseModel):
+        self.start()
+        try:
+            self.queue.put_nowait((identifier, params))
+        except queue.Full:
+            raise TaskQueueFullError(f"The queue for \"{self.task_type}\" is full")
+
+    def start(self):
+        with self.lock:
+            if self.workers:
+                return
+            for i in range(self.num_workers):
+                worker = threading.Thread(
+                    target=self.work,
+                    name=f"{self.task_type}-worker-{i}",
+                    daemon=True
+                )
+                worker.start()
+                self.workers.append(worker)
+
+    def work(self):
+        while True:
+            identifier, params = self.queue.get()
+            try:
+                audio, info = self.handler.load_input(get_task_input_path(identifier))
+                if info is not None:
+                    update_task_status_in_db(
+                        identifier=identifier,
+                        update_data={
+                            "uuid": identifier,
+                            "audio_duration": info.duration
+                        }
+                    )
+                get_progress_broker().publish_status(identifier, TaskStatus.IN_PROGRESS)
+                with self.slots:
+                    self.handler.func(
+                        audio=audio,
+                        params=params,
+                        identifier=identifier
+                    )
+                task = get_task_status_from_db(identifier=identifier)
+                if task is not None:
+                    get_progress_broker().publish_status(identifier, task.status, task.error)
+            except Exception as e:
+                logger.exception(f"Task {identifier} has failed: {e}")
+                mark_task_failed(identifier, str(e))
+                self.fail(identifier=identifier, params=params)
+            finally:
+                remove_task_input(identifier)
+                self.queue.task_done()
+
+    def run(self, func: Callable, *args, blocking: bool = True) -> Any:
+        """
+        Run the function in the caller thread with a slot of the workers.
+        Raises `TaskQueueFullError` if `blocking` is False and all the slots are in use.
+        """
+        if not self.slots.acquire(blocking=blocking):
+            raise TaskQueueFullError(f"All the workers for \"{self.task_type}\" are busy")
+        try:
+            return func(*args)
+        finally:
+            self.slots.release()
+
+    def fail(self, identifier: str, params: BaseModel):
+        if self.handler.on_failure is None:
+            return
+        try:
+            self.handler.on_failure(identifier=identifier, params=params)
+        except Exception as e:
+            logger.exception(f"Failure handler of task {identifier} has failed: {e}")
+
+    def is_full(self) -> bool:
+        return self.queue.full()
+
+
+class TaskQueue:
+    """
+    Scheduler that runs the tasks with per task type worker pools instead of running every task at once.
+    The number of workers and the queue size can be configured in `backend/configs/config.yaml`.
+    """
+    def __init__(self,
+                 workers: Optional[Dict[str, int]] = None,
+                 max_size: int = 100):
+        self.workers = workers if workers is not None else {}
+        self.max_size = max_size
+        self.pools: Dict[TaskType, WorkerPool] = {}
+
+    def register(self,
+                 task_type: TaskType,
+                 func: Callable,
+                 params_model: Type[BaseModel],
+                 load_input: Callable[[str], Tuple[Any, Optional[AudioInfo]]] = decode_audio,
+                 on_failure: Optional[Callable] = None):
+        """
+        Register the function that runs the task type. The function must accept `audio`, `params`, `identifier`.
+        The task input is decoded into `audio` by default, or loaded by `load_input`.
+        `on_failure` is called with `identifier` and `params` when the task fails, including the failure of loading
+        the task input.
+        """
+        self.pools[task_type] = WorkerPool(
+            task_type=task_type,
+            handler=TaskHandler(func=func, params_model=params_model, load_input=load_input, on_failure=on_failure),
+            num_workers=self.workers.get(str(task_type), 1),
+            max_size=self.max_size
+        )
+
+    def submit(self,
+               task_type: TaskType,
+               identifier: str,
+               params: BaseModel):
+        """
+        Put the task into the queue of the task type. The task input must be saved in `get_task_input_path()` first,
+        it's decoded by the worker so that the endpoint doesn't wait for the decoding.
+        The task is marked as failed if the queue is full.
+        """
+        try:
+            self.pools[task_type].submit(identifier=identifier, params=params)
+        except TaskQueueFullError as e:
+            remove_task_input(identifier)
+            mark_task_failed(identifier, str(e))
+            raise
+
+    async def submit_upload(self,
+                            task_type: TaskType,
+                            identifier: str,
+                            params: BaseModel,
+                            file: UploadFile):
+        """Save the uploaded file as the task input and put the task into the queue of the task type."""
+        await self.save_upload(identifier=identifier, file=file)
+        self.submit(task_type=task_type, identifier=identifier, params=params)
+
+    @staticmethod
+    async def save_upload(identifier: str, file: UploadFile) -> str:
+        """Save the uploaded file as the task input. Returns the hash of the file."""
+        try:
+            return await save_audio(output_path=get_task_input_path(identifier), file=file)
+        except Exception as e:
+            remove_task_input(identifier)
+            mark_task_failed(identifier, str(e))
+            raise
+
+    @staticmethod
+    async def save_uploads(identifier: str, files: List[UploadFile]) -> List[str]:
+        """
+        Save the uploaded files as the task input, which is the directory of the files in the order of the uploads.
+        Returns the hashes of the files.
+        """
+        input_dir = get_task_input_path(identifier)
+        try:
+            return [
+                await save_audio(output_path=os.path.join(input_dir, f"{index:06d}"), file=file)
+                for index, file in enumerate(files)
+            ]
+        except Exception as e:
+            remove_task_input(identifier)
+            mark_task_failed(identifier, str(e))
+            raise
+
+    def run(self, task_type: TaskType, func: Callable, *args, blocking: bool = True) -> Any:
+        """Run the function outside of the queue, within the concurrency limit of the workers of the task type"""
+        return self.pools[task_type].run(func, *args, blocking=blocking)
+
+    def is_full(self, task_type: TaskType) -> bool:
+        return self.pools[task_type].is_full()
+
+    def recover(self):
+        """Put the queued or in-progress tasks from the previous run back into the queue"""
+        tasks = get_tasks_by_status_from_db(statuses=[TaskStatus.QUEUED, TaskStatus.IN_PROGRESS])
+        for task in tasks:
+            error = None
+            if task.task_type not in self.pools:
+                error = f"No worker is registered for the task type \"{task.task_type}\""
+            elif not os.path.exists(get_task_input_path(task.uuid)):
+                error = "Task input is lost while the server was restarted"
+
+            if error is None:
+                pool = self.pools[task.task_type]
+                params = pool.handler.params_model(**task.task_params)
+                try:
+                    pool.submit(identifier=task.uuid, params=params)
+                    update_task_status_in_db(
+                        identifier=task.uuid,
+                        update_data={
+                            "uuid": task.uuid,
+                            "status": TaskStatus.QUEUED,
+                            "updated_at": datetime.utcnow()
+                        }
+                    )
+                    continue
+                except TaskQueueFullError as e:
+                    error = str(e)
+
+            remove_task_input(task.uuid)
+            mark_task_failed(task.uuid, error)
+        if tasks:
+            logger.info(f"Recovered {len(tasks)} unfinished tasks from the db")
+
+
+@functools.lru_cache
+def get_task_queue() -> TaskQueue:
+    config = load_server_config().get("task_queue", {})
+    return TaskQueue(
+        workers=config.get("workers"),
+        max_size=config.get("max_size", 100)
+    )
+
+
+def mark_task_failed(identifier: str, error: str):
+    try:
+        update_task_status_in_db(
+            identifier=identifier,
+            update_data={
+                "uuid": identifier,
+                "status": TaskStatus.FAILED,
+                "error": error,
+                "updated_at": datetime.utcnow()
+            }
+        )
+    except Exception as e:
+        logger.error(f"Failed to mark task {identifier} as failed: {e}")
+    get_progress_broker().publish_status(identifier, TaskStatus.FAILED, error)
+
+
+def get_task_input_path(identifier: str) -> str:
+    """Uploaded file of the task is kept here until the task is done, so that it can be recovered after restarts"""
+    return os.path.join(BACKEND_QUEUE_DIR, identifier)
+
+
+def get_task_input_files(input_path: str) -> Tuple[List[str], None]:
+    """Files of the task input that is saved by `TaskQueue.save_uploads()`, to register as `load_input`"""
+    return [os.path.join(input_path, file_name) for file_name in sorted(os.listdir(input_path))], None
+
+
+def remove_task_input(identifier: str):
+    input_path = get_task_input_path(identifier)
+    if os.path.isdir(input_path):
+        shutil.rmtree(input_path, ignore_errors=True)
+    elif os.path.exists(input_path):
+        os.remove(input_path)
@@ -0,0 +1,89 @@
+import functools
+import threading
+import time
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+from pydantic import BaseModel, Field
+
+
+class ModelState(str, Enum):
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class ModelReadiness(BaseModel):
+    state: ModelState = Field(..., description="Whether the model is loading, ready or failed to load")
+    load_time: Optional[float] = Field(default=None, description="Seconds it took to load the model")
+    error: Optional[str] = Field(default=None, description="Error message if the model failed to load")
+
+
+class ReadinessResponse(BaseModel):
+    ready: bool = Field(..., description="Whether all the warmed up models are ready")
+    models: Dict[str, ModelReadiness] = Field(default_factory=dict, description="Readiness of each model")
+
+
+def cached_model(func: Callable[[], Any]) -> Callable[[], Any]:
+    """
+    `functools.lru_cache` for the getters of the models that is safe with the threads. The model that is being
+    loaded by the warmup thread is waited for instead of being loaded again by the request.
+    """
+    cached = functools.lru_cache(func)
+    lock = threading.RLock()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with lock:
+            return cached(*args, **kwargs)
+
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+
+class ModelWarmup:
+    """
+    Load the models in the background threads so that the server starts without waiting for them.
+    The requests that need a model that is still loading wait for it in the getter of the model.
+    """
+    def __init__(self):
+        self.models: Dict[str, ModelReadiness] = {}
+        self.threads: Dict[str, threading.Thread] = {}
+        self.lock = threading.Lock()
+
+    def start(self, name: str, loader: Callable[[], Any]) -> threading.Thread:
+        """Start loading the model with `loader` in the background thread"""
+        with self.lock:
+            self.models[name] = ModelReadiness(state=ModelState.LOADING)
+            thread = threading.Thread(target=self.load, args=(name, loader), name=f"warmup-{name}", daemon=True)
+            self.threads[name] = thread
+        thread.start()
+        return thread
+
+    def load(self, name: str, loader: Callable[[], Any]):
+        start_time = time.time()
+        try:
+            loader()
+            readiness = ModelReadiness(state=ModelState.READY, load_time=time.time() - start_time)
+        except Exception as e:
+            print(f"Failed to load the {name} model: {e}")
+            readiness = ModelReadiness(state=ModelState.FAILED, load_time=time.time() - start_time, error=str(e))
+        with self.lock:
+            self.models[name] = readiness
+
+    def wait(self, timeout: Optional[float] = None):
+        """Wait for all the models to be loaded"""
+        for thread in list(self.threads.values()):
+            thread.join(timeout)
+
+    def readiness(self) -> ReadinessResponse:
+        with self.lock:
+            models = dict(self.models)
+        return ReadinessResponse(
+            ready=all(model.state == ModelState.READY for model in models.values()),
+            models=models
+        )
+
+
+@functools.lru_cache
+def get_model_warmup() -> ModelWarmup:
+    return ModelWarmup()
@@ -0,0 +1,32 @@
+from typing import List, Optional
+from sqlalchemy.orm import Session
+
+from ..db_instance import handle_database_errors
+from .models import Artifact
+
+
+@handle_database_errors
+def add_artifact_to_db(
+    hash: str,
+    path: str,
+    size: Optional[int],
+    session: Session,
+):
+    """Add artifact to the db. The existing artifact with the same hash is replaced."""
+    session.merge(Artifact(hash=hash, path=path, size=size))
+    session.commit()
+
+
+@handle_database_errors
+def get_artifact_from_db(hash: str, session: Session) -> Optional[Artifact]:
+    """Retrieve artifact by its hash"""
+    return session.get(Artifact, hash)
+
+
+@handle_database_errors
+def delete_artifacts_from_db(paths: List[str], session: Session):
+    """Delete artifacts of the given file paths from db"""
+    if not paths:
+        return
+    session.query(Artifact).filter(Artifact.path.in_(paths)).delete(synchronize_session=False)
+    session.commit()
@@ -0,0 +1,34 @@
+from typing import Optional
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+
+class Artifact(SQLModel, table=True):
+    """
+    Table to index the files generated by the tasks by their content hash.
+
+    Attributes:
+    - hash: SHA-256 hash of the file content (Primary Key).
+    - path: Path of the file.
+    - size: Size of the file in bytes.
+    - created_at: Date and time of creation.
+    """
+
+    __tablename__ = "artifacts"
+
+    hash: str = Field(
+        primary_key=True,
+        description="SHA-256 hash of the file content (Primary Key)"
+    )
+    path: str = Field(
+        index=True,
+        description="Path of the file"
+    )
+    size: Optional[int] = Field(
+        default=None,
+        description="Size of the file in bytes"
+    )
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        description="Date and time of creation"
+    )
@@ -0,0 +1,109 @@
+"""
+Benchmark for the latency of polling the task status from the db with many rows.
+
+Usage:
+    python -m backend.db.benchmark --rows 1000000 --polls 1000
+
+It creates a temporary SQLite db with the same engine settings as the server, fills it with finished tasks,
+then measures the latency of the queries that the server runs for every poll with and without the indexes.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+from typing import Callable, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from backend.db.db_instance import create_db_engine
+from backend.db.task.models import Task, TaskStatus, TaskType
+
+INSERT_BATCH_SIZE = 10000
+
+
+def fill_tasks(engine, num_rows: int) -> List[str]:
+    """Insert finished tasks and a few queued tasks. Returns the uuids of the tasks"""
+    identifiers = []
+    created_at = datetime.utcnow() - timedelta(seconds=num_rows)
+    task_types = list(TaskType)
+    with engine.begin() as conn:
+        for start in range(0, num_rows, INSERT_BATCH_SIZE):
+            rows = []
+            for i in range(start, min(start + INSERT_BATCH_SIZE, num_rows)):
+                identifier = str(uuid4())
+                identifiers.append(identifier)
+                rows.append({
+                    "uuid": identifier,
+                    "status": TaskStatus.QUEUED.name if i % 1000 == 0 else TaskStatus.COMPLETED.name,
+                    "task_type": task_types[i % len(task_types)].name,
+                    "result": {},
+                    "task_params": {},
+                    "created_at": created_at + timedelta(seconds=i),
+                    "updated_at": created_at + timedelta(seconds=i),
+                })
+            conn.execute(Task.__table__.insert(), rows)
+    return identifiers
+
+
+def measure(func: Callable, repeat: int) -> List[float]:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name: str, latencies: List[float]):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:<32} median {statistics.median(latencies):9.3f} ms   p99 {p99:9.3f} ms")
+
+
+def run_queries(session_factory, identifiers: List[str], polls: int, label: str):
+    with session_factory() as session:
+        report(f"[{label}] poll by uuid", measure(
+            lambda: session.execute(select(Task).where(Task.uuid == random.choice(identifiers))).first(),
+            polls
+        ))
+        report(f"[{label}] unfinished tasks", measure(
+            lambda: session.execute(
+                select(Task).where(Task.status.in_([TaskStatus.QUEUED, TaskStatus.IN_PROGRESS]))
+                .order_by(Task.created_at)
+            ).all(),
+            max(1, polls // 100)
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark task status polling")
+    parser.add_argument("--rows", type=int, default=1000000, help="Number of tasks in the db")
+    parser.add_argument("--polls", type=int, default=1000, help="Number of polls to measure")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        engine = create_db_engine(f"sqlite:///{os.path.join(temp_dir, 'benchmark.db')}", config={})
+        SQLModel.metadata.create_all(engine)
+        session_factory = sessionmaker(bind=engine)
+
+        start = time.perf_counter()
+        identifiers = fill_tasks(engine, args.rows)
+        print(f"Inserted {args.rows} tasks in {time.perf_counter() - start:.1f} s")
+
+        run_queries(session_factory, identifiers, args.polls, "indexed")
+
+        with engine.begin() as conn:
+            for index in Task.__table__.indexes:
+                index.drop(conn)
+        run_queries(session_factory, identifiers, max(1, args.polls // 100), "no index")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
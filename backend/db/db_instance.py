@@ -1,24 +1,126 @@
 import functools
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.types import Enum as SQLAlchemyEnum
 from functools import wraps
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException
 from sqlmodel import SQLModel
 from dotenv import load_dotenv
 
-from backend.common.config_loader import read_env
+from backend.common.config_loader import read_env, load_server_config
+# Table models have to be imported to be created by `create_all()`
+from backend.db.task.models import Task
+from backend.db.artifact.models import Artifact
 
 
 @functools.lru_cache
 def init_db():
     db_url = read_env("DB_URL", "sqlite:///backend/records.db")
-    engine = create_engine(db_url, connect_args={"check_same_thread": False})
+    engine = create_db_engine(db_url)
     SQLModel.metadata.create_all(engine)
+    migrate_db(engine)
     return sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def create_db_engine(db_url: str, config: dict = None) -> Engine:
+    """
+    Create the engine with the settings in the `database` section of `backend/configs/config.yaml`.
+    SQLite is used with WAL so that the polling requests can read while the workers write,
+    other databases like Postgres or MySQL are used with the connection pool.
+    """
+    if config is None:
+        config = load_server_config().get("database", {})
+
+    url = make_url(db_url)
+    if url.get_backend_name() == "sqlite":
+        # `timeout` is how long the sqlite3 driver waits for the lock, in seconds
+        busy_timeout = config.get("sqlite_busy_timeout", 5000)
+        engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False, "timeout": busy_timeout / 1000}
+        )
+
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragma(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+            cursor.close()
+
+        return engine
+
+    return create_engine(
+        url,
+        pool_size=config.get("pool_size", 10),
+        max_overflow=config.get("max_overflow", 20),
+        pool_recycle=config.get("pool_recycle", 1800),
+        pool_pre_ping=True
+    )
+
+
+def migrate_db(engine):
+    """
+    Add the columns, indexes and enum values that are missing in the existing db.
+    `create_all()` only creates the tables that don't exist, so the db from the previous version needs this.
+    """
+    migrate_enums(engine)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def migrate_enums(engine):
+    """
+    Add the values that are missing in the native enum types, e.g. the new task types.
+    `create_all()` doesn't alter the existing types, so inserting the new values would fail on Postgres and MySQL.
+    SQLite stores the enums as strings, so it doesn't need this.
+    """
+    inspector = inspect(engine)
+    if engine.dialect.name == "postgresql":
+        existing_enums = {enum["name"]: set(enum["labels"]) for enum in inspector.get_enums()}
+        # `ALTER TYPE ... ADD VALUE` can't be run in a transaction block before Postgres 12
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for column in get_enum_columns():
+                missing_values = [value for value in column.type.enums
+                                  if value not in existing_enums.get(column.type.name, column.type.enums)]
+                for value in missing_values:
+                    conn.execute(text(f"ALTER TYPE {column.type.name} ADD VALUE IF NOT EXISTS '{value}'"))
+    elif engine.dialect.name == "mysql":
+        # The enum of MySQL is declared with the column, so the column is modified with all the values
+        with engine.begin() as conn:
+            for column in get_enum_columns():
+                if not inspector.has_table(column.table.name):
+                    continue
+                existing_columns = {c["name"]: c for c in inspector.get_columns(column.table.name)}
+                existing_values = getattr(existing_columns.get(column.name, {}).get("type"), "enums", None)
+                if existing_values is None or set(column.type.enums) <= set(existing_values):
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                nullable = "NULL" if column.nullable else "NOT NULL"
+                conn.execute(text(
+                    f"ALTER TABLE {column.table.name} MODIFY COLUMN {column.name} {column_type} {nullable}"
+                ))
+
+
+def get_enum_columns():
+    """Columns of the tables that are stored as the native enums"""
+    return [column for table in SQLModel.metadata.sorted_tables for column in table.columns
+            if isinstance(column.type, SQLAlchemyEnum) and column.type.native_enum]
+
+
 def get_db_session():
     db_instance = init_db()
     return db_instance()
@@ -1,9 +1,12 @@
-from typing import Dict, Any
+import base64
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 from fastapi import Depends
 
 from ..db_instance import handle_database_errors, get_db_session
-from .models import Task, TasksResult, TaskStatus
+from .models import Task, TasksResult, TaskStatus, TaskSummary, TaskType
 
 
 @handle_database_errors
@@ -71,12 +74,94 @@ def get_task_status_from_db(
 
 
 @handle_database_errors
-def get_all_tasks_status_from_db(session: Session):
-    """Get all tasks from db"""
-    columns = [Task.uuid, Task.status, Task.task_type]
+def get_completed_task_by_content_hash(content_hash: str, session: Session) -> Optional[Task]:
+    """Get the latest completed task that has the same input file and parameters"""
+    return (
+        session.query(Task)
+        .filter(Task.content_hash == content_hash, Task.status == TaskStatus.COMPLETED)
+        .order_by(Task.created_at.desc())
+        .first()
+    )
+
+
+@handle_database_errors
+def get_tasks_by_status_from_db(statuses: List[TaskStatus], session: Session) -> List[Task]:
+    """Get tasks that have one of the given statuses, oldest first"""
+    return session.query(Task).filter(Task.status.in_(statuses)).order_by(Task.created_at).all()
+
+
+@handle_database_errors
+def get_tasks_page_from_db(
+    session: Session,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    statuses: Optional[List[TaskStatus]] = None,
+    task_type: Optional[TaskType] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+) -> TasksResult:
+    """
+    Get a page of tasks from db, newest first.
+    Pages are paginated by the keyset of `(created_at, id)` instead of the offset, so the query only seeks
+    the index on `created_at` regardless of the page.
+
+    Raises:
+    ValueError: If the cursor is invalid.
+    """
+    columns = [Task.id, Task.uuid, Task.status, Task.task_type, Task.language, Task.audio_duration, Task.duration,
+               Task.created_at, Task.updated_at]
     query = session.query(*columns)
-    tasks = [task for task in query]
-    return TasksResult(tasks=tasks)
+
+    if statuses:
+        query = query.filter(Task.status.in_(statuses))
+    if task_type is not None:
+        query = query.filter(Task.task_type == task_type)
+    if created_after is not None:
+        query = query.filter(Task.created_at >= to_naive_utc(created_after))
+    if created_before is not None:
+        query = query.filter(Task.created_at < to_naive_utc(created_before))
+    if cursor is not None:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Task.created_at < cursor_created_at,
+            and_(Task.created_at == cursor_created_at, Task.id < cursor_id)
+        ))
+
+    rows = query.order_by(Task.created_at.desc(), Task.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    tasks = [
+        TaskSummary(
+            identifier=row.uuid,
+            status=row.status,
+            task_type=row.task_type,
+            language=row.language,
+            audio_duration=row.audio_duration,
+            duration=row.duration,
+            created_at=row.created_at,
+            updated_at=row.updated_at
+        )
+        for row in rows[:limit]
+    ]
+    return TasksResult(tasks=tasks, next_cursor=next_cursor)
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """Tasks are stored with the naive UTC datetime"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def encode_cursor(created_at: datetime, task_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{task_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, task_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(task_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
 
 
 @handle_database_errors
@@ -5,6 +5,7 @@ from pydantic import BaseModel
 from typing import Optional, List
 from uuid import uuid4
 from datetime import datetime
+from sqlalchemy import Index
 from sqlalchemy.types import Enum as SQLAlchemyEnum
 from typing import Any
 from sqlmodel import SQLModel, Field, JSON, Column
@@ -32,7 +33,9 @@ class TaskStatus(str, Enum):
 class TaskType(str, Enum):
     TRANSCRIPTION = "transcription"
     VAD = "vad"
+    VAD_BATCH = "vad_batch"
     BGM_SEPARATION = "bgm_separation"
+    LANGUAGE_DETECTION = "language_detection"
 
     def __str__(self):
         return self.value
@@ -82,11 +85,17 @@ class Task(SQLModel, table=True):
     - task_type: Type/category of the task.
     - duration: Duration of the task execution.
     - error: Error message, if any, associated with the task.
+    - content_hash: Hash of the input file and the task parameters to find the identical tasks.
     - created_at: Date and time of creation.
     - updated_at: Date and time of last update.
     """
 
     __tablename__ = "tasks"
+    # `status` and `task_type` are declared with `sa_column`, so their indexes are declared here
+    __table_args__ = (
+        Index("ix_tasks_status_created_at", "status", "created_at"),
+        Index("ix_tasks_task_type_created_at", "task_type", "created_at"),
+    )
 
     id: Optional[int] = Field(
         default=None,
@@ -95,6 +104,8 @@ class Task(SQLModel, table=True):
     )
     uuid: str = Field(
         default_factory=lambda: str(uuid4()),
+        unique=True,
+        index=True,
         description="Universally unique identifier for each task"
     )
     status: Optional[TaskStatus] = Field(
@@ -146,8 +157,14 @@ class Task(SQLModel, table=True):
         default=None,
         description="Error message, if any, associated with the task"
     )
+    content_hash: Optional[str] = Field(
+        default=None,
+        index=True,
+        description="Hash of the input file and the task parameters to find the identical tasks"
+    )
     created_at: datetime = Field(
         default_factory=datetime.utcnow,
+        index=True,
         description="Date and time of creation"
     )
     updated_at: datetime = Field(
@@ -169,6 +186,22 @@ class Task(SQLModel, table=True):
         )
 
 
+class TaskSummary(BaseModel):
+    """Lightweight row of the task list without the result and the parameters of the task"""
+    identifier: str = Field(..., description="Unique identifier for the task")
+    status: Optional[TaskStatus] = Field(default=None, description="Current status of the task")
+    task_type: Optional[TaskType] = Field(default=None, description="Type/category of the task")
+    language: Optional[str] = Field(default=None, description="Language of the file associated with the task")
+    audio_duration: Optional[float] = Field(default=None, description="Duration of the audio in seconds")
+    duration: Optional[float] = Field(default=None, description="Duration of the task execution")
+    created_at: datetime = Field(..., description="Date and time of creation")
+    updated_at: datetime = Field(..., description="Date and time of last update")
+
+
 class TasksResult(BaseModel):
-    tasks: List[Task]
+    tasks: List[TaskSummary] = Field(..., description="Tasks in the page, newest first")
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Cursor to retrieve the next page. It's null if this is the last page"
+    )
 
@@ -1,36 +1,53 @@
 from contextlib import asynccontextmanager
 from fastapi import (
     FastAPI,
+    HTTPException,
+    Response,
+    status,
 )
 from fastapi.responses import RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import time
 import threading
+from typing import Dict
 
 from backend.db.db_instance import init_db
-from backend.routers.transcription.router import transcription_router, get_pipeline
+from backend.routers.transcription.router import transcription_router, get_pipeline, get_stage_cache
 from backend.routers.vad.router import get_vad_model, vad_router
 from backend.routers.bgm_separation.router import get_bgm_separation_inferencer, bgm_separation_router
+from backend.routers.language.router import language_router
 from backend.routers.task.router import task_router
 from backend.common.config_loader import read_env, load_server_config
-from backend.common.cache_manager import cleanup_old_files
+from backend.common.cache_manager import get_cache_manager, CacheStats
+from backend.common.task_queue import get_task_queue
+from backend.common.warmup import get_model_warmup, ReadinessResponse
+from backend.common.prefork import should_recover_tasks
 from modules.utils.paths import SERVER_CONFIG_PATH, BACKEND_CACHE_DIR
+from modules.utils.stage_cache import StageCacheStats
 
 
-def clean_cache_thread(ttl: int, frequency: int) -> threading.Thread:
-    def clean_cache(_ttl: int, _frequency: int):
+def clean_cache_thread(frequency: int) -> threading.Thread:
+    def clean_cache(_frequency: int):
         while True:
-            cleanup_old_files(cache_dir=BACKEND_CACHE_DIR, ttl=_ttl)
+            get_cache_manager().clean()
             time.sleep(_frequency)
 
     return threading.Thread(
         target=clean_cache,
-        args=(ttl, frequency),
+        args=(frequency,),
         daemon=True
     )
 
 
+# Loaders of the models that can be warmed up when the server starts
+MODEL_LOADERS = {
+    "transcription": get_pipeline,
+    "vad": get_vad_model,
+    "bgm_separation": get_bgm_separation_inferencer,
+}
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Basic setup initialization
@@ -38,21 +55,23 @@ async def lifespan(app: FastAPI):
     read_env("DB_URL")  # Place .env file into /configs/.env
     init_db()
 
-    # Inferencer initialization
-    transcription_pipeline = get_pipeline()
-    vad_inferencer = get_vad_model()
-    bgm_separation_inferencer = get_bgm_separation_inferencer()
+    # Inferencer initialization in the background. Requests are accepted while the models are loading, see `/readyz`
+    warmup = get_model_warmup()
+    for name in server_config.get("warmup", {}).get("models", list(MODEL_LOADERS)):
+        if name not in MODEL_LOADERS:
+            raise ValueError(f"Unknown model to warm up: '{name}'. Use one of: {list(MODEL_LOADERS)}")
+        warmup.start(name, MODEL_LOADERS[name])
 
     # Thread initialization
-    cache_thread = clean_cache_thread(server_config["cache"]["ttl"], server_config["cache"]["frequency"])
+    cache_thread = clean_cache_thread(server_config["cache"]["frequency"])
     cache_thread.start()
 
-    yield
+    # Re-queue the unfinished tasks from the previous run. With the forked workers, only the first start of the first
+    # worker does it, so that the tasks of the running workers are not queued again when a worker is restarted.
+    if should_recover_tasks():
+        get_task_queue().recover()
 
-    # Release VRAM when server shutdown
-    transcription_pipeline = None
-    vad_inferencer = None
-    bgm_separation_inferencer = None
+    yield
 
 
 app = FastAPI(
@@ -66,7 +85,12 @@ app = FastAPI(
         {
             "name": "BGM Separation",
             "description": "Cached files for /bgm-separation are generated in the `backend/cache` directory,"
-                           " you can set TLL for these files in `backend/configs/config.yaml`."
+                           " you can set TLL and the maximum size for these files in `backend/configs/config.yaml`."
+        },
+        {
+            "name": "Health",
+            "description": "Probes for the liveness of the server and the readiness of the models that are loaded in"
+                           " the background when the server starts."
         }
     ]
 )
@@ -80,6 +104,7 @@ app.add_middleware(
 app.include_router(transcription_router)
 app.include_router(vad_router)
 app.include_router(bgm_separation_router)
+app.include_router(language_router)
 app.include_router(task_router)
 
 
@@ -90,3 +115,55 @@ async def index():
     You can also check the /redoc with redoc style: https://github.com/Redocly/redoc
     """
     return "/docs"
+
+
+@app.get(
+    "/cache/stats",
+    response_model=CacheStats,
+    tags=["Cache"],
+    summary="Retrieve Cache Statistics",
+    description="Retrieve the size and the hit/miss/eviction counters of the cached files in the `backend/cache` directory.",
+)
+async def get_cache_stats() -> CacheStats:
+    return get_cache_manager().stats()
+
+
+@app.get(
+    "/cache/stages",
+    response_model=StageCacheStats,
+    tags=["Cache"],
+    summary="Retrieve Stage Cache Statistics",
+    description="Retrieve the size and the hit rate of each stage of the cached UVR, VAD and diarization outputs "
+                "that are reused by `/transcription`.",
+)
+async def get_stage_cache_stats() -> StageCacheStats:
+    stage_cache = get_stage_cache()
+    if stage_cache is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stage cache is disabled in the config")
+    return stage_cache.stats()
+
+
+@app.get(
+    "/healthz",
+    tags=["Health"],
+    summary="Liveness Probe",
+    description="Returns 200 as long as the server is running, even while the models are loading.",
+)
+async def healthz() -> Dict[str, str]:
+    return {"status": "ok"}
+
+
+@app.get(
+    "/readyz",
+    response_model=ReadinessResponse,
+    responses={503: {"model": ReadinessResponse, "description": "Some models are still loading or failed to load"}},
+    tags=["Health"],
+    summary="Readiness Probe",
+    description="Retrieve the readiness of each model that is warmed up when the server starts. "
+                "Returns 503 until all of them are loaded.",
+)
+async def readyz(response: Response) -> ReadinessResponse:
+    readiness = get_model_warmup().readiness()
+    if not readiness.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return readiness
@@ -0,0 +1,68 @@
+"""
+Serve the backend with several worker processes that share the models preloaded by the parent process.
+
+    python -m backend.prefork --host 0.0.0.0 --port 8000 --workers 4
+"""
+import argparse
+import signal
+import socket
+import uvicorn
+
+from backend.main import app, MODEL_LOADERS
+from backend.common.config_loader import read_env, load_server_config
+from backend.db.db_instance import init_db
+from backend.common.prefork import PreforkServer
+
+# CTranslate2 models don't work after `fork()`, so the whisper model is loaded by each worker
+FORK_UNSAFE_MODELS = ["transcription"]
+
+
+def create_socket(host: str, port: int) -> socket.socket:
+    """Listening socket that is inherited by all the workers"""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', type=str, default="127.0.0.1", help='Host to bind')
+    parser.add_argument('--port', type=int, default=8000, help='Port to bind')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of the worker processes. Defaults to `prefork.workers` in the config')
+    parser.add_argument('--log_level', type=str, default="info", help='Log level of uvicorn')
+    args = parser.parse_args()
+
+    config = load_server_config().get("prefork", {})
+    preload = config.get("preload", ["vad", "bgm_separation"])
+    for name in preload:
+        if name in FORK_UNSAFE_MODELS:
+            raise ValueError(f"The {name} model can't be preloaded, it's loaded by each worker after the fork.")
+        if name not in MODEL_LOADERS:
+            raise ValueError(f"Unknown model to preload: '{name}'. Use one of: {list(MODEL_LOADERS)}")
+
+    # Tables are created once here instead of by all the workers at the same time. The connections are closed so
+    # that they're not shared with the workers.
+    read_env("DB_URL")
+    init_db().kw["bind"].dispose()
+
+    sock = create_socket(args.host, args.port)
+
+    def serve(index: int):
+        server = uvicorn.Server(uvicorn.Config(app, log_level=args.log_level))
+        server.run(sockets=[sock])
+
+    server = PreforkServer(worker=serve, num_workers=args.workers or config.get("workers", 2))
+    server.preload({name: MODEL_LOADERS[name] for name in preload})
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: server.stop())
+    server.start()
+    print(f"Serving on {args.host}:{args.port} with {server.num_workers} workers")
+    server.supervise(report_interval=config.get("report_interval", 60))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,10 @@
-import functools
 import numpy as np
 from fastapi import (
     File,
     UploadFile,
 )
 import gradio as gr
-from fastapi import APIRouter, BackgroundTasks, Depends, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.responses import FileResponse
 from typing import List, Dict, Tuple
 from datetime import datetime
@@ -14,10 +13,12 @@ import os
 from modules.whisper.data_classes import *
 from modules.uvr.music_separator import MusicSeparator
 from modules.utils.paths import BACKEND_CACHE_DIR
-from backend.common.audio import read_audio
 from backend.common.models import QueueResponse
 from backend.common.config_loader import load_server_config
-from backend.common.compresser import get_file_hash, find_file_by_hash
+from backend.common.progress import TaskProgress
+from backend.common.task_queue import get_task_queue, TaskQueueFullError
+from backend.common.warmup import cached_model
+from backend.common.artifact_store import save_wav_artifact
 from backend.db.task.models import TaskStatus, TaskType, ResultType
 from backend.db.task.dao import add_task_to_db, update_task_status_in_db
 from .models import BGMSeparationResult
@@ -26,7 +27,7 @@ from .models import BGMSeparationResult
 bgm_separation_router = APIRouter(prefix="/bgm-separation", tags=["BGM Separation"])
 
 
-@functools.lru_cache
+@cached_model
 def get_bgm_separation_inferencer() -> 'MusicSeparator':
     config = load_server_config()["bgm_separation"]
     inferencer = MusicSeparator(
@@ -54,15 +55,27 @@ def run_bgm_separation(
     )
 
     start_time = datetime.utcnow()
-    instrumental, vocal, filepaths = get_bgm_separation_inferencer().separate(
+    instrumental, vocal, _ = get_bgm_separation_inferencer().separate(
         audio=audio,
         model_name=params.uvr_model_size,
         device=params.uvr_device,
         segment_size=params.segment_size,
-        save_file=True,
-        progress=gr.Progress()
+        save_file=False,
+        progress=TaskProgress(identifier)
+    )
+    # Numpy audio input is separated in 16000 sample rate
+    instrumental_hash, _ = save_wav_artifact(
+        audio=instrumental,
+        sample_rate=16000,
+        output_dir=os.path.join(BACKEND_CACHE_DIR, "UVR", "instrumental"),
+        owner=identifier
+    )
+    vocal_hash, _ = save_wav_artifact(
+        audio=vocal,
+        sample_rate=16000,
+        output_dir=os.path.join(BACKEND_CACHE_DIR, "UVR", "vocals"),
+        owner=identifier
     )
-    instrumental_path, vocal_path = filepaths
     elapsed_time = (datetime.utcnow() - start_time).total_seconds()
 
     update_task_status_in_db(
@@ -71,8 +84,8 @@ def run_bgm_separation(
             "uuid": identifier,
             "status": TaskStatus.COMPLETED,
             "result": BGMSeparationResult(
-                instrumental_hash=get_file_hash(instrumental_path),
-                vocal_hash=get_file_hash(vocal_path)
+                instrumental_hash=instrumental_hash,
+                vocal_hash=vocal_hash
             ).model_dump(),
             "result_type": ResultType.FILEPATH,
             "updated_at": datetime.utcnow(),
@@ -82,6 +95,9 @@ def run_bgm_separation(
     return instrumental, vocal
 
 
+get_task_queue().register(TaskType.BGM_SEPARATION, run_bgm_separation, BGMSeparationParams)
+
+
 @bgm_separation_router.post(
     "/",
     response_model=QueueResponse,
@@ -90,29 +106,23 @@ def run_bgm_separation(
     description="Separate background music and vocal from an uploaded audio or video file.",
 )
 async def bgm_separation(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(..., description="Audio or video file to separate background music."),
     params: BGMSeparationParams = Depends()
 ) -> QueueResponse:
-    if not isinstance(file, np.ndarray):
-        audio, info = await read_audio(file=file)
-    else:
-        audio, info = file, None
+    if get_task_queue().is_full(TaskType.BGM_SEPARATION):
+        raise HTTPException(status_code=503, detail="BGM Separation queue is full, try again later")
 
     identifier = add_task_to_db(
         status=TaskStatus.QUEUED,
         file_name=file.filename,
-        audio_duration=info.duration if info else None,
         task_type=TaskType.BGM_SEPARATION,
         task_params=params.model_dump(),
     )
 
-    background_tasks.add_task(
-        run_bgm_separation,
-        audio=audio,
-        params=params,
-        identifier=identifier
-    )
+    try:
+        await get_task_queue().submit_upload(TaskType.BGM_SEPARATION, identifier=identifier, params=params, file=file)
+    except TaskQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
     return QueueResponse(identifier=identifier, status=TaskStatus.QUEUED, message="BGM Separation task has queued")
 
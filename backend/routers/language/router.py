@@ -0,0 +1,83 @@
+import numpy as np
+from fastapi import (
+    File,
+    UploadFile,
+)
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Dict
+from datetime import datetime
+
+from modules.whisper.language_detection import LanguageDetectionParams
+from backend.common.models import QueueResponse
+from backend.common.task_queue import get_task_queue, TaskQueueFullError
+from backend.db.task.dao import add_task_to_db, update_task_status_in_db
+from backend.db.task.models import TaskStatus, TaskType
+from backend.routers.transcription.router import get_language_detector
+
+language_router = APIRouter(prefix="/language", tags=["Language Detection"])
+
+
+def run_language_detection(
+    audio: np.ndarray,
+    params: LanguageDetectionParams,
+    identifier: str,
+) -> Dict:
+    update_task_status_in_db(
+        identifier=identifier,
+        update_data={
+            "uuid": identifier,
+            "status": TaskStatus.IN_PROGRESS,
+            "updated_at": datetime.utcnow()
+        }
+    )
+
+    start_time = datetime.utcnow()
+    result = get_language_detector().detect(audio=audio, duration=params.duration).model_dump()
+    elapsed_time = (datetime.utcnow() - start_time).total_seconds()
+
+    update_task_status_in_db(
+        identifier=identifier,
+        update_data={
+            "uuid": identifier,
+            "status": TaskStatus.COMPLETED,
+            "updated_at": datetime.utcnow(),
+            "language": result["language_name"],
+            "result": result,
+            "duration": elapsed_time
+        }
+    )
+
+    return result
+
+
+get_task_queue().register(TaskType.LANGUAGE_DETECTION, run_language_detection, LanguageDetectionParams)
+
+
+@language_router.post(
+    "/",
+    response_model=QueueResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Language Detection",
+    description="Detect the spoken language from the first seconds of the speech in the provided audio or video file.",
+)
+async def language_detection(
+    file: UploadFile = File(..., description="Audio or video file to detect the language."),
+    params: LanguageDetectionParams = Depends()
+) -> QueueResponse:
+    if get_task_queue().is_full(TaskType.LANGUAGE_DETECTION):
+        raise HTTPException(status_code=503, detail="Language detection queue is full, try again later")
+
+    identifier = add_task_to_db(
+        status=TaskStatus.QUEUED,
+        file_name=file.filename,
+        task_type=TaskType.LANGUAGE_DETECTION,
+        task_params=params.model_dump(),
+    )
+
+    try:
+        await get_task_queue().submit_upload(TaskType.LANGUAGE_DETECTION, identifier=identifier, params=params,
+                                             file=file)
+    except TaskQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return QueueResponse(identifier=identifier, status=TaskStatus.QUEUED, message="Language detection task has queued")
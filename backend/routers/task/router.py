@@ -1,29 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse, StreamingResponse, Response as HTTPResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+from datetime import datetime
+import asyncio
+import hashlib
 import os
 
 from backend.db.db_instance import get_db_session
 from backend.db.task.dao import (
     get_task_status_from_db,
-    get_all_tasks_status_from_db,
+    get_tasks_page_from_db,
     delete_task_from_db,
 )
 from backend.db.task.models import (
     TasksResult,
     Task,
     TaskStatusResponse,
+    TaskStatus,
     TaskType
 )
 from backend.common.models import (
     Response,
 )
-from backend.common.compresser import compress_files, find_file_by_hash
+from backend.common.compresser import compress_files, stream_compressed_files
+from backend.common.artifact_store import get_artifact_path
+from backend.common.cache_manager import get_cache_manager
+from backend.common.progress import get_progress_broker, TaskEvent, TERMINAL_STATUSES, EVENTS_KEEPALIVE_INTERVAL
 from modules.utils.paths import BACKEND_CACHE_DIR
 
 task_router = APIRouter(prefix="/task", tags=["Tasks"])
 
 
+@task_router.get(
+    "/all",
+    response_model=TasksResult,
+    status_code=status.HTTP_200_OK,
+    summary="Retrieve Task Statuses",
+    description="Retrieve the statuses of the tasks page by page, newest first. Pass `next_cursor` of the response"
+                " as `cursor` to retrieve the next page. The result and the parameters of the tasks are not included.",
+)
+async def get_all_tasks_status(
+    limit: int = Query(default=50, ge=1, le=500, description="Maximum number of tasks in the page"),
+    cursor: Optional[str] = Query(default=None, description="`next_cursor` of the previous page"),
+    task_status: Optional[List[TaskStatus]] = Query(default=None, alias="status",
+                                                    description="Filter by the statuses of the tasks"),
+    task_type: Optional[TaskType] = Query(default=None, description="Filter by the type of the tasks"),
+    created_after: Optional[datetime] = Query(default=None, description="Filter by the creation time (inclusive)"),
+    created_before: Optional[datetime] = Query(default=None, description="Filter by the creation time (exclusive)"),
+    session: Session = Depends(get_db_session),
+) -> TasksResult:
+    """
+    Retrieve the tasks with the keyset pagination.
+    """
+    try:
+        return get_tasks_page_from_db(
+            session=session,
+            limit=limit,
+            cursor=cursor,
+            statuses=task_status,
+            task_type=task_type,
+            created_after=created_after,
+            created_before=created_before
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @task_router.get(
     "/{identifier}",
     response_model=TaskStatusResponse,
@@ -46,6 +90,69 @@ async def get_task(
         raise HTTPException(status_code=404, detail="Identifier not found")
 
 
+@task_router.get(
+    "/{identifier}/events",
+    status_code=status.HTTP_200_OK,
+    summary="Stream Task Progress by Identifier",
+    description="Stream the progress of the task as Server-Sent Events instead of polling the task. Events are"
+                " \"status\", \"progress\" with the stage name and \"segment\" with the partially transcribed segment."
+                " The stream ends with the \"status\" event of the finished task.",
+)
+async def get_task_events(
+    identifier: str,
+    session: Session = Depends(get_db_session),
+) -> StreamingResponse:
+    """
+    Stream the progress of the specific task by its identifier.
+    The task is read from the db only on connect, the progress is pushed from the memory of the server.
+    """
+    broker = get_progress_broker()
+    queue, events = broker.subscribe(identifier)
+    task = get_task_status_from_db(identifier=identifier, session=session)
+    if task is None:
+        broker.unsubscribe(identifier, queue)
+        raise HTTPException(status_code=404, detail="Identifier not found")
+
+    async def event_stream():
+        try:
+            yield TaskEvent(event="status", data={"status": task.status, "error": task.error}).to_sse()
+            if task.status in TERMINAL_STATUSES:
+                return
+            for event in events:
+                yield event.to_sse()
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENTS_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    # Check the db in case the task has been finished without the event, e.g. by another process
+                    current_task = get_task_status_from_db(identifier=identifier)
+                    if current_task is None or current_task.status in TERMINAL_STATUSES:
+                        yield TaskEvent(event="status", data={
+                            "status": current_task.status if current_task else TaskStatus.CANCELLED,
+                            "error": current_task.error if current_task else None
+                        }).to_sse()
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield event.to_sse()
+                if event.event == "status" and event.data["status"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            broker.unsubscribe(identifier, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Disable the response buffering of nginx
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
 @task_router.get(
     "/file/{identifier}",
     status_code=status.HTTP_200_OK,
@@ -55,35 +162,69 @@ async def get_task(
 )
 async def get_file_task(
     identifier: str,
+    request: Request,
+    audio_format: Literal["wav", "flac"] = Query(
+        default="wav",
+        description="Format of the audio files in the archive. \"flac\" is lossless and about half the size."
+    ),
     session: Session = Depends(get_db_session),
-) -> FileResponse:
+) -> HTTPResponse:
     """
     Retrieve the downloadable file response of a specific task by its identifier.
-    Compressed by ZIP basically.
+    The archive is streamed while it's produced and cached for the next downloads, which support ETag and Range.
     """
     task = get_task_status_from_db(identifier=identifier, session=session)
 
     if task is not None:
         if task.task_type == TaskType.BGM_SEPARATION:
-            output_zip_path = os.path.join(BACKEND_CACHE_DIR, f"{identifier}_bgm_separation.zip")
-            instrumental_path = find_file_by_hash(
-                os.path.join(BACKEND_CACHE_DIR, "UVR", "instrumental"),
-                task.result["instrumental_hash"]
-            )
-            vocal_path = find_file_by_hash(
-                os.path.join(BACKEND_CACHE_DIR, "UVR", "vocals"),
-                task.result["vocal_hash"]
-            )
+            if task.status != TaskStatus.COMPLETED or not task.result:
+                raise HTTPException(status_code=409, detail=f"Task is {task.status.value}, the files are available"
+                                                            f" after the task is completed")
+            etag = '"' + hashlib.sha256(
+                f'{task.result["instrumental_hash"]}:{task.result["vocal_hash"]}:{audio_format}'.encode("utf-8")
+            ).hexdigest() + '"'
+            if request.headers.get("if-none-match") == etag:
+                return HTTPResponse(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+            output_zip_path = os.path.join(BACKEND_CACHE_DIR, f"{identifier}_bgm_separation_{audio_format}.zip")
+            output_zip_name = os.path.basename(output_zip_path)
+
+            if not get_cache_manager().touch(output_zip_path):
+                instrumental_path = get_artifact_path(task.result["instrumental_hash"])
+                vocal_path = get_artifact_path(task.result["vocal_hash"])
+                if instrumental_path is None or vocal_path is None:
+                    raise HTTPException(status_code=404, detail="Separated files are expired or not found")
+
+                compress_args = (
+                    [instrumental_path, vocal_path],
+                    output_zip_path,
+                    [f"instrumental.{audio_format}", f"vocals.{audio_format}"],
+                    audio_format
+                )
+                def stream_and_cache():
+                    yield from stream_compressed_files(*compress_args)
+                    get_cache_manager().add(output_zip_path, owner=identifier)
+
+                if request.headers.get("range") is None:
+                    return StreamingResponse(
+                        stream_and_cache(),
+                        status_code=200,
+                        media_type="application/zip",
+                        headers={
+                            "ETag": etag,
+                            "Content-Disposition": f'attachment; filename="{output_zip_name}"'
+                        }
+                    )
+                # Range requests need the complete archive
+                await run_in_threadpool(compress_files, *compress_args)
+                get_cache_manager().add(output_zip_path, owner=identifier)
 
-            output_zip_path = compress_files(
-                [instrumental_path, vocal_path],
-                output_zip_path
-            )
             return FileResponse(
                 path=output_zip_path,
                 status_code=200,
-                filename=output_zip_path,
-                media_type="application/zip"
+                filename=output_zip_name,
+                media_type="application/zip",
+                headers={"ETag": etag}
             )
         else:
             raise HTTPException(status_code=404, detail=f"File download is only supported for bgm separation."
@@ -110,21 +251,4 @@ async def delete_task(
     if delete_task_from_db(identifier, session):
         return Response(identifier=identifier, message="Task deleted")
     else:
-        raise HTTPException(status_code=404, detail="Task not found")
-
-
-# Get All method, commented by default because this endpoint is likely to require special permissions
-# @task_router.get(
-#     "/all",
-#     response_model=TasksResult,
-#     status_code=status.HTTP_200_OK,
-#     summary="Retrieve All Task Statuses",
-#     description="Retrieve the statuses of all tasks available in the system.",
-# )
-async def get_all_tasks_status(
-    session: Session = Depends(get_db_session),
-) -> TasksResult:
-    """
-    Retrieve all tasks.
-    """
-    return get_all_tasks_status_from_db(session=session)
\ No newline at end of file
+        raise HTTPException(status_code=404, detail="Task not found")
\ No newline at end of file
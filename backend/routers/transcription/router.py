@@ -1,4 +1,7 @@
+import asyncio
 import functools
+import json
+import time
 import uuid
 import numpy as np
 from fastapi import (
@@ -6,44 +9,152 @@ from fastapi import (
     UploadFile,
 )
 import gradio as gr
-from fastapi import APIRouter, BackgroundTasks, Depends, Response, status
-from typing import List, Dict
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
 from datetime import datetime
 from modules.whisper.data_classes import *
 from modules.utils.paths import BACKEND_CACHE_DIR
 from modules.whisper.faster_whisper_inference import FasterWhisperInference
-from backend.common.audio import read_audio
+from modules.whisper.dynamic_batcher import DynamicBatcher
+from modules.whisper.sharded_transcription import ShardedTranscriber
+from modules.whisper.live_transcription import LiveTranscriber, Utterance
+from modules.whisper.language_detection import LanguageDetector
+from modules.utils.stage_cache import StageCache
+from modules.utils.logger import get_backend_logger
 from backend.common.models import QueueResponse
 from backend.common.config_loader import load_server_config
+from backend.common.progress import TaskProgress, get_progress_broker, TERMINAL_STATUSES, EVENTS_KEEPALIVE_INTERVAL
+from backend.common.task_queue import get_task_queue, TaskQueueFullError, mark_task_failed, remove_task_input
+from backend.common.warmup import cached_model
+from backend.common.deduplication import (
+    get_single_flight,
+    get_content_hash,
+    is_deduplication_enabled,
+    clone_task_result
+)
 from backend.db.task.dao import (
     add_task_to_db,
     get_db_session,
+    get_task_status_from_db,
+    get_completed_task_by_content_hash,
     update_task_status_in_db
 )
 from backend.db.task.models import TaskStatus, TaskType
 
 transcription_router = APIRouter(prefix="/transcription", tags=["Transcription"])
+logger = get_backend_logger()
 
 
-@functools.lru_cache
+@cached_model
 def get_pipeline() -> 'FasterWhisperInference':
     config = load_server_config()["whisper"]
     inferencer = FasterWhisperInference(
         output_dir=BACKEND_CACHE_DIR
     )
+    if config.get("model_memory_budget_mb"):
+        inferencer.model_registry.max_memory = int(config["model_memory_budget_mb"] * 1024 ** 2)
     inferencer.update_model(
         model_size=config["model_size"],
         compute_type=config["compute_type"]
     )
+    batching_config = config.get("dynamic_batching", {})
+    if batching_config.get("enable", False):
+        inferencer.batcher = DynamicBatcher(
+            max_batch_size=batching_config.get("max_batch_size", 16),
+            max_wait_ms=batching_config.get("max_wait_ms", 20)
+        )
+    sharding_config = config.get("sharding", {})
+    if sharding_config.get("enable", False):
+        inferencer.sharder = ShardedTranscriber(
+            num_workers=sharding_config.get("num_workers"),
+            cpu_threads=sharding_config.get("cpu_threads"),
+            min_duration=sharding_config.get("min_duration", 600)
+        )
+    inferencer.stage_cache = get_stage_cache()
     return inferencer
 
 
+@functools.lru_cache
+def get_stage_cache() -> Optional[StageCache]:
+    """Cache of the UVR, VAD and diarization outputs of the pipeline, or None if it's disabled in the config"""
+    config = load_server_config()["whisper"].get("stage_cache", {})
+    if not config.get("enable", True):
+        return None
+    return StageCache(max_size=int(config.get("max_size_mb", 4096) * 1024 ** 2))
+
+
+@functools.lru_cache
+def get_language_detector() -> LanguageDetector:
+    config = load_server_config().get("language_routing", {})
+    if config.get("routes") and not is_model_routing_enabled():
+        logger.warning("language_routing.routes are ignored without whisper.model_memory_budget_mb, since only one"
+                       " model is kept loaded and it would be reloaded whenever the language changes")
+    return LanguageDetector(
+        pipeline=get_pipeline(),
+        model_size=config.get("detection_model", "tiny"),
+        duration=config.get("detection_duration", 30),
+        cache_size=config.get("cache_size", 1000)
+    )
+
+
+def is_model_routing_enabled() -> bool:
+    """Whether the models of `language_routing.routes` can be used, which needs the budget to keep several models"""
+    return get_pipeline().model_registry.max_memory is not None
+
+
+def route_language(
+    audio: np.ndarray,
+    params: TranscriptionPipelineParams,
+    identifier: str,
+    content_hash: Optional[str] = None,
+) -> TranscriptionPipelineParams:
+    """
+    Detect the language with the language detector if the language is not set, and pick the model for the language
+    from `language_routing.routes` in the config. The language is filled in so the main model doesn't detect it again.
+    The detection is cached by `content_hash`, so the identical task doesn't run the VAD for it again.
+    """
+    config = load_server_config().get("language_routing", {})
+    if not config.get("enable", False) or params.whisper.lang is not None:
+        return params
+
+    detection = get_language_detector().detect(audio, audio_key=content_hash)
+    params = params.model_copy(deep=True)
+    # The language name is converted to the code by the pipeline
+    params.whisper.lang = detection.language_name
+    route = (config.get("routes") or {}).get(detection.language)
+    if route and is_model_routing_enabled():
+        params.whisper.model_size = route
+    update_task_status_in_db(identifier=identifier, update_data={"language": detection.language_name})
+    return params
+
+
+@functools.lru_cache
+def get_live_executor() -> ThreadPoolExecutor:
+    """
+    Threads that wait for the utterances of all the live streams to be decoded. The decodes themselves take the slots
+    of the transcription workers of the task queue, so they run within its concurrency limit.
+    """
+    config = load_server_config().get("live_transcription", {})
+    return ThreadPoolExecutor(max_workers=config.get("max_workers", 4), thread_name_prefix="live-transcription")
+
+
 def run_transcription(
     audio: np.ndarray,
     params: TranscriptionPipelineParams,
     identifier: str,
 ) -> List[Segment]:
+    content_hash = get_task_status_from_db(identifier=identifier).content_hash
+    if content_hash and is_deduplication_enabled():
+        completed_task = get_completed_task_by_content_hash(content_hash=content_hash)
+        if completed_task is not None:
+            clone_task_result(source=completed_task, identifier=identifier)
+            complete_identical_tasks(content_hash=content_hash, identifier=identifier)
+            return completed_task.result
+
     update_task_status_in_db(
         identifier=identifier,
         update_data={
@@ -53,14 +164,21 @@ def run_transcription(
         },
     )
 
-    segments, elapsed_time = get_pipeline().run(
+    start_time = time.time()
+    progress = TaskProgress(identifier)
+    segments = []
+    pipeline_params = route_language(audio, params, identifier, content_hash)
+    # Segments are reported as soon as they are transcribed, for `/task/{identifier}/events` and `/stream`
+    for segment in get_pipeline().run_stream(
         audio,
-        gr.Progress(),
+        progress,
         "SRT",
         False,
-        *params.to_list()
-    )
-    segments = [seg.model_dump() for seg in segments]
+        *pipeline_params.to_list()
+    ):
+        progress.add_segment(segment)
+        segments.append(segment.model_dump())
+    elapsed_time = time.time() - start_time
 
     update_task_status_in_db(
         identifier=identifier,
@@ -72,9 +190,47 @@ def run_transcription(
             "duration": elapsed_time
         },
     )
+    complete_identical_tasks(content_hash=content_hash, identifier=identifier)
     return segments
 
 
+def complete_identical_tasks(content_hash: Optional[str], identifier: str):
+    """Complete the identical tasks that were coalesced onto the task with its result"""
+    followers = get_single_flight().done(content_hash)
+    if not followers:
+        return
+
+    task = get_task_status_from_db(identifier=identifier)
+    for follower in followers:
+        clone_task_result(source=task, identifier=follower)
+        remove_task_input(follower)
+
+
+def requeue_identical_tasks(identifier: str, params: TranscriptionPipelineParams):
+    """
+    Queue the identical tasks again with the first one as the new leader when the leader task has failed, either
+    in decoding its input or in the transcription, so that they don't wait for the leader forever.
+    """
+    task = get_task_status_from_db(identifier=identifier)
+    content_hash = task.content_hash if task is not None else None
+    followers = get_single_flight().done(content_hash)
+    if not followers:
+        return
+
+    for follower in followers:
+        get_single_flight().join(content_hash, follower)
+    try:
+        get_task_queue().submit(TaskType.TRANSCRIPTION, identifier=followers[0], params=params)
+    except TaskQueueFullError as e:
+        for follower in get_single_flight().done(content_hash):
+            remove_task_input(follower)
+            mark_task_failed(follower, str(e))
+
+
+get_task_queue().register(TaskType.TRANSCRIPTION, run_transcription, TranscriptionPipelineParams,
+                          on_failure=requeue_identical_tasks)
+
+
 @transcription_router.post(
     "/",
     response_model=QueueResponse,
@@ -83,41 +239,221 @@ def run_transcription(
     description="Process the provided audio or video file to generate a transcription.",
 )
 async def transcription(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(..., description="Audio or video file to transcribe."),
     whisper_params: WhisperParams = Depends(),
     vad_params: VadParams = Depends(),
     bgm_separation_params: BGMSeparationParams = Depends(),
     diarization_params: DiarizationParams = Depends(),
 ) -> QueueResponse:
-    if not isinstance(file, np.ndarray):
-        audio, info = await read_audio(file=file)
-    else:
-        audio, info = file, None
+    params = TranscriptionPipelineParams(
+        whisper=whisper_params,
+        vad=vad_params,
+        bgm_separation=bgm_separation_params,
+        diarization=diarization_params
+    )
+    return await queue_transcription(file=file, params=params)
+
 
+@transcription_router.post(
+    "/stream",
+    status_code=status.HTTP_200_OK,
+    summary="Transcribe Audio with Streaming Response",
+    description="Queue the transcription like `/transcription/` and stream the segments as newline-delimited JSON"
+                " as soon as they are transcribed, with the timestamps of the original audio. The identifier of the"
+                " task is in the \"X-Task-Identifier\" header. If the task fails, the last line is the object with"
+                " \"error\". With the diarization enabled, the segments are streamed only after the diarization.",
+)
+async def transcription_stream(
+    file: UploadFile = File(..., description="Audio or video file to transcribe."),
+    whisper_params: WhisperParams = Depends(),
+    vad_params: VadParams = Depends(),
+    bgm_separation_params: BGMSeparationParams = Depends(),
+    diarization_params: DiarizationParams = Depends(),
+) -> StreamingResponse:
     params = TranscriptionPipelineParams(
         whisper=whisper_params,
         vad=vad_params,
         bgm_separation=bgm_separation_params,
         diarization=diarization_params
     )
+    queue_response = await queue_transcription(file=file, params=params)
+    identifier = queue_response.identifier
+
+    broker = get_progress_broker()
+    queue, events = broker.subscribe(identifier)
+
+    async def segment_stream():
+        num_sent = 0
+        try:
+            task = get_task_status_from_db(identifier=identifier)
+            if task is not None and task.status not in TERMINAL_STATUSES:
+                for event in events:
+                    if event.event == "segment":
+                        num_sent += 1
+                        yield json.dumps(event.data) + "\n"
+
+                while True:
+                    try:
+                        event = await asyncio.wait_for(queue.get(), timeout=EVENTS_KEEPALIVE_INTERVAL)
+                    except asyncio.TimeoutError:
+                        # Check the db in case the task has been finished without the event
+                        task = get_task_status_from_db(identifier=identifier)
+                        if task is None or task.status in TERMINAL_STATUSES:
+                            break
+                        continue
+
+                    if event.event == "segment":
+                        num_sent += 1
+                        yield json.dumps(event.data) + "\n"
+                    elif event.event == "status" and event.data["status"] in TERMINAL_STATUSES:
+                        break
+                task = get_task_status_from_db(identifier=identifier)
+
+            if task is None:
+                yield json.dumps({"error": "Task is cancelled"}) + "\n"
+            elif task.status == TaskStatus.COMPLETED:
+                # Segments that were not pushed, e.g. the result reused from the identical task
+                for segment in (task.result or [])[num_sent:]:
+                    yield Segment(**segment).model_dump_json(exclude_none=True) + "\n"
+            else:
+                yield json.dumps({"error": task.error or f"Task is {task.status.value}"}) + "\n"
+        finally:
+            broker.unsubscribe(identifier, queue)
+
+    return StreamingResponse(
+        segment_stream(),
+        media_type="application/x-ndjson",
+        headers={
+            "X-Task-Identifier": identifier,
+            "Cache-Control": "no-cache",
+            # Disable the response buffering of nginx
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+async def queue_transcription(
+    file: UploadFile,
+    params: TranscriptionPipelineParams,
+) -> QueueResponse:
+    """Add the transcription task to the db and the task queue, or reuse the result of the identical task"""
+    if get_task_queue().is_full(TaskType.TRANSCRIPTION):
+        raise HTTPException(status_code=503, detail="Transcription queue is full, try again later")
 
     identifier = add_task_to_db(
         status=TaskStatus.QUEUED,
         file_name=file.filename,
-        audio_duration=info.duration if info else None,
         language=params.whisper.lang,
         task_type=TaskType.TRANSCRIPTION,
         task_params=params.to_dict(),
     )
 
-    background_tasks.add_task(
-        run_transcription,
-        audio=audio,
-        params=params,
-        identifier=identifier,
-    )
+    file_hash = await get_task_queue().save_upload(identifier=identifier, file=file)
+    content_hash = get_content_hash(file_hash, params.to_dict())
+    update_task_status_in_db(identifier=identifier, update_data={"content_hash": content_hash})
+
+    if is_deduplication_enabled():
+        completed_task = get_completed_task_by_content_hash(content_hash=content_hash)
+        if completed_task is not None:
+            remove_task_input(identifier)
+            clone_task_result(source=completed_task, identifier=identifier)
+            return QueueResponse(identifier=identifier, status=TaskStatus.COMPLETED,
+                                 message="Transcription result is reused from the identical task")
+
+        if not get_single_flight().join(content_hash, identifier):
+            return QueueResponse(identifier=identifier, status=TaskStatus.QUEUED,
+                                 message="Transcription task has queued with the identical task in progress")
+
+    try:
+        get_task_queue().submit(TaskType.TRANSCRIPTION, identifier=identifier, params=params)
+    except TaskQueueFullError as e:
+        for follower in get_single_flight().done(content_hash):
+            remove_task_input(follower)
+            mark_task_failed(follower, str(e))
+        raise HTTPException(status_code=503, detail=str(e))
 
     return QueueResponse(identifier=identifier, status=TaskStatus.QUEUED, message="Transcription task has queued")
 
 
+@transcription_router.websocket("/stream")
+async def transcription_live(
+    websocket: WebSocket,
+    lang: Optional[str] = Query(default=None, description="Language code of the speech. Detected if it's not set."),
+    is_translate: bool = Query(default=False, description="Translate the speech to English"),
+    beam_size: int = Query(default=5, ge=1, description="Beam size to decode the final segments"),
+):
+    """
+    Transcribe the live audio. Send the audio as the binary messages of 16-bit little-endian mono PCM with the
+    sampling rate of 16000, and the text message "end" to finish the stream.
+    The server sends {"type": "partial", "segment": ...} with the hypothesis of the speech in progress, and
+    {"type": "final", "segment": ...} for each segment of the completed utterances. {"type": "end"} is sent after
+    the last final segment.
+    """
+    await websocket.accept()
+    config = load_server_config().get("live_transcription", {})
+    loop = asyncio.get_running_loop()
+    executor = get_live_executor()
+    transcriber = LiveTranscriber(
+        pipeline=get_pipeline(),
+        lang=lang,
+        is_translate=is_translate,
+        beam_size=beam_size,
+        partial_interval=config.get("partial_interval", 1.0)
+    )
+
+    def decode(utterance: Utterance) -> List[Segment]:
+        # Partial hypotheses are skipped instead of waiting for the workers that are busy
+        return get_task_queue().run(TaskType.TRANSCRIPTION, transcriber.decode, utterance,
+                                    blocking=utterance.is_final)
+
+    async def send_partial(utterance: Utterance):
+        try:
+            segments = await loop.run_in_executor(executor, decode, utterance)
+        except TaskQueueFullError:
+            return
+        # Skip the hypothesis if the utterance has been completed while decoding
+        if segments and utterance.index == transcriber.num_utterances:
+            await websocket.send_json({"type": "partial", "segment": Segment(
+                text="".join(segment.text for segment in segments),
+                start=segments[0].start,
+                end=segments[-1].end
+            ).model_dump(exclude_none=True)})
+
+    partial_task: Optional[asyncio.Task] = None
+    pending_bytes = b""
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            is_end = message.get("text") == "end"
+            if is_end:
+                utterances = await run_in_threadpool(transcriber.flush)
+            elif message.get("bytes"):
+                data = pending_bytes + message["bytes"]
+                # Keep the odd byte for the next message
+                data, pending_bytes = data[:len(data) // 2 * 2], data[len(data) // 2 * 2:]
+                audio = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+                utterances = await run_in_threadpool(transcriber.feed, audio)
+            else:
+                continue
+
+            for utterance in utterances:
+                if utterance.is_final:
+                    segments = await loop.run_in_executor(executor, decode, utterance)
+                    for segment in segments:
+                        await websocket.send_json({"type": "final", "segment": segment.model_dump(exclude_none=True)})
+                elif partial_task is None or partial_task.done():
+                    # Partial hypotheses are skipped while the previous one is decoding to bound the latency
+                    partial_task = asyncio.create_task(send_partial(utterance))
+
+            if is_end:
+                await websocket.send_json({"type": "end"})
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if partial_task is not None:
+            partial_task.cancel()
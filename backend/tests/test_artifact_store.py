@@ -0,0 +1,83 @@
+import os
+import time
+import numpy as np
+import soundfile as sf
+
+from modules.utils.paths import BACKEND_CACHE_DIR
+from backend.common.artifact_store import save_wav_artifact, get_artifact_path
+from backend.common.cache_manager import CacheManager, get_cache_manager
+from backend.common.compresser import get_file_hash
+
+TEST_ARTIFACT_DIR = os.path.join(BACKEND_CACHE_DIR, "test_artifacts")
+
+
+def test_save_wav_artifact():
+    audio = np.random.uniform(-1, 1, size=(16000, 2)).astype(np.float32)
+
+    file_hash, file_path = save_wav_artifact(audio=audio, sample_rate=16000, output_dir=TEST_ARTIFACT_DIR)
+
+    assert file_hash == get_file_hash(file_path)
+    assert get_artifact_path(file_hash) == file_path
+
+    saved_audio, sample_rate = sf.read(file_path)
+    assert sample_rate == 16000
+    assert saved_audio.shape == audio.shape
+    assert np.allclose(saved_audio, audio, atol=1e-3)
+
+    get_cache_manager().entries[file_path].last_access = time.time() - get_cache_manager().ttl - 1
+    removed_files = get_cache_manager().evict()
+
+    assert file_path in removed_files
+    assert not os.path.exists(file_path)
+    assert get_artifact_path(file_hash) is None
+
+
+def test_cache_manager_evicts_least_recently_used(tmp_path):
+    cache_manager = CacheManager(cache_dir=str(tmp_path), ttl=600, max_size=2500)
+    file_paths = []
+    for i in range(3):
+        file_path = os.path.join(tmp_path, f"{i}.bin")
+        with open(file_path, "wb") as f:
+            f.write(os.urandom(1000))
+        file_paths.append(file_path)
+
+    cache_manager.add(file_paths[0])
+    cache_manager.add(file_paths[1])
+    assert cache_manager.touch(file_paths[0])
+    cache_manager.add(file_paths[2])
+
+    assert not os.path.exists(file_paths[1])
+    assert not cache_manager.touch(file_paths[1])
+    assert cache_manager.stats().model_dump() == {
+        "entries": 2,
+        "size": 2000,
+        "max_size": 2500,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 1
+    }
+
+    # Files from the previous run are indexed again by their modified time
+    os.utime(file_paths[2], (time.time() - 1000, time.time() - 1000))
+    reloaded_cache_manager = CacheManager(cache_dir=str(tmp_path), ttl=600, max_size=2500)
+    reloaded_cache_manager.load()
+    assert list(reloaded_cache_manager.entries) == [file_paths[0]]
+    assert not os.path.exists(file_paths[2])
+
+
+def test_cache_manager_cleans_files_written_without_add(tmp_path):
+    cache_manager = CacheManager(cache_dir=str(tmp_path), ttl=600, max_size=2500)
+    cache_manager.load()
+
+    # Outputs of the pipeline are written into the cache directory without `add()`
+    os.makedirs(os.path.join(tmp_path, "UVR"))
+    file_path = os.path.join(tmp_path, "UVR", "vocals.wav")
+    with open(file_path, "wb") as f:
+        f.write(os.urandom(1000))
+    assert cache_manager.clean() == []
+    assert list(cache_manager.entries) == [file_path]
+
+    cache_manager.entries[file_path].last_access = time.time() - cache_manager.ttl - 1
+    assert cache_manager.clean() == [file_path]
+    assert not os.path.exists(file_path)
+    assert not cache_manager.entries
@@ -0,0 +1,39 @@
+import pytest
+from fastapi import UploadFile
+from io import BytesIO
+
+from backend.db.task.models import TaskStatus
+from backend.tests.test_task_status import wait_for_task_completion
+from backend.tests.test_backend_config import (
+    get_client, setup_test_file, get_upload_file_instance
+)
+
+
+def test_language_detection_endpoint(
+    get_upload_file_instance,
+):
+    client = get_client()
+    file_content = BytesIO(get_upload_file_instance.file.read())
+    get_upload_file_instance.file.seek(0)
+
+    response = client.post(
+        "/language",
+        files={"file": (get_upload_file_instance.filename, file_content, "audio/mpeg")},
+        params={"duration": 10}
+    )
+
+    assert response.status_code == 201
+    assert response.json()["status"] == TaskStatus.QUEUED
+    task_identifier = response.json()["identifier"]
+
+    completed_task = wait_for_task_completion(
+        identifier=task_identifier
+    )
+
+    assert completed_task is not None, f"Task with identifier {task_identifier} did not complete within the " \
+                                       f"expected time."
+
+    result = completed_task.json()["result"]
+    assert result["language"] == "en"
+    assert result["language_name"] == "english"
+    assert 0 < result["probability"] <= 1
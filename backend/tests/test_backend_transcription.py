@@ -1,12 +1,20 @@
+import os
+import json
+import numpy as np
 import pytest
+import faster_whisper
 from fastapi import UploadFile
 from io import BytesIO
 
-from backend.db.task.models import TaskStatus
+from backend.db.task.models import TaskStatus, TaskType
+from backend.db.task.dao import add_task_to_db, get_task_status_from_db, update_task_status_in_db
+from modules.whisper.data_classes import TranscriptionPipelineParams
+from backend.common.task_queue import get_task_queue, get_task_input_path
+from backend.common.deduplication import get_single_flight
 from backend.tests.test_task_status import wait_for_task_completion
 from backend.tests.test_backend_config import (
     get_client, setup_test_file, get_upload_file_instance, calculate_wer,
-    TEST_PIPELINE_PARAMS, TEST_ANSWER
+    TEST_PIPELINE_PARAMS, TEST_ANSWER, TEST_FILE_PATH
 )
 
 
@@ -31,7 +39,8 @@ def test_transcription_endpoint(
     )
 
     assert response.status_code == 201
-    assert response.json()["status"] == TaskStatus.QUEUED
+    # The result can be reused immediately if the identical task has been completed before
+    assert response.json()["status"] in (TaskStatus.QUEUED, TaskStatus.COMPLETED)
     task_identifier = response.json()["identifier"]
     assert isinstance(task_identifier, str) and task_identifier
 
@@ -48,3 +57,119 @@ def test_transcription_endpoint(
     wer = calculate_wer(TEST_ANSWER, result[0]["text"].strip().replace(",", "").replace(".", ""))
     assert wer < 0.1, f"WER is too high, it's {wer}"
 
+
+@pytest.mark.parametrize(
+    "pipeline_params",
+    [
+        TEST_PIPELINE_PARAMS
+    ]
+)
+def test_transcription_deduplication(
+    get_upload_file_instance,
+    pipeline_params: dict
+):
+    client = get_client()
+    file_content = get_upload_file_instance.file.read()
+    get_upload_file_instance.file.seek(0)
+
+    identifiers = []
+    for _ in range(2):
+        response = client.post(
+            "/transcription",
+            files={"file": (get_upload_file_instance.filename, BytesIO(file_content), "audio/mpeg")},
+            params=pipeline_params
+        )
+        assert response.status_code == 201
+        identifiers.append(response.json()["identifier"])
+
+    assert identifiers[0] != identifiers[1]
+
+    results = []
+    for identifier in identifiers:
+        completed_task = wait_for_task_completion(identifier=identifier)
+        assert completed_task is not None, f"Task with identifier {identifier} did not complete within the " \
+                                           f"expected time."
+        results.append(completed_task.json()["result"])
+
+    assert results[0] == results[1]
+
+
+def test_transcription_deduplication_with_undecodable_input():
+    # Make sure that the router registers the transcription task
+    get_client()
+    params = TranscriptionPipelineParams()
+    content_hash = "undecodable-input"
+    identifiers = [
+        add_task_to_db(status=TaskStatus.QUEUED, task_type=TaskType.TRANSCRIPTION, task_params=params.to_dict())
+        for _ in range(3)
+    ]
+    for identifier in identifiers:
+        update_task_status_in_db(identifier=identifier, update_data={"content_hash": content_hash})
+        with open(get_task_input_path(identifier), "wb") as f:
+            f.write(b"not an audio file")
+        get_single_flight().join(content_hash, identifier)
+
+    get_task_queue().submit(TaskType.TRANSCRIPTION, identifier=identifiers[0], params=params)
+    get_task_queue().pools[TaskType.TRANSCRIPTION].queue.join()
+
+    for identifier in identifiers:
+        assert get_task_status_from_db(identifier=identifier).status == TaskStatus.FAILED
+        assert not os.path.exists(get_task_input_path(identifier))
+    # The key is released, so the next identical task becomes the leader instead of waiting forever
+    assert get_single_flight().join(content_hash, "next-identical-task")
+    get_single_flight().done(content_hash)
+
+
+@pytest.mark.parametrize(
+    "pipeline_params",
+    [
+        TEST_PIPELINE_PARAMS
+    ]
+)
+def test_transcription_stream_endpoint(
+    get_upload_file_instance,
+    pipeline_params: dict
+):
+    client = get_client()
+    file_content = BytesIO(get_upload_file_instance.file.read())
+    get_upload_file_instance.file.seek(0)
+
+    with client.stream(
+        "POST",
+        "/transcription/stream",
+        files={"file": (get_upload_file_instance.filename, file_content, "audio/mpeg")},
+        params=pipeline_params
+    ) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert response.headers["x-task-identifier"]
+        segments = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert segments and "error" not in segments[-1]
+    wer = calculate_wer(TEST_ANSWER, segments[0]["text"].strip().replace(",", "").replace(".", ""))
+    assert wer < 0.1, f"WER is too high, it's {wer}"
+
+
+def test_transcription_live_endpoint():
+    client = get_client()
+    # Stream the test file in the frames of 100ms as the live audio
+    audio = (faster_whisper.decode_audio(TEST_FILE_PATH) * 32767).astype(np.int16).tobytes()
+    frame_size = 1600 * 2
+
+    messages = []
+    with client.websocket_connect("/transcription/stream?lang=en") as websocket:
+        for position in range(0, len(audio), frame_size):
+            websocket.send_bytes(audio[position:position + frame_size])
+        websocket.send_text("end")
+        while True:
+            message = websocket.receive_json()
+            messages.append(message)
+            if message["type"] == "end":
+                break
+
+    finals = [message["segment"] for message in messages if message["type"] == "final"]
+    assert finals
+    assert [segment["id"] for segment in finals] == list(range(1, len(finals) + 1))
+    text = " ".join(segment["text"].strip() for segment in finals).replace(",", "").replace(".", "")
+    wer = calculate_wer(TEST_ANSWER, text)
+    assert wer < 0.1, f"WER is too high, it's {wer}"
@@ -0,0 +1,98 @@
+import os
+import signal
+import threading
+import numpy as np
+import pytest
+
+from backend.common.prefork import PreforkServer, get_memory_usage, should_recover_tasks
+
+WEIGHTS_SIZE = 64 * 1024 ** 2
+NUM_WORKERS = 4
+
+
+def get_mapping_pss(pid: int, address: int) -> int:
+    """PSS in bytes of the memory mapping that contains the address"""
+    with open(f"/proc/{pid}/smaps") as f:
+        in_mapping = False
+        for line in f:
+            fields = line.split()
+            if "-" in fields[0] and not fields[0].endswith(":"):
+                start, end = (int(value, 16) for value in fields[0].split("-"))
+                in_mapping = start <= address < end
+            elif in_mapping and fields[0] == "Pss:":
+                return int(fields[1]) * 1024
+    return 0
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="PSS is only available on Linux")
+def test_workers_share_preloaded_weights():
+    model = {}
+    read_fd, write_fd = os.pipe()
+
+    def load_model():
+        # Large arrays are allocated in their own mapping
+        model["weights"] = np.random.default_rng(0).random(WEIGHTS_SIZE // 8)
+
+    def worker(index: int):
+        os.close(read_fd)
+        # Inference reads all the weights
+        checksum = float(model["weights"].sum())
+        os.write(write_fd, b"1" if np.isfinite(checksum) else b"0")
+        signal.pause()
+
+    server = PreforkServer(worker=worker, num_workers=NUM_WORKERS)
+    server.preload({"test": load_model})
+    try:
+        server.start()
+        os.close(write_fd)
+        ready = b""
+        while len(ready) < NUM_WORKERS:
+            chunk = os.read(read_fd, NUM_WORKERS)
+            assert chunk, "workers exited before reading the weights"
+            ready += chunk
+        assert ready == b"1" * NUM_WORKERS
+
+        address = model["weights"].ctypes.data
+        pids = [os.getpid()] + list(server.workers)
+        weights_pss = sum(get_mapping_pss(pid, address) for pid in pids)
+        # All the processes use one copy of the weights together
+        assert weights_pss < WEIGHTS_SIZE * 1.1
+
+        report = server.memory_report()
+        assert len(report.processes) == NUM_WORKERS + 1
+        assert all(get_memory_usage(pid).rss > WEIGHTS_SIZE for pid in server.workers)
+        assert report.saved > WEIGHTS_SIZE * (NUM_WORKERS - 1) * 0.9
+    finally:
+        server.stop()
+        server.supervise()
+        os.close(read_fd)
+    assert not server.workers
+
+
+def test_restarted_worker_does_not_recover_tasks():
+    read_fd, write_fd = os.pipe()
+
+    def worker(index: int):
+        os.write(write_fd, f"{index}{int(should_recover_tasks())}".encode())
+        if index == 0 and os.getenv("PREFORK_WORKER_RESTARTED") is None:
+            # The first worker exits once, so it's restarted while the other worker keeps running
+            os._exit(1)
+        signal.pause()
+
+    server = PreforkServer(worker=worker, num_workers=2)
+    supervisor = threading.Thread(target=server.supervise)
+    try:
+        server.start()
+        supervisor.start()
+        # The write end is kept open in the parent, since the restarted worker is forked from it
+        reports = b""
+        while len(reports) < 6:
+            reports += os.read(read_fd, 6 - len(reports))
+    finally:
+        server.stop()
+        supervisor.join(timeout=10)
+        os.close(read_fd)
+        os.close(write_fd)
+
+    # Only the first start of the first worker recovers the tasks
+    assert sorted(reports[i:i + 2] for i in range(0, 6, 2)) == [b"00", b"01", b"10"]
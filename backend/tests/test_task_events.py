@@ -0,0 +1,63 @@
+import json
+import threading
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from modules.whisper.data_classes import Segment
+from backend.routers.task.router import task_router
+from backend.common.progress import TaskProgress, get_progress_broker
+from backend.db.task.models import TaskStatus, TaskType
+from backend.db.task.dao import add_task_to_db, update_task_status_in_db
+
+
+def test_task_events_stream():
+    app = FastAPI()
+    app.include_router(task_router)
+    client = TestClient(app)
+    identifier = add_task_to_db(status=TaskStatus.IN_PROGRESS, task_type=TaskType.TRANSCRIPTION)
+
+    def run_task():
+        while not get_progress_broker().channels.get(identifier, None) or \
+                not get_progress_broker().channels[identifier].subscribers:
+            time.sleep(0.01)
+        progress = TaskProgress(identifier, interval=60)
+        progress(0, desc="Transcribing..")
+        # Throttled until the interval passes
+        progress(0.3, desc="Transcribing..")
+        progress.add_segment(Segment(id=1, text="Hello", start=0.0, end=1.0))
+        progress(1, desc="Transcribing..")
+        update_task_status_in_db(identifier=identifier, update_data={"status": TaskStatus.COMPLETED})
+        get_progress_broker().publish_status(identifier, TaskStatus.COMPLETED)
+
+    thread = threading.Thread(target=run_task)
+    thread.start()
+    with client.stream("GET", f"/task/{identifier}/events") as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = read_events(response.iter_lines())
+    thread.join()
+
+    assert events == [
+        ("status", {"status": "in_progress", "error": None}),
+        ("progress", {"stage": "Transcribing..", "progress": 0.0}),
+        ("segment", {"id": 1, "text": "Hello", "start": 0.0, "end": 1.0}),
+        ("progress", {"stage": "Transcribing..", "progress": 1.0}),
+        ("status", {"status": "completed"}),
+    ]
+    assert identifier not in get_progress_broker().channels
+
+    # The stream of the finished task ends right after its status
+    with client.stream("GET", f"/task/{identifier}/events") as response:
+        assert read_events(response.iter_lines()) == [("status", {"status": "completed", "error": None})]
+
+
+def read_events(lines):
+    events = []
+    event = None
+    for line in lines:
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((event, json.loads(line[len("data: "):])))
+    return events
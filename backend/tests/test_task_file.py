@@ -0,0 +1,82 @@
+import io
+import zipfile
+import numpy as np
+import soundfile as sf
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from modules.utils.paths import BACKEND_CACHE_DIR
+from backend.routers.task.router import task_router
+from backend.routers.bgm_separation.models import BGMSeparationResult
+from backend.common.artifact_store import save_wav_artifact
+from backend.db.task.models import TaskStatus, TaskType, ResultType
+from backend.db.task.dao import add_task_to_db, update_task_status_in_db
+
+
+def create_bgm_separation_task() -> str:
+    identifier = add_task_to_db(status=TaskStatus.QUEUED, task_type=TaskType.BGM_SEPARATION)
+    audio = np.random.uniform(-1, 1, size=(16000, 2)).astype(np.float32)
+    instrumental_hash, _ = save_wav_artifact(audio, 16000, f"{BACKEND_CACHE_DIR}/UVR/instrumental")
+    vocal_hash, _ = save_wav_artifact(audio[:, 0], 16000, f"{BACKEND_CACHE_DIR}/UVR/vocals")
+    update_task_status_in_db(
+        identifier=identifier,
+        update_data={
+            "status": TaskStatus.COMPLETED,
+            "result": BGMSeparationResult(instrumental_hash=instrumental_hash, vocal_hash=vocal_hash).model_dump(),
+            "result_type": ResultType.FILEPATH
+        }
+    )
+    return identifier
+
+
+def test_file_task_response():
+    app = FastAPI()
+    app.include_router(task_router)
+    client = TestClient(app)
+    identifier = create_bgm_separation_task()
+
+    # The first download is streamed while the archive is produced
+    response = client.get(f"/task/file/{identifier}")
+    assert response.status_code == 200
+    assert "content-length" not in response.headers
+    etag = response.headers["etag"]
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zipf:
+        assert zipf.namelist() == ["instrumental.wav", "vocals.wav"]
+        assert zipf.testzip() is None
+
+    # The next downloads are served from the cached archive
+    cached_response = client.get(f"/task/file/{identifier}")
+    assert cached_response.status_code == 200
+    assert cached_response.headers["etag"] == etag
+    assert cached_response.content == response.content
+
+    response = client.get(f"/task/file/{identifier}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = client.get(f"/task/file/{identifier}", headers={"Range": "bytes=0-99"})
+    assert response.status_code == 206
+    assert response.content == cached_response.content[:100]
+
+    response = client.get(f"/task/file/{identifier}", params={"audio_format": "flac"})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zipf, \
+            zipfile.ZipFile(io.BytesIO(cached_response.content)) as wav_zipf:
+        assert zipf.namelist() == ["instrumental.flac", "vocals.flac"]
+        # FLAC is transcoded block by block while it's streamed, and it's decoded into the same samples
+        for flac_name, wav_name in zip(zipf.namelist(), wav_zipf.namelist()):
+            flac_audio, flac_sample_rate = sf.read(io.BytesIO(zipf.read(flac_name)), dtype="int16")
+            wav_audio, wav_sample_rate = sf.read(io.BytesIO(wav_zipf.read(wav_name)), dtype="int16")
+            assert flac_sample_rate == wav_sample_rate
+            np.testing.assert_array_equal(flac_audio, wav_audio)
+
+
+def test_file_task_of_unfinished_task():
+    app = FastAPI()
+    app.include_router(task_router)
+    client = TestClient(app)
+
+    for task_status in [TaskStatus.QUEUED, TaskStatus.IN_PROGRESS, TaskStatus.FAILED]:
+        identifier = add_task_to_db(status=task_status, task_type=TaskType.BGM_SEPARATION)
+        response = client.get(f"/task/file/{identifier}")
+        assert response.status_code == 409
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers.task.router import task_router
+from backend.db.task.models import TaskStatus, TaskType
+from backend.db.task.dao import add_task_to_db, update_task_status_in_db
+
+
+def test_task_list_pagination():
+    app = FastAPI()
+    app.include_router(task_router)
+    client = TestClient(app)
+
+    # Tasks far in the future so that the tasks from the other tests are filtered out
+    created_at = datetime.utcnow() + timedelta(days=365)
+    identifiers = []
+    for i in range(5):
+        identifier = add_task_to_db(status=TaskStatus.COMPLETED, task_type=TaskType.VAD)
+        # The last two tasks have the same creation time to test the tie-breaker
+        update_task_status_in_db(identifier=identifier,
+                                 update_data={"created_at": created_at + timedelta(seconds=min(i, 3))})
+        identifiers.append(identifier)
+    failed_identifier = add_task_to_db(status=TaskStatus.FAILED, task_type=TaskType.VAD)
+    update_task_status_in_db(identifier=failed_identifier, update_data={"created_at": created_at})
+
+    params = {"limit": 2, "status": "completed", "task_type": "vad", "created_after": created_at.isoformat()}
+    listed_identifiers = []
+    cursor = None
+    for _ in range(3):
+        response = client.get("/task/all", params={**params, "cursor": cursor} if cursor else params)
+        assert response.status_code == 200
+        page = response.json()
+        assert all("result" not in task for task in page["tasks"])
+        listed_identifiers += [task["identifier"] for task in page["tasks"]]
+        cursor = page["next_cursor"]
+    assert cursor is None
+    assert listed_identifiers == identifiers[::-1]
+
+    response = client.get("/task/all", params={"status": ["failed", "completed"], "task_type": "vad",
+                                               "created_after": created_at.isoformat(),
+                                               "created_before": (created_at + timedelta(seconds=1)).isoformat()})
+    assert {task["identifier"] for task in response.json()["tasks"]} == {identifiers[0], failed_identifier}
+
+    response = client.get("/task/all", params={"cursor": "invalid"})
+    assert response.status_code == 400
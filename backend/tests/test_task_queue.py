@@ -0,0 +1,127 @@
+import os
+import threading
+import numpy as np
+import pytest
+from scipy.io.wavfile import write
+
+from modules.whisper.data_classes import VadParams
+from backend.common.task_queue import TaskQueue, TaskQueueFullError, get_task_input_path, get_task_input_files
+from backend.db.task.models import TaskStatus, TaskType
+from backend.db.task.dao import add_task_to_db, get_task_status_from_db, update_task_status_in_db
+
+
+def test_task_queue_rejects_when_full():
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking_task(audio: np.ndarray, params: VadParams, identifier: str):
+        started.set()
+        release.wait(timeout=10)
+        update_task_status_in_db(identifier=identifier, update_data={"status": TaskStatus.COMPLETED})
+
+    task_queue = TaskQueue(workers={str(TaskType.VAD): 1}, max_size=1)
+    task_queue.register(TaskType.VAD, blocking_task, VadParams)
+
+    identifiers = [add_task_to_db(status=TaskStatus.QUEUED, task_type=TaskType.VAD) for _ in range(3)]
+    for identifier in identifiers:
+        write_silence(get_task_input_path(identifier))
+
+    task_queue.submit(TaskType.VAD, identifier=identifiers[0], params=VadParams())
+    assert started.wait(timeout=10)
+    task_queue.submit(TaskType.VAD, identifier=identifiers[1], params=VadParams())
+    assert task_queue.is_full(TaskType.VAD)
+
+    with pytest.raises(TaskQueueFullError):
+        task_queue.submit(TaskType.VAD, identifier=identifiers[2], params=VadParams())
+    assert get_task_status_from_db(identifier=identifiers[2]).status == TaskStatus.FAILED
+
+    release.set()
+    task_queue.pools[TaskType.VAD].queue.join()
+
+    for identifier in identifiers[:2]:
+        task = get_task_status_from_db(identifier=identifier)
+        assert task.status == TaskStatus.COMPLETED
+        assert task.audio_duration == 1
+        assert not os.path.exists(get_task_input_path(identifier))
+
+
+def test_task_queue_recovers_unfinished_tasks():
+    done = threading.Event()
+    results = []
+
+    def record_task(audio: np.ndarray, params: VadParams, identifier: str):
+        results.append((identifier, audio.shape, params.threshold))
+        done.set()
+
+    params = VadParams(threshold=0.3)
+    identifier = add_task_to_db(
+        status=TaskStatus.IN_PROGRESS,
+        task_type=TaskType.VAD,
+        task_params=params.model_dump()
+    )
+    lost_identifier = add_task_to_db(status=TaskStatus.QUEUED, task_type=TaskType.VAD, task_params=params.model_dump())
+
+    task_queue = TaskQueue()
+    task_queue.register(TaskType.VAD, record_task, VadParams)
+    write_silence(get_task_input_path(identifier))
+
+    task_queue.recover()
+    assert done.wait(timeout=10)
+    task_queue.pools[TaskType.VAD].queue.join()
+
+    assert (identifier, (16000,), 0.3) in results
+    assert get_task_status_from_db(identifier=lost_identifier).status == TaskStatus.FAILED
+
+
+def test_task_queue_loads_input_directory():
+    results = []
+
+    def record_task(audio: list, params: VadParams, identifier: str):
+        results.append([os.path.basename(file_path) for file_path in audio])
+        update_task_status_in_db(identifier=identifier, update_data={"status": TaskStatus.COMPLETED})
+
+    task_queue = TaskQueue()
+    task_queue.register(TaskType.VAD_BATCH, record_task, VadParams, load_input=get_task_input_files)
+
+    identifier = add_task_to_db(status=TaskStatus.QUEUED, task_type=TaskType.VAD_BATCH)
+    os.makedirs(get_task_input_path(identifier))
+    for index in [2, 0, 1]:
+        write_silence(os.path.join(get_task_input_path(identifier), f"{index:06d}"))
+
+    task_queue.submit(TaskType.VAD_BATCH, identifier=identifier, params=VadParams())
+    task_queue.pools[TaskType.VAD_BATCH].queue.join()
+
+    assert results == [["000000", "000001", "000002"]]
+    task = get_task_status_from_db(identifier=identifier)
+    assert task.status == TaskStatus.COMPLETED
+    assert task.audio_duration is None
+    assert not os.path.exists(get_task_input_path(identifier))
+
+
+def write_silence(file_path: str, duration: int = 1):
+    write(file_path, 16000, np.zeros(16000 * duration, dtype=np.int16))
+
+
+def test_task_queue_runs_outside_of_queue_within_worker_slots():
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking_task(audio: np.ndarray, params: VadParams, identifier: str):
+        started.set()
+        release.wait(timeout=10)
+        update_task_status_in_db(identifier=identifier, update_data={"status": TaskStatus.COMPLETED})
+
+    task_queue = TaskQueue(workers={str(TaskType.VAD): 1}, max_size=1)
+    task_queue.register(TaskType.VAD, blocking_task, VadParams)
+    identifier = add_task_to_db(status=TaskStatus.QUEUED, task_type=TaskType.VAD)
+    write_silence(get_task_input_path(identifier))
+
+    task_queue.submit(TaskType.VAD, identifier=identifier, params=VadParams())
+    assert started.wait(timeout=10)
+    # The only worker is busy
+    with pytest.raises(TaskQueueFullError):
+        task_queue.run(TaskType.VAD, lambda: None, blocking=False)
+
+    release.set()
+    task_queue.pools[TaskType.VAD].queue.join()
+    assert task_queue.run(TaskType.VAD, lambda value: value * 2, 21, blocking=False) == 42
@@ -0,0 +1,72 @@
+import threading
+import time
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.common.warmup import ModelWarmup, ModelState, cached_model, get_model_warmup
+
+
+def test_model_warmup_readiness():
+    warmup = ModelWarmup()
+    release = threading.Event()
+
+    def failing_loader():
+        raise RuntimeError("model not found")
+
+    warmup.start("slow", lambda: release.wait(timeout=10))
+    warmup.start("broken", failing_loader)
+
+    readiness = warmup.readiness()
+    assert not readiness.ready
+    assert readiness.models["slow"].state == ModelState.LOADING
+
+    release.set()
+    warmup.wait(timeout=10)
+    readiness = warmup.readiness()
+    assert not readiness.ready
+    assert readiness.models["slow"].state == ModelState.READY
+    assert readiness.models["broken"].state == ModelState.FAILED
+    assert readiness.models["broken"].error == "model not found"
+
+
+def test_cached_model_is_loaded_once():
+    num_loads = 0
+
+    @cached_model
+    def get_model():
+        nonlocal num_loads
+        num_loads += 1
+        time.sleep(0.2)
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_model())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert num_loads == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_health_probes():
+    get_model_warmup.cache_clear()
+    release = threading.Event()
+    warmup = get_model_warmup()
+    warmup.start("vad", lambda: release.wait(timeout=10))
+
+    # The lifespan is not run, so only the model above is warmed up
+    client = TestClient(app)
+    assert client.get("/healthz").status_code == 200
+
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["models"]["vad"]["state"] == ModelState.LOADING
+
+    release.set()
+    warmup.wait(timeout=10)
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["ready"]
+    get_model_warmup.cache_clear()
@@ -4,13 +4,13 @@ import os
 import subprocess
 from functools import lru_cache
 from typing import Optional, Union
-from scipy.io.wavfile import write
-import tempfile
 
 import numpy as np
 import torch
 import torch.nn.functional as F
 
+from modules.utils.audio_buffer import resample
+
 def exact_div(x, y):
     assert x % y == 0
     return x // y
@@ -28,9 +28,10 @@ FRAMES_PER_SECOND = exact_div(SAMPLE_RATE, HOP_LENGTH)  # 10ms per audio frame
 TOKENS_PER_SECOND = exact_div(SAMPLE_RATE, N_SAMPLES_PER_TOKEN)  # 20ms per audio token
 
 
-def load_audio(file: Union[str, np.ndarray], sr: int = SAMPLE_RATE) -> np.ndarray:
+def load_audio(file: Union[str, np.ndarray], sr: int = SAMPLE_RATE, original_sr: int = SAMPLE_RATE) -> np.ndarray:
     """
     Open an audio file or process a numpy array containing audio data as mono waveform, resampling as necessary.
+    The numpy array is converted in memory, it's returned as it is if it's already a float32 mono waveform of `sr`.
 
     Parameters
     ----------
@@ -40,22 +41,17 @@ def load_audio(file: Union[str, np.ndarray], sr: int = SAMPLE_RATE) -> np.ndarra
     sr: int
         The sample rate to resample the audio if necessary.
 
+    original_sr: int
+        The sample rate of the numpy array.
+
     Returns
     -------
     A NumPy array containing the audio waveform, in float32 dtype.
     """
     if isinstance(file, np.ndarray):
-        if file.dtype != np.float32:
-            file = file.astype(np.float32)
         if file.ndim > 1:
-            file = np.mean(file, axis=1)
-
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        write(temp_file.name, SAMPLE_RATE, (file * 32768).astype(np.int16))
-        temp_file_path = temp_file.name
-        temp_file.close()
-    else:
-        temp_file_path = file
+            file = np.mean(file, axis=1, dtype=np.float32)
+        return resample(file.astype(np.float32, copy=False), original_sr, sr)
 
     try:
         cmd = [
@@ -64,7 +60,7 @@ def load_audio(file: Union[str, np.ndarray], sr: int = SAMPLE_RATE) -> np.ndarra
             "-threads",
             "0",
             "-i",
-            temp_file_path,
+            file,
             "-f",
             "s16le",
             "-ac",
@@ -78,9 +74,6 @@ def load_audio(file: Union[str, np.ndarray], sr: int = SAMPLE_RATE) -> np.ndarra
         out = subprocess.run(cmd, capture_output=True, check=True).stdout
     except subprocess.CalledProcessError as e:
         raise RuntimeError(f"Failed to load audio: {e.stderr.decode()}") from e
-    finally:
-        if isinstance(file, np.ndarray):
-            os.remove(temp_file_path)
 
     return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
 
@@ -3,7 +3,6 @@
 import numpy as np
 import pandas as pd
 import os
-from pyannote.audio import Pipeline
 from typing import Optional, Union
 import torch
 
@@ -20,6 +19,9 @@ class DiarizationPipeline:
         use_auth_token=None,
         device: Optional[Union[str, torch.device]] = "cpu",
     ):
+        # pyannote is imported only when the pipeline is loaded, since it's slow to import
+        from pyannote.audio import Pipeline
+
         if isinstance(device, str):
             device = torch.device(device)
         self.model = Pipeline.from_pretrained(
@@ -29,8 +31,7 @@ class DiarizationPipeline:
         ).to(device)
 
     def __call__(self, audio: Union[str, np.ndarray], min_speakers=None, max_speakers=None):
-        if isinstance(audio, str):
-            audio = load_audio(audio)
+        audio = load_audio(audio)
         audio_data = {
             'waveform': torch.from_numpy(audio[None, :]),
             'sample_rate': SAMPLE_RATE
@@ -2,6 +2,7 @@ import os
 import torch
 from typing import List, Union, BinaryIO, Optional, Tuple
 import numpy as np
+import pandas as pd
 import time
 import logging
 import gc
@@ -9,6 +10,7 @@ import gc
 from modules.utils.paths import DIARIZATION_MODELS_DIR
 from modules.diarize.diarize_pipeline import DiarizationPipeline, assign_word_speakers
 from modules.diarize.audio_loader import load_audio
+from modules.utils.audio_buffer import AudioBuffer
 from modules.whisper.data_classes import *
 
 
@@ -20,6 +22,7 @@ class Diarizer:
         self.available_device = self.get_available_device()
         self.compute_type = "float16"
         self.model_dir = model_dir
+        self.model_name = "pyannote/speaker-diarization-3.1"
         os.makedirs(self.model_dir, exist_ok=True)
         self.pipe = None
 
@@ -53,6 +56,29 @@ class Diarizer:
         """
         start_time = time.time()
 
+        speaker_turns = self.diarize(
+            audio=audio,
+            use_auth_token=use_auth_token,
+            device=device
+        )
+        segments_result = self.assign_speakers(speaker_turns, transcribed_result)
+
+        elapsed_time = time.time() - start_time
+        return segments_result, elapsed_time
+
+    def diarize(self,
+                audio: Union[str, BinaryIO, np.ndarray, AudioBuffer],
+                use_auth_token: str,
+                device: Optional[str] = None
+                ) -> pd.DataFrame:
+        """
+        Get the speaker turns of the audio. See `run()` for the parameters.
+
+        Returns
+        ----------
+        pd.DataFrame
+            Speaker turns with the start, end and speaker columns
+        """
         if device is None:
             device = self.device
 
@@ -62,11 +88,17 @@ class Diarizer:
                 use_auth_token=use_auth_token
             )
 
+        if isinstance(audio, AudioBuffer):
+            audio = audio.get()
         audio = load_audio(audio)
+        return self.pipe(audio)
 
-        diarization_segments = self.pipe(audio)
+    @staticmethod
+    def assign_speakers(speaker_turns: pd.DataFrame,
+                        transcribed_result: List[Segment]) -> List[Segment]:
+        """Prefix the text of the segments with the speaker that speaks the most during the segment"""
         diarized_result = assign_word_speakers(
-            diarization_segments,
+            speaker_turns,
             {"segments": transcribed_result}
         )
 
@@ -81,9 +113,7 @@ class Diarizer:
                 end=segment["end"],
                 text=diarized_text
             ))
-
-        elapsed_time = time.time() - start_time
-        return segments_result, elapsed_time
+        return segments_result
 
     def update_pipe(self,
                     use_auth_token: Optional[str] = None,
@@ -118,6 +148,7 @@ class Diarizer:
         # Disable redundant torchvision warning message
         logger.disabled = True
         self.pipe = DiarizationPipeline(
+            model_name=self.model_name,
             use_auth_token=use_auth_token,
             device=device,
             cache_dir=self.model_dir
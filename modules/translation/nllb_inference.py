@@ -1,4 +1,3 @@
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
 import gradio as gr
 import os
 
@@ -44,6 +43,9 @@ class NLLBInference(TranslationBase):
                 raise ValueError(f"Language '{lang}' is not supported. Use one of: {list(NLLB_AVAILABLE_LANGS.keys())}")
             return lang
 
+        # transformers is imported only when the model is loaded, since it's slow to import
+        from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
+
         src_lang = validate_language(src_lang)
         tgt_lang = validate_language(tgt_lang)
 
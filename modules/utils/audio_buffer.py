@@ -0,0 +1,145 @@
+import threading
+from typing import BinaryIO, Dict, Optional, Union
+import numpy as np
+
+SAMPLING_RATE = 16000
+
+
+class AudioBuffer:
+    """
+    Audio that is decoded once and shared by the stages of the pipeline, instead of each stage decoding the file
+    again. The audio is decoded with its native sampling rate and channels if a stage needs them first (the UVR),
+    otherwise it's decoded straight into the mono audio of 16000 sampling rate. The other variants are converted
+    from the decoded audio on demand and kept.
+    `decode_count` is the number of times the source is decoded, which is 1 at most in a pipeline run.
+    """
+    def __init__(self,
+                 source: Union[str, BinaryIO, np.ndarray],
+                 sample_rate: int = SAMPLING_RATE):
+        """
+        Parameters
+        ----------
+        source: Union[str, BinaryIO, np.ndarray]
+            Audio path or file binary, or the decoded audio numpy array with the shape of (samples,) or
+            (samples, channels)
+        sample_rate: int
+            Sampling rate of the numpy array. The sampling rate of the file is read when it's decoded.
+        """
+        self.source = source
+        self.decode_count = 0
+        self.sample_rate: Optional[int] = None
+        self.num_channels: Optional[int] = None
+        self.layout: Optional[str] = None
+        self._native: Optional[np.ndarray] = None
+        # Mono audios by the sampling rate
+        self._mono: Dict[int, np.ndarray] = {}
+        self._position = None if isinstance(source, (str, np.ndarray)) else source.tell()
+        self.lock = threading.Lock()
+
+        if isinstance(source, np.ndarray):
+            self._set_native(source, sample_rate)
+
+    @classmethod
+    def wrap(cls, audio: Union[str, BinaryIO, np.ndarray, "AudioBuffer"]) -> "AudioBuffer":
+        """Audio buffer of the audio, or the audio itself if it's already a buffer"""
+        return audio if isinstance(audio, AudioBuffer) else cls(audio)
+
+    def get(self, sample_rate: int = SAMPLING_RATE) -> np.ndarray:
+        """Mono float32 audio with the sampling rate"""
+        with self.lock:
+            if sample_rate in self._mono:
+                return self._mono[sample_rate]
+
+            if self._native is None:
+                audio = self._decode(lambda source: self._decode_mono(source, sample_rate))
+            else:
+                audio = self._native
+                if audio.ndim >= 2:
+                    audio = audio.mean(axis=1)
+                audio = resample(audio.astype(np.float32, copy=False), self.sample_rate, sample_rate)
+
+            self._mono[sample_rate] = audio
+            return audio
+
+    def get_native(self) -> np.ndarray:
+        """
+        Float32 audio with the native sampling rate in `sample_rate`, with the shape of (samples,) for the mono
+        audio or (samples, channels)
+        """
+        with self.lock:
+            if self._native is None:
+                # It's decoded again if the mono audio is decoded first, which is counted in `decode_count`
+                self._decode(self._decode_native)
+            return self._native
+
+    def _decode_mono(self, source: Union[str, BinaryIO], sample_rate: int) -> np.ndarray:
+        import av
+        import faster_whisper
+
+        # Only the header is read for the native sampling rate and the layout
+        with av.open(source, mode="r", metadata_errors="ignore") as container:
+            stream = container.streams.audio[0]
+            self.sample_rate, self.layout = stream.rate, stream.layout.name
+            self.num_channels = len(stream.layout.channels)
+        if self._position is not None:
+            source.seek(self._position)
+        return faster_whisper.decode_audio(source, sampling_rate=sample_rate)
+
+    def _decode_native(self, source: Union[str, BinaryIO]):
+        import av
+
+        frames = []
+        sample_rate, layout = SAMPLING_RATE, "mono"
+        # Only the sample format is converted, the sampling rate and the layout are kept
+        resampler = av.audio.resampler.AudioResampler(format="flt")
+        with av.open(source, mode="r", metadata_errors="ignore") as container:
+            decoded_frames = container.decode(audio=0)
+            while True:
+                try:
+                    frame = next(decoded_frames)
+                except StopIteration:
+                    break
+                except av.error.InvalidDataError:
+                    continue
+                sample_rate, layout = frame.sample_rate, frame.layout.name
+                frame.pts = None
+                frames += [resampled.to_ndarray() for resampled in resampler.resample(frame)]
+            frames += [resampled.to_ndarray() for resampled in resampler.resample(None)]
+
+        num_channels = len(av.AudioLayout(layout).channels)
+        audio = np.concatenate(frames, axis=1).reshape(-1, num_channels) if frames else \
+            np.zeros((0, num_channels), dtype=np.float32)
+        self._set_native(audio[:, 0] if num_channels == 1 else audio, sample_rate, layout)
+
+    def _decode(self, decode):
+        """Decode the source, from the start of the file binary and leaving it where it was"""
+        if self._position is None:
+            audio = decode(self.source)
+        else:
+            position = self.source.tell()
+            self.source.seek(self._position)
+            try:
+                audio = decode(self.source)
+            finally:
+                self.source.seek(position)
+        self.decode_count += 1
+        return audio
+
+    def _set_native(self, audio: np.ndarray, sample_rate: int, layout: Optional[str] = None):
+        self._native = audio
+        self.sample_rate = sample_rate
+        self.num_channels = 1 if audio.ndim == 1 else audio.shape[1]
+        self.layout = layout or {1: "mono", 2: "stereo"}.get(self.num_channels, f"{self.num_channels} channels")
+        if audio.ndim == 1 and audio.dtype == np.float32:
+            self._mono[sample_rate] = audio
+
+
+def resample(audio: np.ndarray, original_sample_rate: int, new_sample_rate: int = SAMPLING_RATE) -> np.ndarray:
+    """Resample the mono audio with torchaudio"""
+    if original_sample_rate == new_sample_rate:
+        return audio
+    import torch
+    import torchaudio
+
+    resampler = torchaudio.transforms.Resample(orig_freq=original_sample_rate, new_freq=new_sample_rate)
+    return resampler(torch.from_numpy(np.ascontiguousarray(audio))).numpy()
@@ -16,10 +16,12 @@ TRANSLATION_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "translations")
 UVR_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "UVR")
 UVR_INSTRUMENTAL_OUTPUT_DIR = os.path.join(UVR_OUTPUT_DIR, "instrumental")
 UVR_VOCALS_OUTPUT_DIR = os.path.join(UVR_OUTPUT_DIR, "vocals")
+STAGE_CACHE_DIR = os.path.join(OUTPUT_DIR, "cache")
 BACKEND_DIR_PATH = os.path.join(WEBUI_DIR, "backend")
 SERVER_CONFIG_PATH = os.path.join(BACKEND_DIR_PATH, "configs", "config.yaml")
 SERVER_DOTENV_PATH = os.path.join(BACKEND_DIR_PATH, "configs", ".env")
 BACKEND_CACHE_DIR = os.path.join(BACKEND_DIR_PATH, "cache")
+BACKEND_QUEUE_DIR = os.path.join(BACKEND_DIR_PATH, "queue")
 
 for dir_path in [MODELS_DIR,
                  WHISPER_MODELS_DIR,
@@ -33,5 +35,7 @@ for dir_path in [MODELS_DIR,
                  TRANSLATION_OUTPUT_DIR,
                  UVR_INSTRUMENTAL_OUTPUT_DIR,
                  UVR_VOCALS_OUTPUT_DIR,
-                 BACKEND_CACHE_DIR]:
+                 STAGE_CACHE_DIR,
+                 BACKEND_CACHE_DIR,
+                 BACKEND_QUEUE_DIR]:
     os.makedirs(dir_path, exist_ok=True)
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import BinaryIO, Dict, List, Optional, Union
+import numpy as np
+from pydantic import BaseModel, Field
+
+from modules.utils.paths import STAGE_CACHE_DIR
+from modules.utils.audio_buffer import AudioBuffer
+
+AUDIO_EXTENSION = ".npy"
+ARRAYS_EXTENSION = ".npz"
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class StageStats(BaseModel):
+    hits: int = Field(default=0, description="Number of the lookups that reused the cached output")
+    misses: int = Field(default=0, description="Number of the lookups that had to run the stage")
+    hit_rate: float = Field(default=0, description="Ratio of the hits to all the lookups")
+
+
+class StageCacheStats(BaseModel):
+    entries: int = Field(..., description="Number of the cached outputs")
+    size: int = Field(..., description="Total size of the cached outputs in bytes")
+    max_size: int = Field(..., description="Maximum total size of the cached outputs in bytes")
+    evictions: int = Field(..., description="Number of the outputs removed by the size limit")
+    stages: Dict[str, StageStats] = Field(default_factory=dict, description="Hits and misses of each stage")
+
+
+class StageCache:
+    """
+    Cache the outputs of the stages around the transcription on the disk, which are the vocals separated by UVR,
+    the speech chunks from VAD and the speaker turns from the diarization. Re-running a file with the different
+    decoding parameters of whisper reuses them instead of running the stages again.
+    Keys are the hash of the input audio and the parameters of the stage, which are chained through the preceding
+    stages with `get_key()`. Outputs are evicted in the least recently used order when the total size exceeds
+    `max_size`, and the order is kept across the restarts with the modified time of the files.
+    """
+    def __init__(self,
+                 cache_dir: str = STAGE_CACHE_DIR,
+                 max_size: int = 4 * 1024 ** 3):
+        """
+        Parameters
+        ----------
+        cache_dir: str
+            Directory to save the outputs, with a subdirectory for each stage
+        max_size: int
+            Maximum total size of the outputs in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.entries: OrderedDict[str, int] = OrderedDict()
+        self.size = 0
+        self.evictions = 0
+        self.stages: Dict[str, StageStats] = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Index the outputs of the previous runs by their modified time"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        for root, dirs, files in os.walk(self.cache_dir):
+            for filename in files:
+                if filename.endswith(".tmp"):
+                    continue
+                stat = os.stat(os.path.join(root, filename))
+                entries.append((stat.st_mtime, os.path.join(root, filename), stat.st_size))
+
+        with self.lock:
+            for _, path, size in sorted(entries):
+                self._put(path, size)
+        self.evict()
+
+    @staticmethod
+    def hash_audio(audio: Union[str, BinaryIO, np.ndarray, AudioBuffer]) -> str:
+        """SHA-256 hash of the audio file or the audio array. The source of the audio buffer is hashed."""
+        if isinstance(audio, AudioBuffer):
+            audio = audio.source
+        hash_func = hashlib.sha256()
+        if isinstance(audio, np.ndarray):
+            hash_func.update(f"{audio.dtype}{audio.shape}".encode("utf-8"))
+            hash_func.update(np.ascontiguousarray(audio).data)
+        elif isinstance(audio, str):
+            with open(audio, "rb") as f:
+                for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                    hash_func.update(block)
+        else:
+            position = audio.tell()
+            for block in iter(lambda: audio.read(HASH_BLOCK_SIZE), b""):
+                hash_func.update(block)
+            audio.seek(position)
+        return hash_func.hexdigest()
+
+    @staticmethod
+    def get_key(stage: str, audio_key: str, params: dict) -> str:
+        """Key of the output of the stage for the audio and the canonical form of the parameters of the stage"""
+        canonical_params = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(f"{stage}:{audio_key}:{canonical_params}".encode("utf-8")).hexdigest()
+
+    def get_audio(self, stage: str, key: str) -> Optional[np.ndarray]:
+        path = self.lookup(stage, key, AUDIO_EXTENSION)
+        return None if path is None else np.load(path)
+
+    def put_audio(self, stage: str, key: str, audio: np.ndarray):
+        self.save(stage, key, AUDIO_EXTENSION, lambda f: np.save(f, audio))
+
+    def get_arrays(self, stage: str, key: str) -> Optional[Dict[str, np.ndarray]]:
+        path = self.lookup(stage, key, ARRAYS_EXTENSION)
+        if path is None:
+            return None
+        with np.load(path) as arrays:
+            return dict(arrays)
+
+    def put_arrays(self, stage: str, key: str, **arrays: np.ndarray):
+        self.save(stage, key, ARRAYS_EXTENSION, lambda f: np.savez(f, **arrays))
+
+    def get_speech_chunks(self, key: str) -> Optional[List[dict]]:
+        arrays = self.get_arrays("vad", key)
+        if arrays is None:
+            return None
+        return [{"start": int(start), "end": int(end)} for start, end in arrays["chunks"]]
+
+    def put_speech_chunks(self, key: str, speech_chunks: List[dict]):
+        chunks = np.array([[chunk["start"], chunk["end"]] for chunk in speech_chunks], dtype=np.int64).reshape(-1, 2)
+        self.put_arrays("vad", key, chunks=chunks)
+
+    def get_speaker_turns(self, key: str):
+        """Speaker turns as the `pandas.DataFrame` with the start, end and speaker columns"""
+        arrays = self.get_arrays("diarization", key)
+        if arrays is None:
+            return None
+        import pandas as pd
+        return pd.DataFrame({
+            "start": arrays["start"],
+            "end": arrays["end"],
+            "speaker": arrays["speakers"][arrays["speaker"]]
+        })
+
+    def put_speaker_turns(self, key: str, speaker_turns):
+        speakers, speaker = np.unique(speaker_turns["speaker"].to_numpy().astype(str), return_inverse=True)
+        self.put_arrays(
+            "diarization", key,
+            start=speaker_turns["start"].to_numpy(dtype=np.float64),
+            end=speaker_turns["end"].to_numpy(dtype=np.float64),
+            speaker=speaker.astype(np.int32),
+            speakers=speakers
+        )
+
+    def lookup(self, stage: str, key: str, extension: str) -> Optional[str]:
+        """Get the path of the output and mark it as recently used. Returns None if it's not cached."""
+        path = self.get_path(stage, key, extension)
+        with self.lock:
+            stats = self.stages.setdefault(stage, StageStats())
+            hit = path in self.entries and os.path.exists(path)
+            if hit:
+                stats.hits += 1
+                self.entries.move_to_end(path)
+            else:
+                stats.misses += 1
+                if path in self.entries:
+                    self._pop(path)
+            stats.hit_rate = stats.hits / (stats.hits + stats.misses)
+        if hit:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return None
+            return path
+        return None
+
+    def save(self, stage: str, key: str, extension: str, write):
+        """Write the output to the temporary file and move it to the path, so the partial files are never read"""
+        path = self.get_path(stage, key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.tmp")
+        with open(temp_path, "wb") as f:
+            write(f)
+        os.replace(temp_path, path)
+        with self.lock:
+            self._put(path, os.path.getsize(path))
+        self.evict()
+
+    def evict(self) -> List[str]:
+        """Remove the least recently used outputs until the total size is within `max_size`"""
+        evicted = []
+        with self.lock:
+            while self.entries and self.size > self.max_size:
+                path = next(iter(self.entries))
+                self._pop(path)
+                evicted.append(path)
+            self.evictions += len(evicted)
+
+        for path in evicted:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Error removing {path}: {e}")
+        return evicted
+
+    def stats(self) -> StageCacheStats:
+        with self.lock:
+            return StageCacheStats(
+                entries=len(self.entries),
+                size=self.size,
+                max_size=self.max_size,
+                evictions=self.evictions,
+                stages={stage: stats.model_copy() for stage, stats in self.stages.items()}
+            )
+
+    def get_path(self, stage: str, key: str, extension: str) -> str:
+        return os.path.join(self.cache_dir, stage, f"{key}{extension}")
+
+    def _put(self, path: str, size: int):
+        if path in self.entries:
+            self._pop(path)
+        self.entries[path] = size
+        self.size += size
+
+    def _pop(self, path: str):
+        self.size -= self.entries.pop(path)
@@ -1,6 +1,5 @@
 from typing import Optional, Union, List, Dict
 import numpy as np
-import torchaudio
 import soundfile as sf
 import os
 import torch
@@ -8,10 +7,10 @@ import gc
 import gradio as gr
 from datetime import datetime
 
-from uvr.models import MDX, Demucs, VrNetwork, MDXC
 from modules.utils.paths import DEFAULT_PARAMETERS_CONFIG_PATH, UVR_MODELS_DIR, UVR_OUTPUT_DIR
 from modules.utils.files_manager import load_yaml, save_yaml, is_video
 from modules.diarize.audio_loader import load_audio
+from modules.utils.audio_buffer import AudioBuffer
 
 
 class MusicSeparator:
@@ -48,6 +47,9 @@ class MusicSeparator:
             device (str): Device to use for the model.
             segment_size (int): Segment size for the prediction.
         """
+        # uvr is imported only when the model is loaded, since it's slow to import
+        from uvr.models import MDX
+
         if device is None:
             device = self.device
 
@@ -63,7 +65,7 @@ class MusicSeparator:
                          model_dir=self.model_dir)
 
     def separate(self,
-                 audio: Union[str, np.ndarray],
+                 audio: Union[str, np.ndarray, AudioBuffer],
                  model_name: str,
                  device: Optional[str] = None,
                  segment_size: int = 256,
@@ -73,7 +75,8 @@ class MusicSeparator:
         Separate the background music from the audio.
 
         Args:
-            audio (Union[str, np.ndarray]): Audio path or numpy array.
+            audio (Union[str, np.ndarray, AudioBuffer]): Audio path or numpy array or the audio buffer, which is
+                separated with its native sampling rate and channels.
             model_name (str): Model name.
             device (str): Device to use for the model.
             segment_size (int): Segment size for the prediction.
@@ -86,7 +89,14 @@ class MusicSeparator:
             np.ndarray: Vocals numpy arrays.
             file_paths: List of file paths where the separated audio is saved. Return empty when save_file is False.
         """
-        if isinstance(audio, str):
+        if isinstance(audio, AudioBuffer):
+            if isinstance(audio.source, str):
+                output_filename, ext = os.path.splitext(os.path.basename(audio.source))[0], ".wav"
+            else:
+                output_filename, ext = f"UVR-{datetime.now().strftime('%m%d%H%M%S')}", ".wav"
+            # Channels first, like the files loaded by the model
+            audio, sample_rate = audio.get_native().T, audio.sample_rate
+        elif isinstance(audio, str):
             output_filename, ext = os.path.basename(audio), ".wav"
             output_filename, orig_ext = os.path.splitext(output_filename)
 
@@ -94,6 +104,7 @@ class MusicSeparator:
                 audio = load_audio(audio)
                 sample_rate = 16000
             else:
+                import torchaudio
                 self.audio_info = torchaudio.info(audio)
                 sample_rate = self.audio_info.sample_rate
         else:
@@ -0,0 +1,74 @@
+"""
+Benchmark for the throughput of the VAD on many short files, file by file and with the cross-file batching.
+
+Usage:
+    python -m modules.vad.batch_benchmark --files 500 --seconds 10 --batch_sizes 16 64 --num_workers 4
+
+It generates the audios with the bursts of the noise and the tones between the silences, then measures the files
+per second of `SileroVAD.get_speech_timestamps()` for each file and of `SileroVAD.get_speech_timestamps_batch()`
+for each batch size, and checks that the speech chunks are the same.
+"""
+import argparse
+import time
+from typing import List
+
+import numpy as np
+from faster_whisper.vad import VadOptions
+
+from modules.vad.silero_vad import SileroVAD
+
+SAMPLING_RATE = 16000
+
+
+def generate_audios(num_files: int, seconds: float, seed: int = 0) -> List[np.ndarray]:
+    """Audios of 0.5~1.5 times the `seconds` with the bursts of 0.2~3 seconds"""
+    rng = np.random.default_rng(seed)
+    audios = []
+    for _ in range(num_files):
+        num_samples = int(rng.uniform(0.5, 1.5) * seconds * SAMPLING_RATE)
+        audio = rng.normal(0, 0.005, num_samples).astype(np.float32)
+        position = int(rng.uniform(0, 1) * SAMPLING_RATE)
+        while position < num_samples:
+            end = min(num_samples, position + int(rng.uniform(0.2, 3) * SAMPLING_RATE))
+            t = np.arange(end - position) / SAMPLING_RATE
+            audio[position:end] += (0.3 * np.sin(2 * np.pi * rng.uniform(100, 300) * t) *
+                                    rng.normal(1, 0.5, end - position)).astype(np.float32)
+            position = end + int(rng.uniform(0.2, 2) * SAMPLING_RATE)
+        audios.append(audio)
+    return audios
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=500, help='Number of the files')
+    parser.add_argument('--seconds', type=float, default=10, help='Average duration of the files in seconds')
+    parser.add_argument('--batch_sizes', type=int, nargs="+", default=[16, 64],
+                        help='Numbers of the files in one batch to measure')
+    parser.add_argument('--num_workers', type=int, default=4,
+                        help='Number of the threads that decode the files and detect the speech chunks')
+    args = parser.parse_args()
+
+    vad = SileroVAD()
+    vad.update_model()
+    vad_options = VadOptions()
+    audios = generate_audios(args.files, args.seconds)
+    print(f"{len(audios)} files of {sum(map(len, audios)) / SAMPLING_RATE / len(audios):.1f} seconds on average")
+
+    start = time.perf_counter()
+    expected = [vad.get_speech_timestamps(audio, vad_options) for audio in audios]
+    file_by_file = time.perf_counter() - start
+    print(f"file by file        {len(audios) / file_by_file:9.1f} files/s")
+
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        speech_chunks = vad.get_speech_timestamps_batch(
+            audios, vad_options, batch_size=batch_size, num_workers=args.num_workers
+        )
+        batched = time.perf_counter() - start
+        if speech_chunks != expected:
+            raise AssertionError(f"Speech chunks with the batch size of {batch_size} are different from file by file")
+        print(f"batch size {batch_size:<8} {len(audios) / batched:9.1f} files/s   x{file_by_file / batched:.1f}")
+
+
+if __name__ == "__main__":
+    main()
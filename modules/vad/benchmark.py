@@ -0,0 +1,90 @@
+"""
+Benchmark for the post-processing of the speech probabilities of the VAD across the durations of the audio.
+
+Usage:
+    python -m modules.vad.benchmark --minutes 1 10 60 180 --repeat 5
+
+It generates the speech probabilities of the windows with the runs of the speech and the silence like the real audio,
+then measures the time to get the speeches by stepping through every window and by `SpeechDetector.process()`,
+and checks that the speeches are the same.
+"""
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+import numpy as np
+from faster_whisper.vad import VadOptions
+
+from modules.vad.silero_vad import SpeechDetector
+
+SAMPLING_RATE = 16000
+WINDOW_SIZE_SAMPLES = 512
+
+
+def generate_speech_probs(minutes: float, seed: int = 0) -> np.ndarray:
+    """Probabilities of the speeches of 0.2~12 seconds and the silences of 0.05~3 seconds with the noise"""
+    rng = np.random.default_rng(seed)
+    num_windows = int(minutes * 60 * SAMPLING_RATE / WINDOW_SIZE_SAMPLES)
+    windows_per_second = SAMPLING_RATE / WINDOW_SIZE_SAMPLES
+    probs = np.empty(num_windows, dtype=np.float32)
+    position = 0
+    while position < num_windows:
+        speech_end = min(num_windows, position + int(rng.uniform(0.2, 12) * windows_per_second))
+        silence_end = min(num_windows, speech_end + int(rng.uniform(0.05, 3) * windows_per_second))
+        probs[position:speech_end] = rng.beta(8, 1, speech_end - position)
+        probs[speech_end:silence_end] = rng.beta(1, 8, silence_end - speech_end)
+        position = silence_end
+    return probs
+
+
+def detect_window_by_window(speech_probs: np.ndarray, vad_options: VadOptions) -> List[dict]:
+    detector = SpeechDetector(vad_options, WINDOW_SIZE_SAMPLES, SAMPLING_RATE)
+    speeches = []
+    for i, speech_prob in enumerate(speech_probs):
+        detector.step(i, speech_prob, speeches)
+    return speeches + detector.finish(len(speech_probs) * WINDOW_SIZE_SAMPLES)
+
+
+def detect_by_runs(speech_probs: np.ndarray, vad_options: VadOptions) -> List[dict]:
+    detector = SpeechDetector(vad_options, WINDOW_SIZE_SAMPLES, SAMPLING_RATE)
+    speeches = detector.process(speech_probs)
+    return speeches + detector.finish(len(speech_probs) * WINDOW_SIZE_SAMPLES)
+
+
+def measure(func: Callable, repeat: int) -> List[float]:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--minutes', type=float, nargs="+", default=[1, 10, 60, 180],
+                        help='Durations of the audio in minutes')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of the measurements for each duration')
+    parser.add_argument('--max_speech_duration_s', type=float, default=float("inf"),
+                        help='Maximum duration of the speeches, which adds the events to the runs of the speech')
+    args = parser.parse_args()
+
+    vad_options = VadOptions(max_speech_duration_s=args.max_speech_duration_s)
+    for minutes in args.minutes:
+        speech_probs = generate_speech_probs(minutes)
+        speeches = detect_by_runs(speech_probs, vad_options)
+        if speeches != detect_window_by_window(speech_probs, vad_options):
+            raise AssertionError(f"Speeches of {minutes} minutes are different from the window by window ones")
+
+        window_by_window = statistics.median(measure(
+            lambda: detect_window_by_window(speech_probs, vad_options), args.repeat
+        ))
+        by_runs = statistics.median(measure(lambda: detect_by_runs(speech_probs, vad_options), args.repeat))
+        print(f"{minutes:>6g} min {len(speech_probs):>9} windows {len(speeches):>6} speeches   "
+              f"window by window {window_by_window:9.1f} ms   by runs {by_runs:8.1f} ms   "
+              f"x{window_by_window / by_runs:.1f}")
+
+
+if __name__ == "__main__":
+    main()
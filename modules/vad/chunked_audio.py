@@ -0,0 +1,85 @@
+import bisect
+from typing import Iterator, List, Optional
+import numpy as np
+
+
+class ChunkedAudio:
+    """
+    Speech chunks of the audio that are kept as the views of the audio instead of being concatenated into a copy.
+    It has the length and the slicing of the concatenated audio, so the consumers that read it part by part don't
+    copy the whole speech. It's concatenated only when it's converted with `np.asarray()`, and only once.
+    """
+    ndim = 1
+
+    def __init__(self,
+                 audio: np.ndarray,
+                 chunks: List[dict]):
+        """
+        Parameters
+        ----------
+        audio: np.ndarray
+            Audio that the chunks are taken from
+        chunks: List[dict]
+            Start and end samples of the chunks in the audio
+        """
+        self.audio = audio
+        self.chunks = chunks
+        # Start sample of each chunk in the concatenated audio, and the length of it at the end
+        self.offsets = [0]
+        for chunk in chunks:
+            self.offsets.append(self.offsets[-1] + chunk["end"] - chunk["start"])
+        self._array: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return self.offsets[-1]
+
+    @property
+    def shape(self):
+        return (len(self),)
+
+    @property
+    def size(self) -> int:
+        return len(self)
+
+    @property
+    def dtype(self):
+        return self.audio.dtype
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        """Views of the chunks"""
+        for chunk in self.chunks:
+            yield self.audio[chunk["start"]:chunk["end"]]
+
+    def __getitem__(self, item: slice) -> np.ndarray:
+        """
+        Slice of the concatenated audio. It's a view of the audio if the slice is within one chunk, otherwise only the
+        parts of the chunks in the slice are copied.
+        """
+        if not isinstance(item, slice):
+            raise TypeError(f"ChunkedAudio only supports the slices, not {type(item).__name__}")
+        start, stop, step = item.indices(len(self))
+        if self._array is not None or step != 1:
+            return self.materialize()[item]
+        if start >= stop:
+            return self.audio[:0]
+
+        parts = []
+        index = bisect.bisect_right(self.offsets, start) - 1
+        while index < len(self.chunks) and self.offsets[index] < stop:
+            chunk_start, offset = self.chunks[index]["start"], self.offsets[index]
+            parts.append(self.audio[chunk_start + max(start, offset) - offset:
+                                    chunk_start + min(stop, self.offsets[index + 1]) - offset])
+            index += 1
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        array = self.materialize()
+        if dtype is not None:
+            array = array.astype(dtype, copy=False)
+        return array.copy() if copy else array
+
+    def materialize(self) -> np.ndarray:
+        """Concatenate the chunks into one array for the consumers that need it. The array is kept and reused."""
+        if self._array is None:
+            self._array = self[:]
+        return self._array
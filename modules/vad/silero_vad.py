@@ -2,34 +2,43 @@
 
 from faster_whisper.vad import VadOptions, get_vad_model
 import numpy as np
-from typing import BinaryIO, Union, List, Optional, Tuple
+from typing import BinaryIO, Union, List, Optional, Tuple, Iterator, Iterable, Callable
 import warnings
+import math
 import bisect
 import faster_whisper
+from concurrent.futures import ThreadPoolExecutor
 from faster_whisper.transcribe import SpeechTimestampsMap
 import gradio as gr
 
 from modules.whisper.data_classes import *
+from modules.vad.chunked_audio import ChunkedAudio
+from modules.utils.audio_buffer import AudioBuffer
+
+# Maximum number of the windows in one call of the encoder
+ENCODER_BATCH_SIZE = 10000
 
 
 class SileroVAD:
     def __init__(self):
         self.sampling_rate = 16000
         self.window_size_samples = 512
+        # Samples of the previous window that are prepended to each window
+        self.context_size_samples = 64
         self.model = None
 
     def run(self,
-            audio: Union[str, BinaryIO, np.ndarray],
+            audio: Union[str, BinaryIO, np.ndarray, AudioBuffer],
             vad_parameters: VadOptions,
             progress: gr.Progress = gr.Progress()
-            ) -> Tuple[np.ndarray, List[dict]]:
+            ) -> Tuple[ChunkedAudio, List[dict]]:
         """
         Run VAD
 
         Parameters
         ----------
-        audio: Union[str, BinaryIO, np.ndarray]
-            Audio path or file binary or Audio numpy array
+        audio: Union[str, BinaryIO, np.ndarray, AudioBuffer]
+            Audio path or file binary or Audio numpy array or the audio buffer
         vad_parameters:
             Options for VAD processing.
         progress: gr.Progress
@@ -37,8 +46,8 @@ class SileroVAD:
 
         Returns
         ----------
-        np.ndarray
-            Pre-processed audio with VAD
+        ChunkedAudio
+            Pre-processed audio with VAD, which is the views of the speech chunks of the audio
         List[dict]
             Chunks of speeches to be used to restore the timestamps later
         """
@@ -46,7 +55,7 @@ class SileroVAD:
         sampling_rate = self.sampling_rate
 
         if not isinstance(audio, np.ndarray):
-            audio = faster_whisper.decode_audio(audio, sampling_rate=sampling_rate)
+            audio = AudioBuffer.wrap(audio).get(sampling_rate)
 
         duration = audio.shape[0] / sampling_rate
         duration_after_vad = duration
@@ -61,7 +70,7 @@ class SileroVAD:
             progress=progress
         )
 
-        audio = self.collect_chunks(audio, speech_chunks)
+        audio = ChunkedAudio(audio, speech_chunks)
         duration_after_vad = audio.shape[0] / sampling_rate
 
         return audio, speech_chunks
@@ -84,130 +93,327 @@ class SileroVAD:
         Returns:
           List of dicts containing begin and end samples of each speech chunk.
         """
+        return list(self.iter_speech_timestamps(audio=audio, vad_options=vad_options, **kwargs))
+
+    def get_speech_timestamps_batch(
+        self,
+        audios: List[Union[str, BinaryIO, np.ndarray]],
+        vad_options: Optional[VadOptions] = None,
+        batch_size: int = 64,
+        num_workers: int = 4,
+        progress: gr.Progress = gr.Progress(),
+    ) -> List[Optional[List[dict]]]:
+        """
+        Get the speech chunks of many files. The windows of up to `batch_size` files are stacked into shared calls
+        of the model instead of calling the model file by file. While the model runs on a batch, the files of the
+        next batch are decoded and the speech chunks of the previous batch are detected by the threads, and the
+        encoder calls of the batch are spread over the threads too.
+        The chunks are the same as the ones of `get_speech_timestamps()` for each file.
+        All the windows of a batch are kept in memory, so it's meant for many short files rather than long ones.
+        A file that fails to decode gets None instead of failing the other files.
 
+        Parameters
+        ----------
+        audios: List[Union[str, BinaryIO, np.ndarray]]
+            Audio paths or file binaries or audio numpy arrays
+        vad_options: Optional[VadOptions]
+            Options for VAD processing.
+        batch_size: int
+            Number of the files whose windows are run by the model at once
+        num_workers: int
+            Number of the threads that decode the files and detect the speech chunks
+        progress: gr.Progress
+            Indicator to show progress directly in gradio.
+
+        Returns
+        ----------
+        List[Optional[List[dict]]]
+            Begin and end samples of the speech chunks of each file, or None if the file couldn't be decoded
+        """
         if self.model is None:
             self.update_model()
-
         if vad_options is None:
-            vad_options = VadOptions(**kwargs)
+            vad_options = VadOptions()
+
+        def load_audio(audio: Union[str, BinaryIO, np.ndarray]) -> Optional[np.ndarray]:
+            if isinstance(audio, np.ndarray):
+                return audio
+            try:
+                return faster_whisper.decode_audio(audio, sampling_rate=self.sampling_rate)
+            except Exception as e:
+                print(f"Error while decoding the audio for VAD, it's skipped: {e}")
+                return None
+
+        def detect_speeches(speech_probs: np.ndarray, audio_length_samples: int) -> List[dict]:
+            return list(self.detect_speeches(
+                prob_blocks=[(0, len(speech_probs) * self.window_size_samples, speech_probs)],
+                audio_length_samples=audio_length_samples,
+                vad_options=vad_options
+            ))
+
+        batches = [audios[i:i + batch_size] for i in range(0, len(audios), batch_size)]
+        with ThreadPoolExecutor(max_workers=max(1, num_workers), thread_name_prefix="vad-batch") as executor:
+            loading = [executor.submit(load_audio, audio) for audio in batches[0]] if batches else []
+            detecting = []
+            for index in range(len(batches)):
+                batch = [future.result() for future in loading]
+                if index + 1 < len(batches):
+                    loading = [executor.submit(load_audio, audio) for audio in batches[index + 1]]
+
+                progress(index / len(batches), desc=f"Detecting speech of {len(audios)} files..")
+                decoded = [audio for audio in batch if audio is not None]
+                batch_speech_probs = iter(self.get_batch_speech_probs(decoded, executor, num_workers))
+                for audio in batch:
+                    if audio is None:
+                        detecting.append(None)
+                    else:
+                        detecting.append(executor.submit(detect_speeches, next(batch_speech_probs), len(audio)))
+                del batch, decoded
 
-        threshold = vad_options.threshold
-        neg_threshold = vad_options.neg_threshold
-        min_speech_duration_ms = vad_options.min_speech_duration_ms
-        max_speech_duration_s = vad_options.max_speech_duration_s
-        min_silence_duration_ms = vad_options.min_silence_duration_ms
-        window_size_samples = self.window_size_samples
-        speech_pad_ms = vad_options.speech_pad_ms
-        min_speech_samples = self.sampling_rate * min_speech_duration_ms / 1000
-        speech_pad_samples = self.sampling_rate * speech_pad_ms / 1000
-        max_speech_samples = (
-                self.sampling_rate * max_speech_duration_s
-                - window_size_samples
-                - 2 * speech_pad_samples
-        )
-        min_silence_samples = self.sampling_rate * min_silence_duration_ms / 1000
-        min_silence_samples_at_max_speech = self.sampling_rate * 98 / 1000
+            return [None if future is None else future.result() for future in detecting]
 
-        audio_length_samples = len(audio)
+    def iter_speech_timestamps(
+        self,
+        audio: np.ndarray,
+        vad_options: Optional[VadOptions] = None,
+        block_duration: float = 30,
+        **kwargs,
+    ) -> Iterator[dict]:
+        """
+        Generate the speech chunks as soon as they're closed. The audio is fed to the model block by block with
+        the state of the model carried across the blocks, so the memory doesn't grow with the duration of the audio
+        and the first chunks are available before the whole audio is processed.
+        The chunks are the same as the ones of running the model on the whole audio at once.
 
-        padded_audio = np.pad(
-            audio, (0, window_size_samples - audio.shape[0] % window_size_samples)
-        )
-        speech_probs = self.model(padded_audio.reshape(1, -1)).squeeze(0)
+        Parameters
+        ----------
+        audio: np.ndarray
+            One dimensional float array with the sampling rate of 16000. It can be a memory-mapped array.
+        vad_options: Optional[VadOptions]
+            Options for VAD processing.
+        block_duration: float
+            Duration in seconds of the audio that is fed to the model at once.
+        kwargs:
+            VAD options passed as keyword arguments for backward compatibility.
 
-        triggered = False
-        speeches = []
-        current_speech = {}
-        if neg_threshold is None:
-            neg_threshold = max(threshold - 0.15, 0.01)
+        Returns
+        ----------
+        Iterator[dict]
+            Begin and end samples of each speech chunk
+        """
 
-        # to save potential segment end (and tolerate some silence)
-        temp_end = 0
-        # to save potential segment limits in case of maximum segment size reached
-        prev_end = next_start = 0
+        if self.model is None:
+            self.update_model()
 
-        for i, speech_prob in enumerate(speech_probs):
-            if (speech_prob >= threshold) and temp_end:
-                temp_end = 0
-                if next_start < prev_end:
-                    next_start = window_size_samples * i
+        if vad_options is None:
+            vad_options = VadOptions(**kwargs)
 
-            if (speech_prob >= threshold) and not triggered:
-                triggered = True
-                current_speech["start"] = window_size_samples * i
-                continue
+        yield from self.detect_speeches(
+            prob_blocks=self.iter_speech_probs(audio, block_duration),
+            audio_length_samples=len(audio),
+            vad_options=vad_options
+        )
 
-            if (
-                    triggered
-                    and (window_size_samples * i) - current_speech["start"] > max_speech_samples
-            ):
-                if prev_end:
-                    current_speech["end"] = prev_end
-                    speeches.append(current_speech)
-                    current_speech = {}
-                    # previously reached silence (< neg_thres) and is still not speech (< thres)
-                    if next_start < prev_end:
-                        triggered = False
-                    else:
-                        current_speech["start"] = next_start
-                    prev_end = next_start = temp_end = 0
-                else:
-                    current_speech["end"] = window_size_samples * i
-                    speeches.append(current_speech)
-                    current_speech = {}
-                    prev_end = next_start = temp_end = 0
-                    triggered = False
-                    continue
-
-            if (speech_prob < neg_threshold) and triggered:
-                if not temp_end:
-                    temp_end = window_size_samples * i
-                # condition to avoid cutting in very short silence
-                if (window_size_samples * i) - temp_end > min_silence_samples_at_max_speech:
-                    prev_end = temp_end
-                if (window_size_samples * i) - temp_end < min_silence_samples:
-                    continue
-                else:
-                    current_speech["end"] = temp_end
-                    if (
-                            current_speech["end"] - current_speech["start"]
-                    ) > min_speech_samples:
-                        speeches.append(current_speech)
-                    current_speech = {}
-                    prev_end = next_start = temp_end = 0
-                    triggered = False
-                    continue
+    def iter_speech_probs(self,
+                          audio: np.ndarray,
+                          block_duration: float = 30) -> Iterator[Tuple[int, int, np.ndarray]]:
+        """
+        Generate the speech probabilities of the windows block by block, with the state of the model carried
+        across the blocks.
 
-        if (
-                current_speech
-                and (audio_length_samples - current_speech["start"]) > min_speech_samples
-        ):
-            current_speech["end"] = audio_length_samples
-            speeches.append(current_speech)
+        Returns
+        ----------
+        Iterator[Tuple[int, int, np.ndarray]]
+            Start and end samples of the block in the padded audio, and the speech probabilities of its windows
+        """
+        window_size_samples = self.window_size_samples
+        audio_length_samples = len(audio)
+        # The audio is padded with at least one sample to complete the last window
+        padded_length = audio_length_samples + window_size_samples - audio_length_samples % window_size_samples
+        block_size = max(1, int(block_duration * self.sampling_rate) // window_size_samples) * window_size_samples
+
+        state = np.zeros((2, 1, 128), dtype=np.float32)
+        context = np.zeros((1, self.context_size_samples), dtype=np.float32)
+        for block_start in range(0, padded_length, block_size):
+            block_end = min(block_start + block_size, padded_length)
+            block = np.asarray(audio[block_start:min(block_end, audio_length_samples)], dtype=np.float32)
+            if block_end == padded_length:
+                block = np.pad(block, (0, block_end - block_start - block.shape[0]))
+                # Same as running the model on the whole audio, which zeroes the end of the last window
+                block[-self.context_size_samples:] = 0
+            speech_probs, context, state = self.get_speech_probs(
+                block.reshape(-1, window_size_samples), context, state
+            )
+            yield block_start, block_end, speech_probs
+
+    def detect_speeches(self,
+                        prob_blocks: Iterable[Tuple[int, int, np.ndarray]],
+                        audio_length_samples: int,
+                        vad_options: VadOptions) -> Iterator[dict]:
+        """
+        Generate the padded speech chunks from the blocks of the speech probabilities of `iter_speech_probs()`
+        as soon as they're closed.
+        """
+        window_size_samples = self.window_size_samples
+        speech_pad_samples = self.sampling_rate * vad_options.speech_pad_ms / 1000
+        detector = SpeechDetector(vad_options, window_size_samples, self.sampling_rate)
+
+        # Speech whose end is not padded yet, since the padding depends on the start of the next speech
+        pending_speech = None
 
-        for i, speech in enumerate(speeches):
-            if i == 0:
+        def close_speech(speech: dict) -> Optional[dict]:
+            """Pad the pending speech with the next speech and return it if it's done"""
+            nonlocal pending_speech
+            done_speech = pending_speech
+            if done_speech is None:
                 speech["start"] = int(max(0, speech["start"] - speech_pad_samples))
-            if i != len(speeches) - 1:
-                silence_duration = speeches[i + 1]["start"] - speech["end"]
+            else:
+                silence_duration = speech["start"] - done_speech["end"]
                 if silence_duration < 2 * speech_pad_samples:
-                    speech["end"] += int(silence_duration // 2)
-                    speeches[i + 1]["start"] = int(
-                        max(0, speeches[i + 1]["start"] - silence_duration // 2)
-                    )
+                    done_speech["end"] += int(silence_duration // 2)
+                    speech["start"] = int(max(0, speech["start"] - silence_duration // 2))
                 else:
-                    speech["end"] = int(
-                        min(audio_length_samples, speech["end"] + speech_pad_samples)
-                    )
-                    speeches[i + 1]["start"] = int(
-                        max(0, speeches[i + 1]["start"] - speech_pad_samples)
-                    )
-            else:
-                speech["end"] = int(
-                    min(audio_length_samples, speech["end"] + speech_pad_samples)
-                )
+                    done_speech["end"] = int(min(audio_length_samples, done_speech["end"] + speech_pad_samples))
+                    speech["start"] = int(max(0, speech["start"] - speech_pad_samples))
+            pending_speech = speech
+            return done_speech
+
+        for block_start, block_end, speech_probs in prob_blocks:
+            speeches = detector.process(speech_probs, offset=block_start // window_size_samples)
+            for speech in speeches:
+                done_speech = close_speech(speech)
+                if done_speech is not None:
+                    yield done_speech
+
+            # The pending speech is fully padded if the next speech can't start within the padding
+            next_speech_start = detector.current_speech.get("start", block_end)
+            if (pending_speech is not None and
+                    min(next_speech_start, block_end) - pending_speech["end"] >= 2 * speech_pad_samples):
+                pending_speech["end"] = int(min(audio_length_samples, pending_speech["end"] + speech_pad_samples))
+                yield pending_speech
+                pending_speech = None
+
+        for speech in detector.finish(audio_length_samples):
+            done_speech = close_speech(speech)
+            if done_speech is not None:
+                yield done_speech
+
+        if pending_speech is not None:
+            pending_speech["end"] = int(min(audio_length_samples, pending_speech["end"] + speech_pad_samples))
+            yield pending_speech
+
+    def get_speech_probs(self,
+                         windows: np.ndarray,
+                         context: np.ndarray,
+                         state: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the speech probabilities of the consecutive windows of the audio.
 
-        return speeches
+        Parameters
+        ----------
+        windows: np.ndarray
+            Windows of the audio with the shape of (num_windows, window_size_samples)
+        context: np.ndarray
+            Last samples of the previous window with the shape of (1, context_size_samples)
+        state: np.ndarray
+            State of the model after the previous window
+
+        Returns
+        ----------
+        np.ndarray
+            Speech probability of each window
+        np.ndarray
+            Context for the next windows
+        np.ndarray
+            State of the model for the next windows
+        """
+        # Each window is prepended with the last samples of the previous window
+        contexts = np.concatenate([context, windows[:-1, -self.context_size_samples:]], axis=0)
+        encoder_output = self.model.encoder_session.run(
+            None, {"input": np.concatenate([contexts, windows], axis=1)}
+        )[0].reshape(windows.shape[0], -1)
+
+        speech_probs = np.empty(windows.shape[0], dtype=np.float32)
+        for i, window in enumerate(encoder_output):
+            out, state = self.model.decoder_session.run(
+                None, {"input": window[np.newaxis], "state": state}
+            )
+            speech_probs[i] = out.item()
+        return speech_probs, windows[-1:, -self.context_size_samples:].copy(), state
+
+    def get_batch_speech_probs(self,
+                               audios: List[np.ndarray],
+                               executor: Optional[ThreadPoolExecutor] = None,
+                               num_workers: int = 1) -> List[np.ndarray]:
+        """
+        Get the speech probabilities of the windows of several audios with the shared calls of the model.
+        The windows of all the audios are stacked into the calls of the encoder. The decoder is run once for each
+        window position with the state of all the audios that are long enough, which are sorted by the length so that
+        they're always the first ones of the state.
+
+        Parameters
+        ----------
+        audios: List[np.ndarray]
+            One dimensional float arrays with the sampling rate of 16000
+        executor: Optional[ThreadPoolExecutor]
+            Threads to run the encoder calls in parallel. Each call uses one thread of the CPU.
+        num_workers: int
+            Number of the threads of `executor`, which the windows are split into the encoder calls for
+
+        Returns
+        ----------
+        List[np.ndarray]
+            Speech probabilities of the windows of each audio, the same as the ones of `iter_speech_probs()`
+        """
+        if not audios:
+            return []
+        window_size_samples, context_size_samples = self.window_size_samples, self.context_size_samples
+        # The audio is padded with at least one sample to complete the last window
+        num_windows = np.array([len(audio) // window_size_samples + 1 for audio in audios], dtype=np.int64)
+        order = np.argsort(-num_windows, kind="stable")
+        starts = np.zeros(len(audios), dtype=np.int64)
+        starts[1:] = np.cumsum(num_windows[order])[:-1]
+
+        # Each window is prepended with the last samples of the previous window of the same audio
+        inputs = np.zeros((int(num_windows.sum()), context_size_samples + window_size_samples), dtype=np.float32)
+        for start, index in zip(starts, order):
+            audio, end = audios[index], start + num_windows[index]
+            full_windows = len(audio) // window_size_samples
+            windows = inputs[start:end, context_size_samples:]
+            windows[:full_windows] = np.reshape(audio[:full_windows * window_size_samples], (-1, window_size_samples))
+            windows[-1, :len(audio) - full_windows * window_size_samples] = audio[full_windows * window_size_samples:]
+            # Same as running the model on the whole audio, which zeroes the end of the last window
+            windows[-1, -context_size_samples:] = 0
+            inputs[start + 1:end, :context_size_samples] = windows[:-1, -context_size_samples:]
+
+        encoder_batch_size = ENCODER_BATCH_SIZE
+        if executor is not None:
+            encoder_batch_size = min(encoder_batch_size, math.ceil(len(inputs) / max(1, num_workers)))
+        encoder_batches = [inputs[i:i + encoder_batch_size] for i in range(0, len(inputs), encoder_batch_size)]
+
+        def run_encoder(batch: np.ndarray) -> np.ndarray:
+            return self.model.encoder_session.run(None, {"input": batch})[0]
+
+        encoder_output = np.concatenate(
+            list(map(run_encoder, encoder_batches) if executor is None else executor.map(run_encoder, encoder_batches))
+        ).reshape(len(inputs), -1)
+        del inputs
+
+        speech_probs = np.empty(len(encoder_output), dtype=np.float32)
+        sorted_num_windows = num_windows[order]
+        state = np.zeros((2, len(audios), 128), dtype=np.float32)
+        for i in range(int(sorted_num_windows[0]) if len(audios) else 0):
+            # Audios that have the window `i`
+            num_active = int(np.count_nonzero(sorted_num_windows > i))
+            out, state = self.model.decoder_session.run(
+                None, {"input": encoder_output[starts[:num_active] + i], "state": state[:, :num_active]}
+            )
+            speech_probs[starts[:num_active] + i] = out.reshape(-1)
+
+        results = [None] * len(audios)
+        for start, index in zip(starts, order):
+            results[index] = speech_probs[start:start + num_windows[index]]
+        return results
 
     def update_model(self):
         self.model = get_vad_model()
@@ -275,3 +481,184 @@ class SileroVAD:
 
         return segments
 
+
+class SpeechDetector:
+    """
+    Detect the speeches from the speech probabilities of the windows, with the thresholds of `VadOptions`.
+    The state is kept across the calls of `process()`, so the probabilities can be fed block by block.
+    Speeches are not padded here, since the padding depends on the next speech.
+    """
+    def __init__(self,
+                 vad_options: VadOptions,
+                 window_size_samples: int = 512,
+                 sampling_rate: int = 16000):
+        self.window_size_samples = window_size_samples
+        self.threshold = vad_options.threshold
+        self.neg_threshold = vad_options.neg_threshold
+        if self.neg_threshold is None:
+            self.neg_threshold = max(self.threshold - 0.15, 0.01)
+        speech_pad_samples = sampling_rate * vad_options.speech_pad_ms / 1000
+        self.min_speech_samples = sampling_rate * vad_options.min_speech_duration_ms / 1000
+        self.max_speech_samples = (
+                sampling_rate * vad_options.max_speech_duration_s
+                - window_size_samples
+                - 2 * speech_pad_samples
+        )
+        self.min_silence_samples = sampling_rate * vad_options.min_silence_duration_ms / 1000
+        self.min_silence_samples_at_max_speech = sampling_rate * 98 / 1000
+
+        self.triggered = False
+        self.current_speech = {}
+        # to save potential segment end (and tolerate some silence)
+        self.temp_end = 0
+        # to save potential segment limits in case of maximum segment size reached
+        self.prev_end = self.next_start = 0
+
+    def process(self, speech_probs: np.ndarray, offset: int = 0) -> List[dict]:
+        """
+        Get the speeches that are closed by the windows. Instead of stepping through every window, the windows are
+        grouped into the runs of speech, silence and the probabilities in between, and only the windows where
+        the state can change are stepped through: the starts of the runs and the windows where the durations
+        reach the limits of the options. The speeches are the same as stepping through every window.
+
+        Parameters
+        ----------
+        speech_probs: np.ndarray
+            Speech probabilities of the consecutive windows
+        offset: int
+            Index of the first window from the start of the audio
+
+        Returns
+        ----------
+        List[dict]
+            Start and end samples of the closed speeches
+        """
+        speeches = []
+        # Compared with the same precision as the probability of one window with the thresholds in `step()`
+        dtype = (speech_probs.dtype.type(0) + self.threshold).dtype
+        probs = speech_probs.astype(dtype, copy=False)
+        is_speech = probs >= dtype.type(self.threshold)
+        is_silence = probs < dtype.type(self.neg_threshold)
+        run_ends = np.append(
+            np.flatnonzero((is_speech[1:] != is_speech[:-1]) | (is_silence[1:] != is_silence[:-1])) + 1,
+            len(speech_probs)
+        )
+
+        i = 0
+        run = 0
+        while i < len(speech_probs):
+            while run_ends[run] <= i:
+                run += 1
+            run_end = int(run_ends[run])
+            event = self.find_event(offset + i, offset + run_end, bool(is_speech[i]), bool(is_silence[i])) - offset
+            if event >= run_end:
+                i = run_end
+                continue
+            self.step(offset + event, speech_probs[event], speeches)
+            i = event + 1
+        return speeches
+
+    def find_event(self, start: int, end: int, is_speech: bool, is_silence: bool) -> int:
+        """Index of the first window in the run from `start` to `end` where the state can change, or `end`"""
+        if is_speech and (is_silence or self.temp_end or not self.triggered):
+            return start
+        if not self.triggered:
+            return end
+
+        window_size_samples = self.window_size_samples
+        speech_start = self.current_speech["start"]
+        event = self.find_window(
+            start, end, speech_start + self.max_speech_samples,
+            lambda i: (window_size_samples * i) - speech_start > self.max_speech_samples
+        )
+        if is_silence:
+            temp_end = self.temp_end
+            if not temp_end:
+                return start
+            if self.prev_end != temp_end:
+                event = min(event, self.find_window(
+                    start, end, temp_end + self.min_silence_samples_at_max_speech,
+                    lambda i: (window_size_samples * i) - temp_end > self.min_silence_samples_at_max_speech
+                ))
+            event = min(event, self.find_window(
+                start, end, temp_end + self.min_silence_samples,
+                lambda i: not (window_size_samples * i) - temp_end < self.min_silence_samples
+            ))
+        return event
+
+    def find_window(self, start: int, end: int, position: float, reached: Callable[[int], bool]) -> int:
+        """Index of the first window from `start` to `end` where `reached` becomes true, around the `position`"""
+        if math.isinf(position):
+            return end
+        i = min(max(start, math.floor(position / self.window_size_samples)), end)
+        while i > start and reached(i - 1):
+            i -= 1
+        while i < end and not reached(i):
+            i += 1
+        return i
+
+    def step(self, i: int, speech_prob: float, speeches: List[dict]):
+        """Update the state with the window `i` and append the speech to `speeches` if it's closed"""
+        window_size_samples = self.window_size_samples
+        if (speech_prob >= self.threshold) and self.temp_end:
+            self.temp_end = 0
+            if self.next_start < self.prev_end:
+                self.next_start = window_size_samples * i
+
+        if (speech_prob >= self.threshold) and not self.triggered:
+            self.triggered = True
+            self.current_speech["start"] = window_size_samples * i
+            return
+
+        if (
+                self.triggered
+                and (window_size_samples * i) - self.current_speech["start"] > self.max_speech_samples
+        ):
+            if self.prev_end:
+                self.current_speech["end"] = self.prev_end
+                speeches.append(self.current_speech)
+                self.current_speech = {}
+                # previously reached silence (< neg_thres) and is still not speech (< thres)
+                if self.next_start < self.prev_end:
+                    self.triggered = False
+                else:
+                    self.current_speech["start"] = self.next_start
+                self.prev_end = self.next_start = self.temp_end = 0
+            else:
+                self.current_speech["end"] = window_size_samples * i
+                speeches.append(self.current_speech)
+                self.current_speech = {}
+                self.prev_end = self.next_start = self.temp_end = 0
+                self.triggered = False
+                return
+
+        if (speech_prob < self.neg_threshold) and self.triggered:
+            if not self.temp_end:
+                self.temp_end = window_size_samples * i
+            # condition to avoid cutting in very short silence
+            if (window_size_samples * i) - self.temp_end > self.min_silence_samples_at_max_speech:
+                self.prev_end = self.temp_end
+            if (window_size_samples * i) - self.temp_end < self.min_silence_samples:
+                return
+            else:
+                self.current_speech["end"] = self.temp_end
+                if (
+                        self.current_speech["end"] - self.current_speech["start"]
+                ) > self.min_speech_samples:
+                    speeches.append(self.current_speech)
+                self.current_speech = {}
+                self.prev_end = self.next_start = self.temp_end = 0
+                self.triggered = False
+                return
+
+    def finish(self, audio_length_samples: int) -> List[dict]:
+        """Close the speech in progress at the end of the audio"""
+        speeches = []
+        if (
+                self.current_speech
+                and (audio_length_samples - self.current_speech["start"]) > self.min_speech_samples
+        ):
+            self.current_speech["end"] = audio_length_samples
+            speeches.append(self.current_speech)
+        self.current_speech = {}
+        return speeches
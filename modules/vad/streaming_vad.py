@@ -0,0 +1,88 @@
+from typing import List, Optional, Tuple
+import numpy as np
+from faster_whisper.vad import VadOptions
+
+from modules.vad.silero_vad import SileroVAD, SpeechDetector
+
+
+class StreamingVAD:
+    """
+    Silero VAD for the live audio. Only the new frames are fed to the model, with the state of the model and the
+    context samples kept from the previous frames, so the speech probabilities are the same as running the VAD
+    on the whole audio at once.
+    Speeches are detected by `SpeechDetector` with the same state machine as `SileroVAD.get_speech_timestamps()`,
+    but they're returned as soon as the silence after them is long enough.
+    """
+
+    def __init__(self,
+                 vad: Optional[SileroVAD] = None,
+                 vad_options: Optional[VadOptions] = None):
+        self.vad = vad if vad is not None else SileroVAD()
+        if self.vad.model is None:
+            self.vad.update_model()
+        self.vad_options = vad_options if vad_options is not None else VadOptions()
+        self.window_size_samples = self.vad.window_size_samples
+        self.sampling_rate = self.vad.sampling_rate
+        self.speech_pad_samples = int(self.sampling_rate * self.vad_options.speech_pad_ms / 1000)
+
+        self.state = np.zeros((2, 1, 128), dtype=np.float32)
+        self.context = np.zeros((1, self.vad.context_size_samples), dtype=np.float32)
+        self.remainder = np.zeros(0, dtype=np.float32)
+        # Number of samples that are processed by the model
+        self.num_samples = 0
+
+        self.detector = SpeechDetector(self.vad_options, self.window_size_samples, self.sampling_rate)
+        # Padded end of the last returned speech, which the padding of the next speech doesn't go over
+        self.last_end = 0
+
+    @property
+    def speech_start(self) -> Optional[int]:
+        """Start sample of the speech in progress, without the padding"""
+        return self.detector.current_speech.get("start")
+
+    def get_speech_probs(self, audio: np.ndarray) -> np.ndarray:
+        """Get the speech probabilities of the completed windows of the new frames"""
+        audio = np.concatenate([self.remainder, audio.astype(np.float32)])
+        num_windows = audio.shape[0] // self.window_size_samples
+        self.remainder = audio[num_windows * self.window_size_samples:]
+        if num_windows == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        windows = audio[:num_windows * self.window_size_samples].reshape(num_windows, self.window_size_samples)
+        probs, self.context, self.state = self.vad.get_speech_probs(windows, self.context, self.state)
+        return probs
+
+    def feed(self, audio: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        Feed the new frames of the audio.
+
+        Parameters
+        ----------
+        audio: np.ndarray
+            New frames of the audio with the sampling rate of 16000
+
+        Returns
+        ----------
+        List[Tuple[int, int]]
+            Start and end samples of the completed speeches, with the padding
+        """
+        speech_probs = self.get_speech_probs(audio)
+        offset = self.num_samples // self.window_size_samples
+        self.num_samples += speech_probs.shape[0] * self.window_size_samples
+        return [self.pad_speech(speech) for speech in self.detector.process(speech_probs, offset=offset)]
+
+    def flush(self) -> List[Tuple[int, int]]:
+        """Complete the speech in progress at the end of the audio"""
+        speeches = [self.pad_speech(speech) for speech in self.detector.finish(self.num_samples)]
+        self.detector = SpeechDetector(self.vad_options, self.window_size_samples, self.sampling_rate)
+        return speeches
+
+    def pad_speech(self, speech: dict) -> Tuple[int, int]:
+        """
+        Pad the speech, which is returned before the next speech is known. So unlike `get_speech_timestamps()`,
+        the start is padded up to the end of the previous speech instead of splitting the silence between them.
+        """
+        start = int(max(min(self.last_end, speech["start"]), speech["start"] - self.speech_pad_samples))
+        end = int(min(self.num_samples, speech["end"] + self.speech_pad_samples))
+        self.last_end = end
+        return start, end
@@ -2,15 +2,14 @@ import os
 import whisper
 import ctranslate2
 import gradio as gr
-import torchaudio
 from abc import ABC, abstractmethod
-from typing import BinaryIO, Union, Tuple, List
+from typing import BinaryIO, Union, Tuple, List, Iterable, Iterator, Optional
 import numpy as np
 from datetime import datetime
 from faster_whisper.vad import VadOptions
 import gc
+import time
 
-from modules.uvr.music_separator import MusicSeparator
 from modules.utils.paths import (WHISPER_MODELS_DIR, DIARIZATION_MODELS_DIR, OUTPUT_DIR, DEFAULT_PARAMETERS_CONFIG_PATH,
                                  UVR_MODELS_DIR)
 from modules.utils.constants import *
@@ -18,8 +17,11 @@ from modules.utils.subtitle_manager import *
 from modules.utils.youtube_manager import get_ytdata, get_ytaudio
 from modules.utils.files_manager import get_media_files, format_gradio_files, load_yaml, save_yaml, read_file
 from modules.whisper.data_classes import *
-from modules.diarize.diarizer import Diarizer
+from modules.whisper.model_registry import ModelRegistry, estimate_model_memory
+from modules.utils.stage_cache import StageCache
+from modules.utils.audio_buffer import AudioBuffer
 from modules.vad.silero_vad import SileroVAD
+from modules.vad.chunked_audio import ChunkedAudio
 
 
 class BaseTranscriptionPipeline(ABC):
@@ -33,16 +35,15 @@ class BaseTranscriptionPipeline(ABC):
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
         os.makedirs(self.model_dir, exist_ok=True)
-        self.diarizer = Diarizer(
-            model_dir=diarization_model_dir
-        )
+        self.diarization_model_dir = diarization_model_dir
+        self.uvr_model_dir = uvr_model_dir
+        self._diarizer = None
         self.vad = SileroVAD()
-        self.music_separator = MusicSeparator(
-            model_dir=uvr_model_dir,
-            output_dir=os.path.join(output_dir, "UVR")
-        )
+        self._music_separator = None
+        self._stage_cache: Optional[StageCache] = None
+        self.enable_stage_cache = True
 
-        self.model = None
+        self.model_registry = ModelRegistry()
         self.current_model_size = None
         self.available_models = whisper.available_models()
         self.available_langs = sorted(list(whisper.tokenizer.LANGUAGES.values()))
@@ -50,6 +51,43 @@ class BaseTranscriptionPipeline(ABC):
         self.available_compute_types = self.get_available_compute_type()
         self.current_compute_type = self.get_compute_type()
 
+    @property
+    def diarizer(self):
+        """Diarizer, which is created on first use so that pyannote is not imported until it's needed"""
+        if self._diarizer is None:
+            from modules.diarize.diarizer import Diarizer
+            self._diarizer = Diarizer(
+                model_dir=self.diarization_model_dir
+            )
+        return self._diarizer
+
+    @property
+    def music_separator(self):
+        """Music separator, which is created on first use so that uvr is not imported until it's needed"""
+        if self._music_separator is None:
+            from modules.uvr.music_separator import MusicSeparator
+            self._music_separator = MusicSeparator(
+                model_dir=self.uvr_model_dir,
+                output_dir=os.path.join(self.output_dir, "UVR")
+            )
+        return self._music_separator
+
+    @property
+    def stage_cache(self) -> Optional[StageCache]:
+        """
+        Cache of the UVR, the VAD and the diarization outputs that are reused across the runs. The default cache is
+        created on first use, so that it doesn't evict the outputs before the configured cache is set.
+        Set to None to disable it.
+        """
+        if self._stage_cache is None and self.enable_stage_cache:
+            self._stage_cache = StageCache()
+        return self._stage_cache
+
+    @stage_cache.setter
+    def stage_cache(self, stage_cache: Optional[StageCache]):
+        self._stage_cache = stage_cache
+        self.enable_stage_cache = stage_cache is not None
+
     @abstractmethod
     def transcribe(self,
                    audio: Union[str, BinaryIO, np.ndarray],
@@ -59,17 +97,58 @@ class BaseTranscriptionPipeline(ABC):
         """Inference whisper model to transcribe"""
         pass
 
+    def transcribe_stream(self,
+                          audio: Union[str, BinaryIO, np.ndarray],
+                          progress: gr.Progress = gr.Progress(),
+                          *whisper_params,
+                          ) -> Iterator[Segment]:
+        """
+        Generate the segments as soon as they are transcribed.
+        Implementations that can't generate the segments lazily yield all the segments after `transcribe()`.
+        """
+        segments, elapsed_time = self.transcribe(audio, progress, *whisper_params)
+        yield from segments
+
     @abstractmethod
+    def load_model(self,
+                   model_size: str,
+                   compute_type: str,
+                   progress: gr.Progress = gr.Progress()
+                   ):
+        """Load whisper model. The loaded model is kept in `model_registry`"""
+        pass
+
     def update_model(self,
                      model_size: str,
                      compute_type: str,
                      progress: gr.Progress = gr.Progress()
                      ):
-        """Initialize whisper model"""
-        pass
+        """Initialize whisper model and set it as the current model"""
+        with self.use_model(model_size, compute_type, progress):
+            self.current_model_size = model_size
+            self.current_compute_type = compute_type
+
+    def use_model(self,
+                  model_size: str,
+                  compute_type: str,
+                  progress: gr.Progress = gr.Progress()):
+        """
+        Use the model from `model_registry` within the `with` statement. The model is loaded if it's not loaded yet,
+        and it's not evicted from the registry until the `with` statement ends.
+        """
+        return self.model_registry.use(
+            key=(self.__class__.__name__, model_size, compute_type),
+            loader=lambda: self.load_model(model_size, compute_type, progress),
+            size=estimate_model_memory(model_size, compute_type)
+        )
+
+    @property
+    def model(self):
+        """Current model, or None if it's not loaded"""
+        return self.model_registry.get((self.__class__.__name__, self.current_model_size, self.current_compute_type))
 
     def run(self,
-            audio: Union[str, BinaryIO, np.ndarray],
+            audio: Union[str, BinaryIO, np.ndarray, AudioBuffer],
             progress: gr.Progress = gr.Progress(),
             file_format: str = "SRT",
             add_timestamp: bool = True,
@@ -83,8 +162,9 @@ class BaseTranscriptionPipeline(ABC):
 
         Parameters
         ----------
-        audio: Union[str, BinaryIO, np.ndarray]
-            Audio input. This can be file path or binary type.
+        audio: Union[str, BinaryIO, np.ndarray, AudioBuffer]
+            Audio input. This can be file path or binary type. It's decoded once into `AudioBuffer` for all the
+            stages, and `AudioBuffer.decode_count` of the given buffer shows how many times it's decoded.
         progress: gr.Progress
             Indicator to show progress directly in gradio.
         file_format: str
@@ -105,48 +185,9 @@ class BaseTranscriptionPipeline(ABC):
         """
         params = TranscriptionPipelineParams.from_list(list(pipeline_params))
         params = self.validate_gradio_values(params)
-        bgm_params, vad_params, whisper_params, diarization_params = params.bgm_separation, params.vad, params.whisper, params.diarization
-
-        if bgm_params.is_separate_bgm:
-            music, audio, _ = self.music_separator.separate(
-                audio=audio,
-                model_name=bgm_params.uvr_model_size,
-                device=bgm_params.uvr_device,
-                segment_size=bgm_params.segment_size,
-                save_file=bgm_params.save_file,
-                progress=progress
-            )
-
-            if audio.ndim >= 2:
-                audio = audio.mean(axis=1)
-                if self.music_separator.audio_info is None:
-                    origin_sample_rate = 16000
-                else:
-                    origin_sample_rate = self.music_separator.audio_info.sample_rate
-                audio = self.resample_audio(audio=audio, original_sample_rate=origin_sample_rate)
-
-            if bgm_params.enable_offload:
-                self.music_separator.offload()
-
-        if vad_params.vad_filter:
-            vad_options = VadOptions(
-                threshold=vad_params.threshold,
-                min_speech_duration_ms=vad_params.min_speech_duration_ms,
-                max_speech_duration_s=vad_params.max_speech_duration_s,
-                min_silence_duration_ms=vad_params.min_silence_duration_ms,
-                speech_pad_ms=vad_params.speech_pad_ms
-            )
+        whisper_params, diarization_params = params.whisper, params.diarization
 
-            vad_processed, speech_chunks = self.vad.run(
-                audio=audio,
-                vad_parameters=vad_options,
-                progress=progress
-            )
-
-            if vad_processed.size > 0:
-                audio = vad_processed
-            else:
-                vad_params.vad_filter = False
+        audio, speech_chunks, audio_key = self.preprocess_audio(audio, params, progress)
 
         result, elapsed_time = self.transcribe(
             audio,
@@ -154,7 +195,7 @@ class BaseTranscriptionPipeline(ABC):
             *whisper_params.to_list()
         )
 
-        if vad_params.vad_filter:
+        if speech_chunks is not None:
             result = self.vad.restore_speech_timestamps(
                 segments=result,
                 speech_chunks=speech_chunks,
@@ -163,11 +204,11 @@ class BaseTranscriptionPipeline(ABC):
                 raise ValueError("VAD detected no speech segments in the audio.")
 
         if diarization_params.is_diarize:
-            result, elapsed_time_diarization = self.diarizer.run(
-                audio=audio,
-                use_auth_token=diarization_params.hf_token,
-                transcribed_result=result,
-                device=diarization_params.diarization_device
+            result, elapsed_time_diarization = self.diarize(
+                audio=self.get_original_audio(audio),
+                segments=result,
+                diarization_params=diarization_params,
+                audio_key=audio_key
             )
             elapsed_time += elapsed_time_diarization
 
@@ -178,6 +219,226 @@ class BaseTranscriptionPipeline(ABC):
         )
         return result, elapsed_time
 
+    def run_stream(self,
+                   audio: Union[str, BinaryIO, np.ndarray, AudioBuffer],
+                   progress: gr.Progress = gr.Progress(),
+                   file_format: str = "SRT",
+                   add_timestamp: bool = True,
+                   *pipeline_params,
+                   ) -> Iterator[Segment]:
+        """
+        Run transcription like `run()`, but generate the segments as soon as they are transcribed, with the
+        timestamps already restored from the VAD. The diarization needs the whole transcription, so the segments
+        are generated only after the diarization when it's enabled.
+        See `run()` for the parameters.
+
+        Returns
+        ----------
+        Iterator[Segment]
+            Segments that include start, end timestamps and transcribed text
+        """
+        params = TranscriptionPipelineParams.from_list(list(pipeline_params))
+        params = self.validate_gradio_values(params)
+        whisper_params, diarization_params = params.whisper, params.diarization
+
+        audio, speech_chunks, audio_key = self.preprocess_audio(audio, params, progress)
+
+        segments = self.transcribe_stream(
+            audio,
+            progress,
+            *whisper_params.to_list()
+        )
+        if speech_chunks is not None:
+            segments = self.restore_stream_timestamps(segments, speech_chunks)
+
+        if diarization_params.is_diarize:
+            segments, elapsed_time_diarization = self.diarize(
+                audio=self.get_original_audio(audio),
+                segments=list(segments),
+                diarization_params=diarization_params,
+                audio_key=audio_key
+            )
+
+        yield from segments
+
+        self.cache_parameters(
+            params=params,
+            file_format=file_format,
+            add_timestamp=add_timestamp
+        )
+
+    def preprocess_audio(self,
+                         audio: Union[str, BinaryIO, np.ndarray, AudioBuffer],
+                         params: TranscriptionPipelineParams,
+                         progress: gr.Progress = gr.Progress(),
+                         ) -> Tuple[Union[np.ndarray, ChunkedAudio], Optional[List[dict]], Optional[str]]:
+        """
+        Separate the background music and remove the non-speech parts from the audio, if enabled.
+        The audio is decoded once into `AudioBuffer` and shared by the stages.
+        The outputs of the stages are reused from `stage_cache` if the same audio was processed with the same
+        parameters before.
+
+        Returns
+        ----------
+        audio: Union[np.ndarray, ChunkedAudio]
+            Pre-processed mono audio of 16000 sampling rate. It's the views of the speech chunks of the audio if
+            the VAD is applied.
+        speech_chunks: Optional[List[dict]]
+            Speech chunks to restore the timestamps of the segments, or None if the VAD is not applied
+        audio_key: Optional[str]
+            Key of the audio before the VAD in `stage_cache`, or None if the cache is not used
+        """
+        bgm_params, vad_params = params.bgm_separation, params.vad
+        audio = AudioBuffer.wrap(audio)
+
+        audio_key = None
+        if self.stage_cache is not None and (bgm_params.is_separate_bgm or vad_params.vad_filter or
+                                             params.diarization.is_diarize):
+            audio_key = self.stage_cache.hash_audio(audio)
+
+        if bgm_params.is_separate_bgm:
+            audio, audio_key = self.separate_bgm(audio, bgm_params, audio_key, progress)
+
+        if vad_params.vad_filter:
+            vad_processed, speech_chunks = self.remove_non_speech(audio, vad_params, audio_key, progress)
+
+            if vad_processed.size > 0:
+                return vad_processed, speech_chunks, audio_key
+            vad_params.vad_filter = False
+
+        if isinstance(audio, AudioBuffer):
+            audio = audio.get()
+        return audio, None, audio_key
+
+    def separate_bgm(self,
+                     audio: AudioBuffer,
+                     bgm_params: BGMSeparationParams,
+                     audio_key: Optional[str] = None,
+                     progress: gr.Progress = gr.Progress(),
+                     ) -> Tuple[np.ndarray, Optional[str]]:
+        """
+        Get the vocals of the audio with UVR as a mono audio of 16000 sampling rate.
+        Returns the vocals and the key of them in `stage_cache`, which the following stages are keyed by.
+        """
+        key = None
+        if audio_key is not None:
+            key = self.stage_cache.get_key(
+                "uvr", audio_key, bgm_params.model_dump(include={"uvr_model_size", "segment_size"})
+            )
+            # Separated files are written only by running the model
+            vocals = None if bgm_params.save_file else self.stage_cache.get_audio("uvr", key)
+            if vocals is not None:
+                return vocals, key
+
+        music, vocals, _ = self.music_separator.separate(
+            audio=audio,
+            model_name=bgm_params.uvr_model_size,
+            device=bgm_params.uvr_device,
+            segment_size=bgm_params.segment_size,
+            save_file=bgm_params.save_file,
+            progress=progress
+        )
+
+        # The vocals have the native sampling rate and channels of the audio
+        if vocals.ndim >= 2:
+            vocals = vocals.mean(axis=1)
+        if audio.sample_rate != 16000:
+            vocals = self.resample_audio(audio=vocals, original_sample_rate=audio.sample_rate)
+
+        if bgm_params.enable_offload:
+            self.music_separator.offload()
+
+        if key is not None:
+            self.stage_cache.put_audio("uvr", key, vocals)
+        return vocals, key
+
+    def remove_non_speech(self,
+                          audio: Union[np.ndarray, AudioBuffer],
+                          vad_params: VadParams,
+                          audio_key: Optional[str] = None,
+                          progress: gr.Progress = gr.Progress(),
+                          ) -> Tuple[ChunkedAudio, List[dict]]:
+        """Get the speech chunks of the audio with the VAD, or from `stage_cache` if they're cached"""
+        key = None
+        if audio_key is not None:
+            key = self.stage_cache.get_key("vad", audio_key, vad_params.model_dump(exclude={"vad_filter"}))
+            speech_chunks = self.stage_cache.get_speech_chunks(key)
+            if speech_chunks is not None:
+                if isinstance(audio, AudioBuffer):
+                    audio = audio.get(self.vad.sampling_rate)
+                return ChunkedAudio(audio, speech_chunks), speech_chunks
+
+        vad_options = VadOptions(
+            threshold=vad_params.threshold,
+            min_speech_duration_ms=vad_params.min_speech_duration_ms,
+            max_speech_duration_s=vad_params.max_speech_duration_s,
+            min_silence_duration_ms=vad_params.min_silence_duration_ms,
+            speech_pad_ms=vad_params.speech_pad_ms
+        )
+
+        vad_processed, speech_chunks = self.vad.run(
+            audio=audio,
+            vad_parameters=vad_options,
+            progress=progress
+        )
+
+        if key is not None:
+            self.stage_cache.put_speech_chunks(key, speech_chunks)
+        return vad_processed, speech_chunks
+
+    def diarize(self,
+                audio: Union[str, BinaryIO, np.ndarray],
+                segments: List[Segment],
+                diarization_params: DiarizationParams,
+                audio_key: Optional[str] = None,
+                ) -> Tuple[List[Segment], float]:
+        """
+        Assign the speakers to the segments with the diarizer. The speaker turns are reused from `stage_cache`
+        if they're cached, so only the assignment to the new segments is done.
+        """
+        if audio_key is None:
+            return self.diarizer.run(
+                audio=audio,
+                use_auth_token=diarization_params.hf_token,
+                transcribed_result=segments,
+                device=diarization_params.diarization_device
+            )
+
+        start_time = time.time()
+        key = self.stage_cache.get_key("diarization", audio_key, {
+            "model": self.diarizer.model_name,
+            "device": diarization_params.diarization_device
+        })
+        speaker_turns = self.stage_cache.get_speaker_turns(key)
+        if speaker_turns is None:
+            speaker_turns = self.diarizer.diarize(
+                audio=audio,
+                use_auth_token=diarization_params.hf_token,
+                device=diarization_params.diarization_device
+            )
+            self.stage_cache.put_speaker_turns(key, speaker_turns)
+
+        segments = self.diarizer.assign_speakers(speaker_turns, segments)
+        return segments, time.time() - start_time
+
+    @staticmethod
+    def get_original_audio(audio: Union[np.ndarray, ChunkedAudio]) -> np.ndarray:
+        """Audio before the VAD, which matches the timestamps restored from the speech chunks"""
+        if isinstance(audio, ChunkedAudio):
+            return audio.audio
+        return audio
+
+    def restore_stream_timestamps(self,
+                                  segments: Iterable[Segment],
+                                  speech_chunks: List[dict]) -> Iterator[Segment]:
+        """Restore the timestamps of the segments from the VAD one by one as they are generated"""
+        has_speech = False
+        for segment in segments:
+            has_speech = True
+            yield self.vad.restore_speech_timestamps(segments=[segment], speech_chunks=speech_chunks)[0]
+        if not has_speech:
+            raise ValueError("VAD detected no speech segments in the audio.")
+
     def transcribe_file(self,
                         files: Optional[List] = None,
                         input_folder_path: Optional[str] = None,
@@ -246,18 +507,75 @@ class BaseTranscriptionPipeline(ABC):
                 )
                 files_info[file_name] = {"subtitle": read_file(file_path), "time_for_task": time_for_task, "path": file_path}
 
-            total_result = ''
-            total_time = 0
-            for file_name, info in files_info.items():
-                total_result += '------------------------------------\n'
-                total_result += f'{file_name}\n\n'
-                total_result += f'{info["subtitle"]}'
-                total_time += info["time_for_task"]
+            return self.format_files_result(files_info)
 
-            result_str = f"Done in {self.format_time(total_time)}! Subtitle is in the outputs folder.\n\n{total_result}"
-            result_file_path = [info['path'] for info in files_info.values()]
+        except Exception as e:
+            print(f"Error transcribing file: {e}")
+            raise
+        finally:
+            self.release_cuda_memory()
 
-            return result_str, result_file_path
+    def transcribe_file_stream(self,
+                               files: Optional[List] = None,
+                               input_folder_path: Optional[str] = None,
+                               file_format: str = "SRT",
+                               add_timestamp: bool = True,
+                               progress=gr.Progress(),
+                               *pipeline_params,
+                               ) -> Iterator[Tuple[str, Optional[List]]]:
+        """
+        Write subtitle file from Files like `transcribe_file()`, but show the segments in gr.Textbox() as soon as
+        they are transcribed. See `transcribe_file()` for the parameters.
+
+        Returns
+        ----------
+        result_str:
+            Partial result of transcription to return to gr.Textbox(), then the final result
+        result_file_path:
+            None until all the files are transcribed, then the output file paths to return to gr.Files()
+        """
+        try:
+            params = TranscriptionPipelineParams.from_list(list(pipeline_params))
+            writer_options = {
+                "highlight_words": True if params.whisper.word_timestamps else False
+            }
+
+            if input_folder_path:
+                files = get_media_files(input_folder_path)
+            if isinstance(files, str):
+                files = [files]
+            if files and isinstance(files[0], gr.utils.NamedString):
+                files = [file.name for file in files]
+
+            files_info = {}
+            for file in files:
+                file_name, file_ext = os.path.splitext(os.path.basename(file))
+                start_time = time.time()
+                transcribed_segments = []
+                partial_result = ""
+                for segment in self.run_stream(
+                    file,
+                    progress,
+                    file_format,
+                    add_timestamp,
+                    *pipeline_params,
+                ):
+                    transcribed_segments.append(segment)
+                    partial_result += f"[{format_timestamp(segment.start)} --> {format_timestamp(segment.end)}]{segment.text}\n"
+                    yield f"Transcribing {file_name}..\n\n{partial_result}", None
+
+                subtitle, file_path = generate_file(
+                    output_dir=self.output_dir,
+                    output_file_name=file_name,
+                    output_format=file_format,
+                    result=transcribed_segments,
+                    add_timestamp=add_timestamp,
+                    **writer_options
+                )
+                files_info[file_name] = {"subtitle": read_file(file_path), "time_for_task": time.time() - start_time,
+                                         "path": file_path}
+
+            yield self.format_files_result(files_info)
 
         except Exception as e:
             print(f"Error transcribing file: {e}")
@@ -496,14 +814,28 @@ class BaseTranscriptionPipeline(ABC):
             return list(ctranslate2.get_supported_compute_types("cpu"))
 
     def offload(self):
-        """Offload the model and free up the memory"""
-        if self.model is not None:
-            del self.model
-            self.model = None
+        """Offload the models that are not in use and free up the memory"""
+        self.model_registry.clear()
         if self.device == "cuda":
             self.release_cuda_memory()
         gc.collect()
 
+    @staticmethod
+    def format_files_result(files_info: Dict[str, Dict]) -> Tuple[str, List]:
+        """Get the result string and the output file paths of the transcribed files"""
+        total_result = ''
+        total_time = 0
+        for file_name, info in files_info.items():
+            total_result += '------------------------------------\n'
+            total_result += f'{file_name}\n\n'
+            total_result += f'{info["subtitle"]}'
+            total_time += info["time_for_task"]
+
+        result_str = (f"Done in {BaseTranscriptionPipeline.format_time(total_time)}! "
+                      f"Subtitle is in the outputs folder.\n\n{total_result}")
+        result_file_path = [info['path'] for info in files_info.values()]
+        return result_str, result_file_path
+
     @staticmethod
     def format_time(elapsed_time: float) -> str:
         """
@@ -642,6 +974,8 @@ class BaseTranscriptionPipeline(ABC):
                        new_sample_rate: int = 16000,
                        original_sample_rate: Optional[int] = None,) -> np.ndarray:
         """Resamples audio to 16k sample rate, standard on Whisper model"""
+        import torchaudio
+
         if isinstance(audio, str):
             audio, original_sample_rate = torchaudio.load(audio)
         else:
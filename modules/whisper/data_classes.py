@@ -327,7 +327,16 @@ class WhisperParams(BaseParams):
         gt=0,
         description="Number of segments for language detection"
     )
-    batch_size: int = Field(default=24, gt=0, description="Batch size for processing")
+    batch_size: int = Field(
+        default=24,
+        gt=0,
+        description="Batch size for processing. For faster-whisper, it's used only with `batched_inference`"
+    )
+    batched_inference: bool = Field(
+        default=False,
+        description="Decode the speech chunks in batches of `batch_size` with faster-whisper. It's much faster for the"
+                    " long audio, but the chunks are split by its own VAD and don't condition on the previous text"
+    )
 
     @field_validator('lang')
     def validate_lang(cls, v):
@@ -537,24 +546,33 @@ class WhisperParams(BaseParams):
             )
         ]
 
-        insanely_fast_whisper_inputs = [
+        batch_inputs = [
             gr.Number(
                 label="Batch Size",
                 value=defaults.get("batch_size", cls.__fields__["batch_size"].default),
                 precision=0,
-                info="Batch size for processing"
+                info="Batch size for processing. For faster-whisper, it's used only with the batched inference"
+            )
+        ]
+
+        batched_inference_inputs = [
+            gr.Checkbox(
+                label="Batched Inference",
+                value=defaults.get("batched_inference", cls.__fields__["batched_inference"].default),
+                info="Decode the speech chunks in batches. Faster for the long audio, but without the previous text"
+                     " as the prompt"
             )
         ]
 
         if whisper_type != WhisperImpl.FASTER_WHISPER.value:
-            for input_component in faster_whisper_inputs:
+            for input_component in faster_whisper_inputs + batched_inference_inputs:
                 input_component.visible = False
 
-        if whisper_type != WhisperImpl.INSANELY_FAST_WHISPER.value:
-            for input_component in insanely_fast_whisper_inputs:
+        if whisper_type not in (WhisperImpl.FASTER_WHISPER.value, WhisperImpl.INSANELY_FAST_WHISPER.value):
+            for input_component in batch_inputs:
                 input_component.visible = False
 
-        inputs += faster_whisper_inputs + insanely_fast_whisper_inputs
+        inputs += faster_whisper_inputs + batch_inputs + batched_inference_inputs
 
         return inputs
 
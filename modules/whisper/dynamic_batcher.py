@@ -0,0 +1,128 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import faster_whisper
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import TranscriptionOptions
+
+
+class BatchRequest:
+    """Windows of one transcription that wait to be decoded with the windows of the other transcriptions"""
+    def __init__(self, features: np.ndarray):
+        self.features = features
+        self.outputs: Optional[List[dict]] = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class BatchGroup:
+    """Requests that can be decoded together, which have the same model, tokenizer and decoding options"""
+    def __init__(self):
+        self.requests: List[BatchRequest] = []
+        self.size = 0
+        self.full = threading.Event()
+
+
+class DynamicBatcher:
+    """
+    Decode the 30 seconds windows from the concurrent transcriptions in one batch.
+    The first request of the batch waits up to `max_wait_ms` for the other requests, then decodes all the windows
+    gathered in the meantime on its own thread and scatters the outputs back to each request.
+    """
+    def __init__(self,
+                 max_batch_size: int = 16,
+                 max_wait_ms: float = 20):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.lock = threading.Lock()
+        self.groups: Dict[Tuple, BatchGroup] = {}
+        self.num_batches = 0
+        self.num_requests = 0
+
+    def generate(self,
+                 key: Tuple,
+                 features: np.ndarray,
+                 run_batch: Callable[[np.ndarray], List[dict]]) -> List[dict]:
+        """
+        Decode the features with the other requests that have the same key.
+
+        Args:
+            key: Key of the requests that can be decoded together.
+            features: Features of the windows with the shape of (windows, n_mels, frames).
+            run_batch: Function that decodes the stacked features and returns the output of each window.
+
+        Returns:
+            Output of each window of the features.
+        """
+        if features.shape[0] >= self.max_batch_size:
+            return run_batch(features)
+
+        request = BatchRequest(features)
+        with self.lock:
+            group = self.groups.get(key)
+            is_leader = group is None or group.size + features.shape[0] > self.max_batch_size
+            if is_leader:
+                if group is not None:
+                    # Flush the previous batch that has no room for the request
+                    group.full.set()
+                group = BatchGroup()
+                self.groups[key] = group
+            group.requests.append(request)
+            group.size += features.shape[0]
+            if group.size >= self.max_batch_size:
+                group.full.set()
+
+        if not is_leader:
+            request.done.wait()
+            if request.error is not None:
+                raise request.error
+            return request.outputs
+
+        group.full.wait(timeout=self.max_wait_ms / 1000)
+        with self.lock:
+            if self.groups.get(key) is group:
+                del self.groups[key]
+            self.num_batches += 1
+            self.num_requests += len(group.requests)
+
+        try:
+            outputs = run_batch(np.concatenate([r.features for r in group.requests], axis=0))
+            offset = 0
+            for r in group.requests:
+                r.outputs = outputs[offset:offset + r.features.shape[0]]
+                offset += r.features.shape[0]
+        except BaseException as e:
+            for r in group.requests:
+                r.error = e
+        finally:
+            for r in group.requests:
+                r.done.set()
+
+        if request.error is not None:
+            raise request.error
+        return request.outputs
+
+
+class DynamicBatchedInferencePipeline(faster_whisper.BatchedInferencePipeline):
+    """`BatchedInferencePipeline` that decodes its batches together with the other transcriptions in progress"""
+    def __init__(self, model: faster_whisper.WhisperModel, batcher: DynamicBatcher):
+        super().__init__(model=model)
+        self.batcher = batcher
+
+    def generate_segment_batched(self,
+                                 features: np.ndarray,
+                                 tokenizer: Tokenizer,
+                                 options: TranscriptionOptions):
+        # The encoder output is needed to align the words, which can't be split by the request
+        if options.word_timestamps:
+            return super().generate_segment_batched(features, tokenizer, options)
+
+        key = (id(self.model), tokenizer.task, tokenizer.language_code, repr(options))
+        outputs = self.batcher.generate(
+            key=key,
+            features=features,
+            run_batch=lambda batch: super(DynamicBatchedInferencePipeline, self).generate_segment_batched(
+                batch, tokenizer, options
+            )[1]
+        )
+        return None, outputs
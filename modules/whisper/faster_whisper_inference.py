@@ -3,9 +3,9 @@ import time
 import huggingface_hub
 import numpy as np
 import torch
-from typing import BinaryIO, Union, Tuple, List
+from typing import BinaryIO, Union, Tuple, List, Iterable, Iterator
 import faster_whisper
-from faster_whisper.vad import VadOptions
+from faster_whisper.vad import VadOptions, merge_segments
 import ast
 import ctranslate2
 import whisper
@@ -15,6 +15,9 @@ from argparse import Namespace
 from modules.utils.paths import (FASTER_WHISPER_MODELS_DIR, DIARIZATION_MODELS_DIR, UVR_MODELS_DIR, OUTPUT_DIR)
 from modules.whisper.data_classes import *
 from modules.whisper.base_transcription_pipeline import BaseTranscriptionPipeline
+from modules.whisper.dynamic_batcher import DynamicBatcher, DynamicBatchedInferencePipeline
+from modules.whisper.sharded_transcription import ShardedTranscriber, SAMPLING_RATE, HOP_LENGTH, shift_segments
+from modules.vad.chunked_audio import ChunkedAudio
 
 
 class FasterWhisperInference(BaseTranscriptionPipeline):
@@ -32,6 +35,10 @@ class FasterWhisperInference(BaseTranscriptionPipeline):
         )
         self.model_dir = model_dir
         os.makedirs(self.model_dir, exist_ok=True)
+        # Set `DynamicBatcher` to decode the batches from the concurrent transcriptions together
+        self.batcher: Optional[DynamicBatcher] = None
+        # Set `ShardedTranscriber` to transcribe the long audio with the multiple processes on CPU
+        self.sharder: Optional[ShardedTranscriber] = None
 
         self.model_paths = self.get_model_paths()
         self.device = self.get_device()
@@ -44,6 +51,11 @@ class FasterWhisperInference(BaseTranscriptionPipeline):
                    ) -> Tuple[List[Segment], float]:
         """
         transcribe method for faster-whisper.
+        If `batched_inference` is enabled, the audio is split into the speech chunks and the chunks are decoded in
+        batches of `batch_size`, which is much faster for the long audio. Otherwise, the audio is decoded window by
+        window.
+        If `sharder` is set, the long audio is split at the silences and the shards are transcribed in parallel by
+        the worker processes instead.
 
         Parameters
         ----------
@@ -62,14 +74,22 @@ class FasterWhisperInference(BaseTranscriptionPipeline):
             elapsed time for transcription
         """
         start_time = time.time()
+        segments_result = list(self.transcribe_stream(audio, progress, *whisper_params))
+        elapsed_time = time.time() - start_time
+        return segments_result, elapsed_time
 
+    def transcribe_stream(self,
+                          audio: Union[str, BinaryIO, np.ndarray],
+                          progress: gr.Progress = gr.Progress(),
+                          *whisper_params,
+                          ) -> Iterator[Segment]:
+        """
+        Generate the segments as soon as they are decoded. See `transcribe()` for the parameters.
+        The model is kept in use until the generator is exhausted or closed.
+        """
         params = WhisperParams.from_list(list(whisper_params))
 
-        if params.model_size != self.current_model_size or self.model is None or self.current_compute_type != params.compute_type:
-            self.update_model(params.model_size, params.compute_type, progress)
-
-        segments, info = self.model.transcribe(
-            audio=audio,
+        transcribe_kwargs = dict(
             language=params.lang,
             task="translate" if params.is_translate else "transcribe",
             beam_size=params.beam_size,
@@ -98,23 +118,177 @@ class FasterWhisperInference(BaseTranscriptionPipeline):
             language_detection_segments=params.language_detection_segments,
             prompt_reset_on_temperature=params.prompt_reset_on_temperature,
         )
-        progress(0, desc="Loading audio..")
 
-        segments_result = []
+        if self.sharder is not None:
+            if not isinstance(audio, (np.ndarray, ChunkedAudio)):
+                audio = faster_whisper.decode_audio(audio)
+            if self.sharder.should_shard(audio):
+                segments = self.transcribe_sharded(audio, params, transcribe_kwargs, progress)
+                yield from self.iterate_segments(segments, audio.shape[0] / SAMPLING_RATE, progress)
+                return
+
+        # The model is kept in use until all the segments are generated
+        with self.use_model(params.model_size, params.compute_type, progress) as model:
+            self.current_model_size = params.model_size
+            self.current_compute_type = params.compute_type
+
+            if params.batched_inference:
+                if not isinstance(audio, (np.ndarray, ChunkedAudio)):
+                    audio = faster_whisper.decode_audio(audio)
+                clip_timestamps = self.get_batch_chunks(
+                    audio, params.chunk_length or model.feature_extractor.chunk_length, progress
+                )
+                if not clip_timestamps:
+                    return
+
+                segments = self.transcribe_batched(
+                    model, audio, clip_timestamps, params.batch_size, transcribe_kwargs
+                )
+                duration = audio.shape[0] / SAMPLING_RATE
+            else:
+                segments, info = model.transcribe(
+                    audio=audio.materialize() if isinstance(audio, ChunkedAudio) else audio,
+                    **transcribe_kwargs
+                )
+                duration = info.duration
+            progress(0, desc="Loading audio..")
+
+            yield from self.iterate_segments(segments, duration, progress)
+
+    def transcribe_batched(self,
+                           model: faster_whisper.WhisperModel,
+                           audio: Union[np.ndarray, ChunkedAudio],
+                           clip_timestamps: List[dict],
+                           batch_size: int,
+                           transcribe_kwargs: dict) -> Iterator[faster_whisper.transcribe.Segment]:
+        """
+        Transcribe the chunks batch by batch. The batched pipeline is run for each batch on the slice of the audio
+        that the batch covers, so only the slice is copied from `ChunkedAudio` and the features of only one batch
+        are kept at a time. The batches are the same as running the pipeline on the whole audio at once.
+
+        Parameters
+        ----------
+        model: faster_whisper.WhisperModel
+            Model to transcribe
+        audio: Union[np.ndarray, ChunkedAudio]
+            Audio with the sampling rate of 16000
+        clip_timestamps: List[dict]
+            Start and end samples of the chunks from `get_batch_chunks()`
+        batch_size: int
+            Number of the chunks decoded together
+        transcribe_kwargs: dict
+            Parameters of `faster_whisper.BatchedInferencePipeline.transcribe()`
+
+        Returns
+        ----------
+        Iterator[faster_whisper.transcribe.Segment]
+            Segments with the timestamps and the ids of the whole audio
+        """
+        pipeline = self.get_batched_model(model)
+        num_segments = 0
+        for i in range(0, len(clip_timestamps), batch_size):
+            batch = clip_timestamps[i:i + batch_size]
+            # The slice starts at a frame so that the frames and the rounded timestamps are the same as the whole audio
+            start, end = batch[0]["start"] // HOP_LENGTH * HOP_LENGTH, batch[-1]["end"]
+            segments, info = pipeline.transcribe(
+                audio=audio[start:end],
+                batch_size=batch_size,
+                vad_filter=False,
+                clip_timestamps=[{"start": chunk["start"] - start, "end": chunk["end"] - start} for chunk in batch],
+                **transcribe_kwargs
+            )
+            # The language detected from the first batch is used for all the batches
+            transcribe_kwargs = {**transcribe_kwargs, "language": info.language}
+            segments = shift_segments(list(segments), start, first_id=num_segments + 1)
+            num_segments += len(segments)
+            yield from segments
+
+    def transcribe_sharded(self,
+                           audio: Union[np.ndarray, ChunkedAudio],
+                           params: WhisperParams,
+                           transcribe_kwargs: dict,
+                           progress: gr.Progress = gr.Progress()) -> Iterator[faster_whisper.transcribe.Segment]:
+        """Transcribe the audio with the worker processes of `sharder`, which load the model by themselves"""
+        progress(0, desc="Initializing Model..")
+        model_path, local_files_only = self.get_model_path(params.model_size)
+        executor = self.sharder.get_executor(
+            model_path=model_path,
+            compute_type=params.compute_type,
+            download_root=self.model_dir,
+            local_files_only=local_files_only
+        )
+        self.current_model_size = params.model_size
+        self.current_compute_type = params.compute_type
+
+        speech_chunks = self.vad.get_speech_timestamps(
+            audio=audio,
+            vad_options=VadOptions(min_silence_duration_ms=500),
+            progress=progress
+        )
+        return self.sharder.transcribe(
+            audio=audio,
+            speech_chunks=speech_chunks,
+            executor=executor,
+            transcribe_kwargs=transcribe_kwargs
+        )
+
+    @staticmethod
+    def iterate_segments(segments: Iterable[faster_whisper.transcribe.Segment],
+                         duration: float,
+                         progress: gr.Progress = gr.Progress()) -> Iterator[Segment]:
         for segment in segments:
-            progress(segment.start / info.duration, desc="Transcribing..")
-            segments_result.append(Segment.from_faster_whisper(segment))
+            progress(segment.start / duration, desc="Transcribing..")
+            yield Segment.from_faster_whisper(segment)
 
-        elapsed_time = time.time() - start_time
-        return segments_result, elapsed_time
+    def get_batch_chunks(self,
+                         audio: Union[np.ndarray, ChunkedAudio],
+                         chunk_length: int = 30,
+                         progress: gr.Progress = gr.Progress()) -> List[dict]:
+        """
+        Split the audio into the speech chunks with Silero VAD and merge them up to `chunk_length` seconds,
+        so that each chunk fills one window of the model in the batched inference.
+
+        Parameters
+        ----------
+        audio: Union[np.ndarray, ChunkedAudio]
+            Audio with the sampling rate of 16000
+        chunk_length: int
+            Maximum length of the chunks in seconds. Defaults to 30 seconds, the window size of the model.
+        progress: gr.Progress
+            Indicator to show progress directly in gradio.
+
+        Returns
+        ----------
+        List[dict]
+            Start and end samples of the chunks
+        """
+        vad_options = VadOptions(
+            max_speech_duration_s=chunk_length,
+            min_silence_duration_ms=160
+        )
+        speech_chunks = self.vad.get_speech_timestamps(
+            audio=audio,
+            vad_options=vad_options,
+            progress=progress
+        )
+        return merge_segments(speech_chunks, vad_options)
+
+    def get_batched_model(self, model: faster_whisper.WhisperModel) -> faster_whisper.BatchedInferencePipeline:
+        """
+        Get the pipeline for the batched inference. It's created for each transcription because it has a state.
+        Batches are decoded together with the other transcriptions in progress if the dynamic batcher is set.
+        """
+        if self.batcher is not None:
+            return DynamicBatchedInferencePipeline(model=model, batcher=self.batcher)
+        return faster_whisper.BatchedInferencePipeline(model=model)
 
-    def update_model(self,
-                     model_size: str,
-                     compute_type: str,
-                     progress: gr.Progress = gr.Progress()
-                     ):
+    def load_model(self,
+                   model_size: str,
+                   compute_type: str,
+                   progress: gr.Progress = gr.Progress()
+                   ) -> faster_whisper.WhisperModel:
         """
-        Update current model setting
+        Load the model
 
         Parameters
         ----------
@@ -128,7 +302,27 @@ class FasterWhisperInference(BaseTranscriptionPipeline):
             Indicator to show progress directly in gradio.
         """
         progress(0, desc="Initializing Model..")
+        model_path, local_files_only = self.get_model_path(model_size)
+
+        return faster_whisper.WhisperModel(
+            device=self.device,
+            model_size_or_path=model_path,
+            download_root=self.model_dir,
+            compute_type=compute_type,
+            local_files_only=local_files_only
+        )
+
+    def get_model_path(self, model_size: str) -> Tuple[str, bool]:
+        """
+        Get the path of the model. The model is downloaded from huggingface if it's not detected.
 
+        Returns
+        ----------
+        model_path: str
+            Path or name of the model to load
+        local_files_only: bool
+            Whether the model is already downloaded
+        """
         model_size_dirname = model_size.replace("/", "--") if "/" in model_size else model_size
         if model_size not in self.model_paths and model_size_dirname not in self.model_paths:
             print(f"Model is not detected. Trying to download \"{model_size}\" from huggingface to "
@@ -140,23 +334,15 @@ class FasterWhisperInference(BaseTranscriptionPipeline):
             self.model_paths = self.get_model_paths()
             gr.Info(f"Model is downloaded with the name \"{model_size_dirname}\"")
 
-        self.current_model_size = self.model_paths[model_size_dirname]
+        model_path = self.model_paths[model_size_dirname]
 
         local_files_only = False
         hf_prefix = "models--Systran--faster-whisper-"
         official_model_path = os.path.join(self.model_dir, hf_prefix+model_size)
-        if ((os.path.isdir(self.current_model_size) and os.path.exists(self.current_model_size)) or
+        if ((os.path.isdir(model_path) and os.path.exists(model_path)) or
             (model_size in faster_whisper.available_models() and os.path.exists(official_model_path))):
             local_files_only = True
-
-        self.current_compute_type = compute_type
-        self.model = faster_whisper.WhisperModel(
-            device=self.device,
-            model_size_or_path=self.current_model_size,
-            download_root=self.model_dir,
-            compute_type=self.current_compute_type,
-            local_files_only=local_files_only
-        )
+        return model_path, local_files_only
 
     def get_model_paths(self):
         """
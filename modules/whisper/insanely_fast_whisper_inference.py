@@ -13,6 +13,7 @@ from argparse import Namespace
 
 from modules.utils.paths import (INSANELY_FAST_WHISPER_MODELS_DIR, DIARIZATION_MODELS_DIR, UVR_MODELS_DIR, OUTPUT_DIR)
 from modules.whisper.data_classes import *
+from modules.vad.chunked_audio import ChunkedAudio
 from modules.whisper.base_transcription_pipeline import BaseTranscriptionPipeline
 
 
@@ -61,15 +62,14 @@ class InsanelyFastWhisperInference(BaseTranscriptionPipeline):
         start_time = time.time()
         params = WhisperParams.from_list(list(whisper_params))
 
-        if params.model_size != self.current_model_size or self.model is None or self.current_compute_type != params.compute_type:
-            self.update_model(params.model_size, params.compute_type, progress)
-
         progress(0, desc="Transcribing...Progress is not shown in insanely-fast-whisper.")
-        with Progress(
+        with self.use_model(params.model_size, params.compute_type, progress) as model, Progress(
                 TextColumn("[progress.description]{task.description}"),
                 BarColumn(style="yellow1", pulse_style="white"),
                 TimeElapsedColumn(),
         ) as progress:
+            self.current_model_size = params.model_size
+            self.current_compute_type = params.compute_type
             progress.add_task("[yellow]Transcribing...", total=None)
 
             kwargs = {
@@ -79,14 +79,14 @@ class InsanelyFastWhisperInference(BaseTranscriptionPipeline):
                 "logprob_threshold": params.log_prob_threshold,
             }
 
-            if self.current_model_size.endswith(".en"):
+            if params.model_size.endswith(".en"):
                 pass
             else:
                 kwargs["language"] = params.lang
                 kwargs["task"] = "translate" if params.is_translate else "transcribe"
 
-            segments = self.model(
-                inputs=audio,
+            segments = model(
+                inputs=audio.materialize() if isinstance(audio, ChunkedAudio) else audio,
                 return_timestamps=True,
                 chunk_length_s=params.chunk_length,
                 batch_size=params.batch_size,
@@ -107,13 +107,13 @@ class InsanelyFastWhisperInference(BaseTranscriptionPipeline):
         elapsed_time = time.time() - start_time
         return segments_result, elapsed_time
 
-    def update_model(self,
-                     model_size: str,
-                     compute_type: str,
-                     progress: gr.Progress = gr.Progress(),
-                     ):
+    def load_model(self,
+                   model_size: str,
+                   compute_type: str,
+                   progress: gr.Progress = gr.Progress(),
+                   ):
         """
-        Update current model setting
+        Load the model
 
         Parameters
         ----------
@@ -134,12 +134,10 @@ class InsanelyFastWhisperInference(BaseTranscriptionPipeline):
                 progress=progress
             )
 
-        self.current_compute_type = compute_type
-        self.current_model_size = model_size
-        self.model = pipeline(
+        return pipeline(
             "automatic-speech-recognition",
             model=os.path.join(self.model_dir, model_size),
-            torch_dtype=self.current_compute_type,
+            torch_dtype=compute_type,
             device=self.device,
             model_kwargs={"attn_implementation": "flash_attention_2"} if is_flash_attn_2_available() else {"attn_implementation": "sdpa"},
         )
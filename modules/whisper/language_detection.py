@@ -0,0 +1,146 @@
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+import numpy as np
+import whisper
+from faster_whisper.vad import VadOptions
+from pydantic import BaseModel, Field
+
+from modules.whisper.faster_whisper_inference import FasterWhisperInference
+from modules.vad.chunked_audio import ChunkedAudio
+
+
+class LanguageDetectionParams(BaseModel):
+    """Language detection parameters"""
+    duration: float = Field(default=30, gt=0, description="Seconds of the speech from the start to detect the language")
+
+
+class LanguageDetectionResult(BaseModel):
+    language: str = Field(..., description="Language code of the detected language")
+    language_name: str = Field(..., description="Name of the detected language")
+    probability: float = Field(..., description="Probability of the detected language")
+    language_probs: Dict[str, float] = Field(
+        default_factory=dict, description="Probabilities of the most likely languages"
+    )
+
+
+class LanguageDetector:
+    """
+    Detect the language from the first seconds of the speech with a small model, which is much faster than letting
+    the large model detect the language before the transcription.
+    The detection model is loaded apart from the models of the pipeline so that it doesn't evict them, and the
+    results are cached by the key of the audio, which is looked up before running the VAD.
+    """
+    def __init__(self,
+                 pipeline: FasterWhisperInference,
+                 model_size: str = "tiny",
+                 compute_type: Optional[str] = None,
+                 duration: float = 30,
+                 cache_size: int = 1000):
+        """
+        Parameters
+        ----------
+        pipeline: FasterWhisperInference
+            Pipeline to load the detection model and to reuse the VAD
+        model_size: str
+            Model to detect the language. Multilingual model is needed, not ".en" models.
+        compute_type: Optional[str]
+            Compute type of the detection model. Defaults to the compute type of the pipeline.
+        duration: float
+            Default seconds of the speech from the start to detect the language
+        cache_size: int
+            Maximum number of the cached results
+        """
+        self.pipeline = pipeline
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.duration = duration
+        self.cache_size = cache_size
+        self.cache: OrderedDict[str, LanguageDetectionResult] = OrderedDict()
+        self.model = None
+        self.lock = threading.Lock()
+
+    def detect(self,
+               audio: np.ndarray,
+               duration: Optional[float] = None,
+               audio_key: Optional[str] = None) -> LanguageDetectionResult:
+        """
+        Detect the language of the audio.
+
+        Parameters
+        ----------
+        audio: np.ndarray
+            Audio numpy array with the sampling rate of 16000
+        duration: Optional[float]
+            Seconds of the speech from the start to detect the language. Defaults to `duration` of the detector.
+        audio_key: Optional[str]
+            Hash of the audio to cache the result, e.g. the content hash of the task. Defaults to the hash of the
+            beginning of the audio that is passed to the VAD.
+
+        Returns
+        ----------
+        LanguageDetectionResult
+            Detected language and its probability
+        """
+        duration = duration or self.duration
+        head = self.get_head(audio, duration)
+        audio_key = audio_key or hashlib.sha256(np.ascontiguousarray(head).tobytes()).hexdigest()
+        cache_key = f"{audio_key}:{duration}"
+        with self.lock:
+            if cache_key in self.cache:
+                self.cache.move_to_end(cache_key)
+                return self.cache[cache_key]
+
+        speech = self.get_speech(head, duration)
+        language, probability, all_language_probs = self.get_model().detect_language(
+            audio=speech,
+            language_detection_segments=max(1, math.ceil(duration / 30))
+        )
+        result = LanguageDetectionResult(
+            language=language,
+            language_name=whisper.tokenizer.LANGUAGES.get(language, language),
+            probability=probability,
+            language_probs=dict(all_language_probs[:5])
+        )
+
+        with self.lock:
+            self.cache[cache_key] = result
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return result
+
+    def get_head(self, audio: np.ndarray, duration: float) -> np.ndarray:
+        """Beginning of the audio where the speech of `duration` seconds is assumed to be, which is 4 times of it"""
+        return audio[:int(duration * self.pipeline.vad.sampling_rate) * 4]
+
+    def get_speech(self, head: np.ndarray, duration: float) -> np.ndarray:
+        """
+        Get the first `duration` seconds of the speech from the beginning of the audio of `get_head()`.
+        The VAD stops as soon as enough speech is found.
+        """
+        num_samples = int(duration * self.pipeline.vad.sampling_rate)
+        speech_chunks = []
+        speech_samples = 0
+        for chunk in self.pipeline.vad.iter_speech_timestamps(
+            audio=head,
+            vad_options=VadOptions(min_silence_duration_ms=500),
+            block_duration=min(duration, 30)
+        ):
+            speech_chunks.append(chunk)
+            speech_samples += chunk["end"] - chunk["start"]
+            if speech_samples >= num_samples:
+                break
+        if not speech_chunks:
+            return head[:num_samples]
+        return ChunkedAudio(head, speech_chunks)[:num_samples]
+
+    def get_model(self):
+        with self.lock:
+            if self.model is None:
+                self.model = self.pipeline.load_model(
+                    model_size=self.model_size,
+                    compute_type=self.compute_type or self.pipeline.current_compute_type
+                )
+            return self.model
@@ -0,0 +1,166 @@
+from typing import List, Optional
+import numpy as np
+from faster_whisper.vad import VadOptions
+
+from modules.vad.streaming_vad import StreamingVAD
+from modules.whisper.data_classes import Segment
+from modules.whisper.faster_whisper_inference import FasterWhisperInference
+
+
+class RingBuffer:
+    """Fixed size buffer of the latest samples of the live audio, which is addressed by the absolute sample index"""
+    def __init__(self, size: int):
+        self.buffer = np.zeros(size, dtype=np.float32)
+        # Number of samples written so far
+        self.num_samples = 0
+
+    @property
+    def size(self) -> int:
+        return self.buffer.shape[0]
+
+    def write(self, audio: np.ndarray):
+        if audio.shape[0] > self.size:
+            self.num_samples += audio.shape[0] - self.size
+            audio = audio[-self.size:]
+        start = self.num_samples % self.size
+        first = min(audio.shape[0], self.size - start)
+        self.buffer[start:start + first] = audio[:first]
+        self.buffer[:audio.shape[0] - first] = audio[first:]
+        self.num_samples += audio.shape[0]
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Read the samples from `start` to `end`. Samples that are already overwritten are not included."""
+        start = max(start, self.num_samples - self.size, 0)
+        end = min(end, self.num_samples)
+        if start >= end:
+            return np.zeros(0, dtype=np.float32)
+        indices = np.arange(start, end) % self.size
+        return self.buffer[indices]
+
+
+class Utterance:
+    """Audio of the speech to decode. Final utterances are completed by the VAD, partial ones are still spoken."""
+    def __init__(self, index: int, start: int, audio: np.ndarray, is_final: bool):
+        self.index = index
+        self.start = start
+        self.audio = audio
+        self.is_final = is_final
+
+
+class LiveTranscriber:
+    """
+    Transcribe the live audio that is fed frame by frame.
+    New frames are kept in the ring buffer and only the new frames are fed to the VAD. Completed speeches are
+    decoded as the final segments, and the speech in progress is decoded periodically as the partial hypothesis with
+    the greedy search and without the timestamps, which is cheap.
+    """
+    def __init__(self,
+                 pipeline: FasterWhisperInference,
+                 lang: Optional[str] = None,
+                 is_translate: bool = False,
+                 beam_size: int = 5,
+                 vad_options: Optional[VadOptions] = None,
+                 partial_interval: float = 1.0):
+        """
+        Parameters
+        ----------
+        pipeline: FasterWhisperInference
+            Pipeline with the loaded model and the VAD to reuse
+        lang: Optional[str]
+            Language code of the speech. It's detected from the first utterance if it's None.
+        is_translate: bool
+            Translate the speech to English
+        beam_size: int
+            Beam size to decode the final segments
+        vad_options: Optional[VadOptions]
+            Options to detect the end of the utterances
+        partial_interval: float
+            Interval in seconds to decode the partial hypothesis of the speech in progress. 0 to disable.
+        """
+        self.pipeline = pipeline
+        self.model_size = pipeline.current_model_size
+        self.compute_type = pipeline.current_compute_type
+        self.lang = lang
+        self.task = "translate" if is_translate else "transcribe"
+        self.beam_size = beam_size
+        if vad_options is None:
+            vad_options = VadOptions(min_silence_duration_ms=500, speech_pad_ms=200, max_speech_duration_s=25)
+        self.vad = StreamingVAD(vad=pipeline.vad, vad_options=vad_options)
+        self.sampling_rate = self.vad.sampling_rate
+        # The buffer holds the longest utterance with its padding
+        self.buffer = RingBuffer(size=int(self.sampling_rate * (vad_options.max_speech_duration_s + 5)))
+        self.partial_interval_samples = int(self.sampling_rate * partial_interval)
+        self.last_partial = 0
+        self.num_utterances = 0
+        self.num_segments = 0
+        # Text of the last utterance to prompt the next utterance
+        self.prompt: Optional[str] = None
+
+    def feed(self, audio: np.ndarray) -> List[Utterance]:
+        """
+        Feed the new frames of the audio with the sampling rate of 16000.
+        Returns the completed utterances, and the partial utterance of the speech in progress if it's the time.
+        """
+        self.buffer.write(audio)
+        utterances = [self.get_utterance(start, end, is_final=True) for start, end in self.vad.feed(audio)]
+
+        speech_start = self.vad.speech_start
+        if (self.partial_interval_samples > 0 and speech_start is not None and
+                self.vad.num_samples - max(speech_start, self.last_partial) >= self.partial_interval_samples):
+            self.last_partial = self.vad.num_samples
+            utterances.append(Utterance(
+                index=self.num_utterances,
+                start=speech_start,
+                audio=self.buffer.read(speech_start, self.vad.num_samples),
+                is_final=False
+            ))
+        return utterances
+
+    def flush(self) -> List[Utterance]:
+        """Complete the speech in progress at the end of the audio"""
+        utterances = []
+        if self.vad.remainder.shape[0] > 0:
+            # Complete the last window of the VAD with the silence
+            padding = np.zeros(self.vad.window_size_samples - self.vad.remainder.shape[0], dtype=np.float32)
+            utterances += [self.get_utterance(start, end, is_final=True) for start, end in self.vad.feed(padding)]
+        return utterances + [self.get_utterance(start, end, is_final=True) for start, end in self.vad.flush()]
+
+    def get_utterance(self, start: int, end: int, is_final: bool) -> Utterance:
+        utterance = Utterance(index=self.num_utterances, start=start, audio=self.buffer.read(start, end),
+                              is_final=is_final)
+        if is_final:
+            self.num_utterances += 1
+        return utterance
+
+    def decode(self, utterance: Utterance) -> List[Segment]:
+        """Decode the utterance. Timestamps of the segments are from the start of the live audio."""
+        with self.pipeline.use_model(self.model_size, self.compute_type) as model:
+            segments, info = model.transcribe(
+                audio=utterance.audio,
+                language=self.lang,
+                task=self.task,
+                beam_size=self.beam_size if utterance.is_final else 1,
+                without_timestamps=not utterance.is_final,
+                condition_on_previous_text=False,
+                initial_prompt=self.prompt,
+                vad_filter=False,
+            )
+            segments = [Segment.from_faster_whisper(segment) for segment in segments]
+
+        offset = utterance.start / self.sampling_rate
+        for segment in segments:
+            segment.start = round(segment.start + offset, 3)
+            segment.end = round(min(segment.end, utterance.audio.shape[0] / self.sampling_rate) + offset, 3)
+            for word in segment.words or []:
+                word.start = round(word.start + offset, 3)
+                word.end = round(word.end + offset, 3)
+
+        if utterance.is_final:
+            if self.lang is None:
+                self.lang = info.language
+            for segment in segments:
+                self.num_segments += 1
+                segment.id = self.num_segments
+            text = "".join(segment.text for segment in segments).strip()
+            self.prompt = text or self.prompt
+        return segments
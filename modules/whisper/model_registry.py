@@ -0,0 +1,152 @@
+import gc
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+import torch
+
+# Approximate number of parameters of the whisper models in millions. Names are matched in this order, so the more
+# specific names come first, e.g. "distil-large" before "large" and "turbo" before "large" for "large-v3-turbo".
+MODEL_PARAMETERS = {
+    "distil-small": 166,
+    "distil-medium": 394,
+    "distil-large": 756,
+    "turbo": 809,
+    "tiny": 39,
+    "base": 74,
+    "small": 244,
+    "medium": 769,
+    "large": 1550,
+}
+# Bytes per parameter of the compute types
+COMPUTE_TYPE_BYTES = {
+    "float32": 4,
+    "float16": 2,
+    "bfloat16": 2,
+    "int16": 2,
+    "int8": 1,
+    "int8_float32": 1,
+    "int8_float16": 1,
+    "int8_bfloat16": 1,
+}
+
+
+def estimate_model_memory(model_size: str, compute_type: str) -> int:
+    """Estimate the memory of the model in bytes. Unknown models, e.g. fine-tuned models, are estimated as large."""
+    name = model_size.replace("\\", "/").split("/")[-1].lower()
+    parameters = MODEL_PARAMETERS["large"]
+    for model_name in MODEL_PARAMETERS:
+        if model_name in name:
+            parameters = MODEL_PARAMETERS[model_name]
+            break
+    return parameters * 1024 ** 2 * COMPUTE_TYPE_BYTES.get(compute_type, 4)
+
+
+class ModelEntry:
+    def __init__(self, model: Any, size: int):
+        self.model = model
+        self.size = size
+        self.ref_count = 0
+
+
+class ModelRegistry:
+    """
+    Keep several models loaded within the memory budget, so that the requests with the different models don't reload
+    the models every time. The least recently used models are evicted first when the budget is exceeded.
+    Models in use are reference counted and never evicted until they're released.
+    """
+    def __init__(self, max_memory: Optional[int] = None):
+        """
+        Parameters
+        ----------
+        max_memory: Optional[int]
+            Memory budget for the models in bytes. If it's None, only the last used model is kept.
+        """
+        self.max_memory = max_memory
+        self.entries: Dict[Hashable, ModelEntry] = OrderedDict()
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+
+    @contextmanager
+    def use(self,
+            key: Hashable,
+            loader: Callable[[], Any],
+            size: int = 0) -> Iterator[Any]:
+        """
+        Use the model of the key. The model is loaded by `loader` if it's not loaded yet.
+
+        Parameters
+        ----------
+        key: Hashable
+            Key of the model, e.g. (engine, model_size, compute_type)
+        loader: Callable[[], Any]
+            Function that loads the model
+        size: int
+            Estimated memory of the model in bytes
+        """
+        entry = self.acquire(key)
+        if entry is None:
+            # Models are loaded one by one to not exceed the budget with the concurrent loads
+            with self.load_lock:
+                entry = self.acquire(key)
+                if entry is None:
+                    self.evict(reserve=size)
+                    entry = ModelEntry(model=loader(), size=size)
+                    entry.ref_count = 1
+                    with self.lock:
+                        self.entries[key] = entry
+        try:
+            yield entry.model
+        finally:
+            with self.lock:
+                entry.ref_count -= 1
+            self.evict()
+
+    def acquire(self, key: Hashable) -> Optional[ModelEntry]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry.ref_count += 1
+                self.entries.move_to_end(key)
+            return entry
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get the model of the key if it's loaded, without marking it as used"""
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry.model if entry is not None else None
+
+    def evict(self, reserve: Optional[int] = None):
+        """
+        Evict the least recently used models that are not in use until the models fit in the budget.
+        `reserve` is the memory of the model that is about to be loaded.
+        """
+        evicted = []
+        with self.lock:
+            for key in list(self.entries):
+                if not self.is_over_budget(reserve):
+                    break
+                if self.entries[key].ref_count == 0:
+                    evicted.append(self.entries.pop(key))
+        if evicted:
+            self.free(evicted)
+
+    def clear(self):
+        """Evict all the models that are not in use"""
+        with self.lock:
+            evicted = [self.entries.pop(key) for key, entry in list(self.entries.items()) if entry.ref_count == 0]
+        self.free(evicted)
+
+    def is_over_budget(self, reserve: Optional[int] = None) -> bool:
+        if self.max_memory is None:
+            return len(self.entries) + (0 if reserve is None else 1) > 1
+        return sum(entry.size for entry in self.entries.values()) + (reserve or 0) > self.max_memory
+
+    @staticmethod
+    def free(entries):
+        for entry in entries:
+            entry.model = None
+        entries.clear()
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
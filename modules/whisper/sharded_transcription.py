@@ -0,0 +1,259 @@
+import dataclasses
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import faster_whisper
+
+from modules.vad.chunked_audio import ChunkedAudio
+
+SAMPLING_RATE = 16000
+# Samples per frame of the mel features, which is the unit of `Segment.seek`
+HOP_LENGTH = 160
+
+# Model of the worker process, loaded once by `init_worker()`
+_worker_model: Optional[faster_whisper.WhisperModel] = None
+
+
+def init_worker(model_path: str,
+                compute_type: str,
+                cpu_threads: int,
+                download_root: Optional[str] = None,
+                local_files_only: bool = False):
+    global _worker_model
+    _worker_model = faster_whisper.WhisperModel(
+        model_size_or_path=model_path,
+        device="cpu",
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        download_root=download_root,
+        local_files_only=local_files_only
+    )
+
+
+def detect_language(audio: np.ndarray,
+                    language_detection_segments: int = 1,
+                    language_detection_threshold: Optional[float] = 0.5) -> str:
+    language, _, _ = _worker_model.detect_language(
+        audio=audio,
+        language_detection_segments=language_detection_segments,
+        language_detection_threshold=language_detection_threshold or 0.5
+    )
+    return language
+
+
+def transcribe_shard(audio: np.ndarray,
+                     context_audio: Optional[np.ndarray],
+                     transcribe_kwargs: Dict) -> List[faster_whisper.transcribe.Segment]:
+    """
+    Transcribe the shard in the worker process. If `context_audio` is given, which is the tail of the previous shard,
+    it is transcribed first and its text is used as the prompt of the shard, in place of the text of the previous
+    shard that is transcribed by another worker at the same time.
+    """
+    if context_audio is not None and context_audio.size > 0:
+        context_kwargs = {**transcribe_kwargs, "word_timestamps": False}
+        context_segments, _ = _worker_model.transcribe(audio=context_audio, **context_kwargs)
+        context_text = "".join(segment.text for segment in context_segments).strip()
+        if context_text:
+            initial_prompt = transcribe_kwargs.get("initial_prompt")
+            transcribe_kwargs = {
+                **transcribe_kwargs,
+                "initial_prompt": f"{initial_prompt} {context_text}" if initial_prompt else context_text
+            }
+
+    segments, _ = _worker_model.transcribe(audio=audio, **transcribe_kwargs)
+    return list(segments)
+
+
+def split_shards(speech_chunks: List[dict],
+                 num_samples: int,
+                 num_shards: int) -> List[Tuple[int, int]]:
+    """
+    Split the audio into the shards at the silences between the speech chunks.
+    Shards are balanced by the duration of the speech rather than the duration of the audio, so that the workers
+    finish at about the same time.
+
+    Parameters
+    ----------
+    speech_chunks: List[dict]
+        Start and end samples of the speech chunks from VAD
+    num_samples: int
+        Number of the samples of the audio
+    num_shards: int
+        Maximum number of the shards
+
+    Returns
+    ----------
+    List[Tuple[int, int]]
+        Start and end samples of the shards, which cover the whole audio
+    """
+    if not speech_chunks or num_shards <= 1:
+        return [(0, num_samples)]
+
+    speech_lengths = np.array([chunk["end"] - chunk["start"] for chunk in speech_chunks])
+    # Speech duration before each silence between the speech chunks
+    speech_before_gaps = np.cumsum(speech_lengths)[:-1]
+    gaps = [(prev["end"] + next_["start"]) // 2 for prev, next_ in zip(speech_chunks[:-1], speech_chunks[1:])]
+
+    boundaries = [0]
+    total_speech = speech_lengths.sum()
+    for i in range(1, num_shards):
+        if not gaps:
+            break
+        gap_index = int(np.abs(speech_before_gaps - total_speech * i / num_shards).argmin())
+        if gaps[gap_index] > boundaries[-1]:
+            boundaries.append(gaps[gap_index])
+    boundaries.append(num_samples)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def shift_segments(segments: List[faster_whisper.transcribe.Segment],
+                   start: int,
+                   first_id: int = 1) -> List[faster_whisper.transcribe.Segment]:
+    """Shift the timestamps of the segments of the shard by the start sample of the shard and renumber the ids"""
+    offset = start / SAMPLING_RATE
+    shifted = []
+    for i, segment in enumerate(segments):
+        words = segment.words
+        if words is not None:
+            words = [dataclasses.replace(w, start=round(w.start + offset, 3), end=round(w.end + offset, 3))
+                     for w in words]
+        shifted.append(dataclasses.replace(
+            segment,
+            id=first_id + i,
+            seek=segment.seek + start // HOP_LENGTH,
+            start=round(segment.start + offset, 3),
+            end=round(segment.end + offset, 3),
+            words=words
+        ))
+    return shifted
+
+
+class ShardedTranscriber:
+    """
+    Transcribe the long audio on CPU by splitting it into the shards and transcribing the shards in parallel with
+    the pool of worker processes. Each worker loads its own `faster_whisper.WhisperModel` with
+    `cpu_threads` threads, so `num_workers * cpu_threads` should not exceed the number of the cores.
+    """
+    def __init__(self,
+                 num_workers: Optional[int] = None,
+                 cpu_threads: Optional[int] = None,
+                 min_duration: float = 600,
+                 context_duration: float = 10):
+        """
+        Parameters
+        ----------
+        num_workers: Optional[int]
+            Number of the worker processes. Defaults to the number of the cores divided by 4.
+        cpu_threads: Optional[int]
+            Number of the threads of each worker. Defaults to the number of the cores divided by `num_workers`.
+        min_duration: float
+            Minimum duration of the audio in seconds to be sharded. Shorter audio is not worth loading the workers.
+        context_duration: float
+            Duration in seconds of the tail of the previous shard that is transcribed to prompt the shard,
+            if `condition_on_previous_text` is enabled.
+        """
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = num_workers or max(1, cpu_count // 4)
+        self.cpu_threads = cpu_threads or max(1, cpu_count // self.num_workers)
+        self.min_duration = min_duration
+        self.context_duration = context_duration
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.model_key: Optional[Tuple] = None
+        self.lock = threading.Lock()
+
+    def get_executor(self,
+                     model_path: str,
+                     compute_type: str,
+                     download_root: Optional[str] = None,
+                     local_files_only: bool = False) -> ProcessPoolExecutor:
+        """Get the worker pool for the model. The pool is recreated if the model is changed."""
+        model_key = (model_path, compute_type)
+        with self.lock:
+            if self.executor is None or self.model_key != model_key:
+                if self.executor is not None:
+                    # Running shards of the previous model are finished before the workers exit
+                    self.executor.shutdown(wait=False)
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.num_workers,
+                    # Fork is not safe with the threads of ctranslate2 and torch in the parent process
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_worker,
+                    initargs=(model_path, compute_type, self.cpu_threads, download_root, local_files_only)
+                )
+                self.model_key = model_key
+            return self.executor
+
+    def should_shard(self, audio: Union[np.ndarray, ChunkedAudio]) -> bool:
+        return self.num_workers > 1 and audio.shape[0] / SAMPLING_RATE >= self.min_duration
+
+    def transcribe(self,
+                   audio: Union[np.ndarray, ChunkedAudio],
+                   speech_chunks: List[dict],
+                   executor: ProcessPoolExecutor,
+                   transcribe_kwargs: Dict) -> Iterator[faster_whisper.transcribe.Segment]:
+        """
+        Transcribe the shards with the workers and yield the segments in order, as soon as the shards before them
+        are done.
+
+        Parameters
+        ----------
+        audio: Union[np.ndarray, ChunkedAudio]
+            Audio with the sampling rate of 16000. Only the slices of the shards are copied from `ChunkedAudio`.
+        speech_chunks: List[dict]
+            Speech chunks from VAD to split the audio at the silences
+        executor: ProcessPoolExecutor
+            Worker pool from `get_executor()`
+        transcribe_kwargs: Dict
+            Parameters of `faster_whisper.WhisperModel.transcribe()`. If `condition_on_previous_text` is enabled,
+            each shard is prompted with the text of the tail of the previous shard.
+
+        Returns
+        ----------
+        Iterator[faster_whisper.transcribe.Segment]
+            Segments of the whole audio with the timestamps and the ids of the whole audio
+        """
+        shards = split_shards(speech_chunks, audio.shape[0], self.num_workers)
+
+        if transcribe_kwargs.get("language") is None:
+            # Detect the language once so that all the shards are transcribed in the same language
+            first_speech = speech_chunks[0]["start"] if speech_chunks else 0
+            language_detection_segments = transcribe_kwargs.get("language_detection_segments", 1)
+            transcribe_kwargs = {**transcribe_kwargs, "language": executor.submit(
+                detect_language,
+                audio[first_speech:first_speech + 30 * SAMPLING_RATE * language_detection_segments],
+                language_detection_segments,
+                transcribe_kwargs.get("language_detection_threshold"),
+            ).result()}
+
+        context_length = int(self.context_duration * SAMPLING_RATE)
+        futures: List[Future] = []
+        for i, (start, end) in enumerate(shards):
+            shard_kwargs = transcribe_kwargs
+            context_audio = None
+            if i > 0:
+                # Prefix is only for the first window of the whole audio
+                shard_kwargs = {**transcribe_kwargs, "prefix": None}
+                if transcribe_kwargs.get("condition_on_previous_text", True):
+                    context_audio = audio[max(shards[i - 1][0], start - context_length):start]
+            futures.append(executor.submit(transcribe_shard, audio[start:end], context_audio, shard_kwargs))
+
+        try:
+            num_segments = 0
+            for (start, _), future in zip(shards, futures):
+                segments = shift_segments(future.result(), start, first_id=num_segments + 1)
+                num_segments += len(segments)
+                yield from segments
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+                self.model_key = None
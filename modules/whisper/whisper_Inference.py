@@ -10,6 +10,7 @@ from argparse import Namespace
 from modules.utils.paths import (WHISPER_MODELS_DIR, DIARIZATION_MODELS_DIR, OUTPUT_DIR, UVR_MODELS_DIR)
 from modules.whisper.base_transcription_pipeline import BaseTranscriptionPipeline
 from modules.whisper.data_classes import *
+from modules.vad.chunked_audio import ChunkedAudio
 
 
 class WhisperInference(BaseTranscriptionPipeline):
@@ -53,25 +54,26 @@ class WhisperInference(BaseTranscriptionPipeline):
         start_time = time.time()
         params = WhisperParams.from_list(list(whisper_params))
 
-        if params.model_size != self.current_model_size or self.model is None or self.current_compute_type != params.compute_type:
-            self.update_model(params.model_size, params.compute_type, progress)
-
         def progress_callback(progress_value):
             progress(progress_value, desc="Transcribing..")
 
-        result = self.model.transcribe(audio=audio,
-                                       language=params.lang,
-                                       verbose=False,
-                                       beam_size=params.beam_size,
-                                       logprob_threshold=params.log_prob_threshold,
-                                       no_speech_threshold=params.no_speech_threshold,
-                                       task="translate" if params.is_translate else "transcribe",
-                                       fp16=True if params.compute_type == "float16" else False,
-                                       best_of=params.best_of,
-                                       patience=params.patience,
-                                       temperature=params.temperature,
-                                       compression_ratio_threshold=params.compression_ratio_threshold,
-                                       progress_callback=progress_callback,)["segments"]
+        with self.use_model(params.model_size, params.compute_type, progress) as model:
+            self.current_model_size = params.model_size
+            self.current_compute_type = params.compute_type
+
+            result = model.transcribe(audio=audio.materialize() if isinstance(audio, ChunkedAudio) else audio,
+                                      language=params.lang,
+                                      verbose=False,
+                                      beam_size=params.beam_size,
+                                      logprob_threshold=params.log_prob_threshold,
+                                      no_speech_threshold=params.no_speech_threshold,
+                                      task="translate" if params.is_translate else "transcribe",
+                                      fp16=True if params.compute_type == "float16" else False,
+                                      best_of=params.best_of,
+                                      patience=params.patience,
+                                      temperature=params.temperature,
+                                      compression_ratio_threshold=params.compression_ratio_threshold,
+                                      progress_callback=progress_callback,)["segments"]
         segments_result = []
         for segment in result:
             segments_result.append(Segment(
@@ -83,13 +85,13 @@ class WhisperInference(BaseTranscriptionPipeline):
         elapsed_time = time.time() - start_time
         return segments_result, elapsed_time
 
-    def update_model(self,
-                     model_size: str,
-                     compute_type: str,
-                     progress: gr.Progress = gr.Progress(),
-                     ):
+    def load_model(self,
+                   model_size: str,
+                   compute_type: str,
+                   progress: gr.Progress = gr.Progress(),
+                   ) -> whisper.Whisper:
         """
-        Update current model setting
+        Load the model
 
         Parameters
         ----------
@@ -102,9 +104,7 @@ class WhisperInference(BaseTranscriptionPipeline):
             Indicator to show progress directly in gradio.
         """
         progress(0, desc="Initializing Model..")
-        self.current_compute_type = compute_type
-        self.current_model_size = model_size
-        self.model = whisper.load_model(
+        return whisper.load_model(
             name=model_size,
             device=self.device,
             download_root=self.model_dir
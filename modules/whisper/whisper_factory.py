@@ -3,9 +3,6 @@ import os
 
 from modules.utils.paths import (FASTER_WHISPER_MODELS_DIR, DIARIZATION_MODELS_DIR, OUTPUT_DIR,
                                  INSANELY_FAST_WHISPER_MODELS_DIR, WHISPER_MODELS_DIR, UVR_MODELS_DIR)
-from modules.whisper.faster_whisper_inference import FasterWhisperInference
-from modules.whisper.whisper_Inference import WhisperInference
-from modules.whisper.insanely_fast_whisper_inference import InsanelyFastWhisperInference
 from modules.whisper.base_transcription_pipeline import BaseTranscriptionPipeline
 from modules.whisper.data_classes import *
 
@@ -54,7 +51,9 @@ class WhisperFactory:
 
         whisper_type = whisper_type.strip().lower()
 
+        # Only the module of the implementation is imported, e.g. transformers is not imported for faster-whisper
         if whisper_type == WhisperImpl.FASTER_WHISPER.value:
+            from modules.whisper.faster_whisper_inference import FasterWhisperInference
             return FasterWhisperInference(
                 model_dir=faster_whisper_model_dir,
                 output_dir=output_dir,
@@ -62,6 +61,7 @@ class WhisperFactory:
                 uvr_model_dir=uvr_model_dir
             )
         elif whisper_type == WhisperImpl.WHISPER.value:
+            from modules.whisper.whisper_Inference import WhisperInference
             return WhisperInference(
                 model_dir=whisper_model_dir,
                 output_dir=output_dir,
@@ -69,6 +69,7 @@ class WhisperFactory:
                 uvr_model_dir=uvr_model_dir
             )
         elif whisper_type == WhisperImpl.INSANELY_FAST_WHISPER.value:
+            from modules.whisper.insanely_fast_whisper_inference import InsanelyFastWhisperInference
             return InsanelyFastWhisperInference(
                 model_dir=insanely_fast_whisper_model_dir,
                 output_dir=output_dir,
@@ -76,6 +77,7 @@ class WhisperFactory:
                 uvr_model_dir=uvr_model_dir
             )
         else:
+            from modules.whisper.faster_whisper_inference import FasterWhisperInference
             return FasterWhisperInference(
                 model_dir=faster_whisper_model_dir,
                 output_dir=output_dir,
@@ -0,0 +1,63 @@
+import numpy as np
+import faster_whisper
+import soundfile as sf
+
+from modules.utils.audio_buffer import AudioBuffer
+from modules.whisper.faster_whisper_inference import FasterWhisperInference
+from modules.whisper.data_classes import *
+
+
+def write_stereo(file_path: str, sample_rate: int = 44100, seconds: float = 3) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal((int(sample_rate * seconds), 2)) * 0.1).astype(np.float32)
+    sf.write(file_path, audio, sample_rate, subtype="FLOAT")
+    return audio
+
+
+def test_audio_buffer_decodes_once(tmp_path):
+    file_path = str(tmp_path / "stereo.wav")
+    expected = write_stereo(file_path)
+
+    audio_buffer = AudioBuffer(file_path)
+    native = audio_buffer.get_native()
+    np.testing.assert_array_equal(native, expected)
+    assert (audio_buffer.sample_rate, audio_buffer.num_channels) == (44100, 2)
+
+    mono = audio_buffer.get()
+    assert mono.dtype == np.float32 and mono.ndim == 1
+    assert abs(len(mono) - len(expected) * 16000 / 44100) <= 1
+    assert audio_buffer.get() is mono
+    assert audio_buffer.decode_count == 1
+
+
+def test_audio_buffer_decodes_mono_directly(tmp_path):
+    file_path = str(tmp_path / "stereo.wav")
+    write_stereo(file_path)
+
+    with open(file_path, "rb") as f:
+        audio_buffer = AudioBuffer(f)
+        f.read(100)
+        mono = audio_buffer.get()
+        assert f.tell() == 100
+
+    np.testing.assert_array_equal(mono, faster_whisper.decode_audio(file_path))
+    assert (audio_buffer.sample_rate, audio_buffer.num_channels) == (44100, 2)
+    assert audio_buffer.decode_count == 1
+
+    array_buffer = AudioBuffer(mono)
+    assert array_buffer.get() is mono
+    assert array_buffer.get_native() is mono
+    assert array_buffer.decode_count == 0
+
+
+def test_pipeline_decodes_once(tmp_path):
+    file_path = str(tmp_path / "stereo.wav")
+    write_stereo(file_path)
+    pipeline = FasterWhisperInference()
+    pipeline.stage_cache = None
+    params = TranscriptionPipelineParams(vad=VadParams(vad_filter=True, threshold=0.01))
+
+    audio_buffer = AudioBuffer(file_path)
+    audio, speech_chunks, audio_key = pipeline.preprocess_audio(audio_buffer, params)
+    assert pipeline.get_original_audio(audio) is audio_buffer.get()
+    assert audio_buffer.decode_count == 1
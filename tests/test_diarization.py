@@ -7,6 +7,7 @@ from test_transcription import download_file, test_transcribe
 import gradio as gr
 import pytest
 import os
+import numpy as np
 
 
 @pytest.mark.skipif(
@@ -29,3 +30,22 @@ def test_diarization_pipeline(
 ):
     test_transcribe(whisper_type, vad_filter, bgm_separation, diarization)
 
+
+def test_load_audio_converts_arrays_in_memory(monkeypatch):
+    from modules.diarize import audio_loader
+
+    def run_ffmpeg(*args, **kwargs):
+        raise AssertionError("ffmpeg should not be run for the numpy arrays")
+    monkeypatch.setattr(audio_loader.subprocess, "run", run_ffmpeg)
+
+    rng = np.random.default_rng(0)
+    audio = rng.uniform(-1, 1, 16000).astype(np.float32)
+    assert audio_loader.load_audio(audio) is audio
+
+    stereo = np.stack([audio, np.zeros_like(audio)], axis=1)
+    np.testing.assert_allclose(audio_loader.load_audio(stereo), audio / 2)
+    # Not quantized to int16
+    np.testing.assert_array_equal(audio_loader.load_audio(audio.astype(np.float64)), audio)
+
+    resampled = audio_loader.load_audio(rng.uniform(-1, 1, 44100), original_sr=44100)
+    assert resampled.dtype == np.float32 and resampled.shape == (16000,)
@@ -0,0 +1,45 @@
+import threading
+import numpy as np
+import pytest
+
+from modules.whisper.dynamic_batcher import DynamicBatcher
+
+
+def test_dynamic_batcher_scatters_outputs():
+    batcher = DynamicBatcher(max_batch_size=4, max_wait_ms=1000)
+    batch_sizes = []
+
+    def run_batch(features: np.ndarray):
+        batch_sizes.append(features.shape[0])
+        return [{"value": float(window[0, 0])} for window in features]
+
+    results = {}
+
+    def transcribe(i: int, num_windows: int):
+        features = np.stack([np.full((2, 3), i * 10 + j, dtype=np.float32) for j in range(num_windows)])
+        results[i] = batcher.generate(key=("model", "transcribe", "en"), features=features, run_batch=run_batch)
+
+    threads = [threading.Thread(target=transcribe, args=(i, n)) for i, n in enumerate([1, 2, 1])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    # The batch is decoded as soon as it's full, without waiting for `max_wait_ms`
+    assert batch_sizes == [4]
+    assert results == {
+        0: [{"value": 0.0}],
+        1: [{"value": 10.0}, {"value": 11.0}],
+        2: [{"value": 20.0}],
+    }
+
+
+def test_dynamic_batcher_propagates_errors():
+    batcher = DynamicBatcher(max_batch_size=4, max_wait_ms=1)
+
+    def run_batch(features: np.ndarray):
+        raise RuntimeError("Out of memory")
+
+    with pytest.raises(RuntimeError):
+        batcher.generate(key=("model",), features=np.zeros((1, 2, 3)), run_batch=run_batch)
+    assert not batcher.groups
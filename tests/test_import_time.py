@@ -0,0 +1,38 @@
+import json
+import subprocess
+import sys
+import pytest
+
+from modules.utils.paths import WEBUI_DIR
+
+# Dependencies that are slow to import and only needed when their model is loaded
+DEFERRED_MODULES = ["uvr", "pyannote.audio", "transformers"]
+
+
+def import_in_subprocess(module: str) -> dict:
+    """Import the module in a fresh interpreter and get the import time and the deferred modules that are loaded"""
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed_time = time.perf_counter() - start\n"
+        f"loaded = [name for name in {DEFERRED_MODULES!r} if name in sys.modules]\n"
+        "print(json.dumps({'time': elapsed_time, 'loaded': loaded}))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=WEBUI_DIR, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "app",
+        "backend.main",
+        "modules.whisper.whisper_factory",
+        "modules.vad.silero_vad",
+    ]
+)
+def test_heavy_dependencies_are_imported_lazily(module: str):
+    result = import_in_subprocess(module)
+
+    assert result["loaded"] == [], f"Imported {module} in {result['time']:.2f}s with {result['loaded']}"
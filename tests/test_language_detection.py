@@ -0,0 +1,30 @@
+import numpy as np
+
+from modules.whisper.faster_whisper_inference import FasterWhisperInference
+from modules.whisper.language_detection import LanguageDetector
+
+
+class FakeDetectionModel:
+    def detect_language(self, audio, language_detection_segments):
+        return "en", 0.9, [("en", 0.9), ("de", 0.1)]
+
+
+def test_cached_detection_skips_vad(monkeypatch):
+    detector = LanguageDetector(pipeline=FasterWhisperInference(), duration=1)
+    vad_calls = []
+    monkeypatch.setattr(detector, "get_speech", lambda head, duration: vad_calls.append(duration) or head)
+    monkeypatch.setattr(detector, "get_model", lambda: FakeDetectionModel())
+
+    audio = np.random.default_rng(0).uniform(-1, 1, 16000 * 8).astype(np.float32)
+    first = detector.detect(audio, audio_key="content-hash")
+    second = detector.detect(audio, audio_key="content-hash")
+    assert first == second
+    assert len(vad_calls) == 1
+
+    # Without the key, the result is cached by the beginning of the audio that the VAD would get
+    detector.detect(audio)
+    detector.detect(audio.copy())
+    assert len(vad_calls) == 2
+    # The detection of the different duration is not reused
+    detector.detect(audio, duration=2, audio_key="content-hash")
+    assert len(vad_calls) == 3
@@ -0,0 +1,70 @@
+import threading
+
+from modules.whisper.model_registry import ModelRegistry, estimate_model_memory
+
+
+class DummyModel:
+    def __init__(self, name: str):
+        self.name = name
+
+
+def test_model_registry_evicts_least_recently_used():
+    registry = ModelRegistry(max_memory=250)
+    loads = []
+
+    def use(name: str, size: int = 100):
+        def loader():
+            loads.append(name)
+            return DummyModel(name)
+
+        with registry.use(key=name, loader=loader, size=size) as model:
+            assert model.name == name
+
+    use("small")
+    use("medium")
+    use("small")
+    assert loads == ["small", "medium"]
+
+    use("large")
+    assert loads == ["small", "medium", "large"]
+    assert list(registry.entries) == ["small", "large"]
+
+
+def test_model_registry_keeps_models_in_use():
+    registry = ModelRegistry()
+    with registry.use(key="small", loader=lambda: DummyModel("small")) as small_model:
+        with registry.use(key="medium", loader=lambda: DummyModel("medium")):
+            assert registry.get("small") is small_model
+        assert registry.get("medium") is None
+        assert small_model.name == "small"
+
+    # Only the last used model is kept by default
+    with registry.use(key="medium", loader=lambda: DummyModel("medium")):
+        pass
+    assert list(registry.entries) == ["medium"]
+
+
+def test_model_registry_loads_once_concurrently():
+    registry = ModelRegistry()
+    loads = []
+    barrier = threading.Barrier(4)
+
+    def use():
+        barrier.wait()
+        with registry.use(key="small", loader=lambda: loads.append(1) or DummyModel("small")):
+            pass
+
+    threads = [threading.Thread(target=use) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == [1]
+
+
+def test_estimate_model_memory():
+    assert estimate_model_memory("large-v3", "float16") == 1550 * 1024 ** 2 * 2
+    assert estimate_model_memory("distil-large-v3", "int8") == 756 * 1024 ** 2
+    assert estimate_model_memory("large-v3-turbo", "float16") == 809 * 1024 ** 2 * 2
+    assert estimate_model_memory("deepdml/faster-whisper-large-v3-turbo-ct2", "int8") == 809 * 1024 ** 2
+    assert estimate_model_memory("models/my-finetuned-model", "float32") == 1550 * 1024 ** 2 * 4
@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from faster_whisper.transcribe import Segment
+
+from modules.whisper import sharded_transcription
+from modules.whisper.sharded_transcription import ShardedTranscriber, split_shards, SAMPLING_RATE
+
+
+class FakeWhisperModel:
+    """Model that transcribes each second of the audio as one segment, and records the audios with their prompts"""
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, initial_prompt=None, **kwargs):
+        self.calls.append((audio, initial_prompt))
+        segments = [
+            Segment(id=i + 1, seek=0, start=float(i), end=float(i + 1), text=text,
+                    tokens=[], avg_logprob=0, compression_ratio=0, no_speech_prob=0, words=None, temperature=0)
+            for i, text in enumerate(self.get_texts(audio))
+        ]
+        return iter(segments), None
+
+    @staticmethod
+    def get_texts(audio):
+        return [f" {int(audio[i * SAMPLING_RATE])}" for i in range(audio.shape[0] // SAMPLING_RATE)]
+
+    def detect_language(self, audio, **kwargs):
+        return "en", 1.0, []
+
+
+def test_split_shards_at_silences():
+    speech_chunks = [
+        {"start": 0, "end": 100},
+        {"start": 150, "end": 200},
+        {"start": 300, "end": 400},
+        {"start": 420, "end": 470},
+    ]
+    assert split_shards(speech_chunks, 500, 2) == [(0, 250), (250, 500)]
+    assert split_shards(speech_chunks, 500, 1) == [(0, 500)]
+    assert split_shards([], 500, 4) == [(0, 500)]
+
+    shards = split_shards(speech_chunks, 500, 8)
+    assert shards[0][0] == 0 and shards[-1][1] == 500
+    assert all(start < end for start, end in shards)
+
+
+def test_sharded_transcription_merges_segments_in_order(monkeypatch):
+    model = FakeWhisperModel()
+    monkeypatch.setattr(sharded_transcription, "_worker_model", model)
+
+    # Each second of the audio is filled with its index, so the text of the segment tells where it came from
+    num_seconds = 8
+    audio = np.repeat(np.arange(num_seconds, dtype=np.float32), SAMPLING_RATE)
+    speech_chunks = [{"start": i * SAMPLING_RATE, "end": i * SAMPLING_RATE + 100} for i in range(num_seconds)]
+
+    sharder = ShardedTranscriber(num_workers=4, context_duration=1)
+    shards = split_shards(speech_chunks, audio.shape[0], 4)
+    assert len(shards) > 2
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        segments = list(sharder.transcribe(
+            audio=audio,
+            speech_chunks=speech_chunks,
+            executor=executor,
+            transcribe_kwargs={"language": None, "condition_on_previous_text": True}
+        ))
+
+    assert [segment.id for segment in segments] == list(range(1, len(segments) + 1))
+    assert [segment.start for segment in segments] == sorted(segment.start for segment in segments)
+    for segment in segments:
+        assert segment.text == f" {int(segment.start)}"
+    # The first shard has no prompt, and each shard after it is prompted with the text of the tail of the previous
+    # shard, which is the last second of it here
+    for i, (start, end) in enumerate(shards):
+        prompts = [prompt for call_audio, prompt in model.calls if np.array_equal(call_audio, audio[start:end])]
+        if i == 0:
+            assert prompts == [None]
+        else:
+            previous_tail = audio[max(shards[i - 1][0], start - SAMPLING_RATE):start]
+            assert prompts == ["".join(model.get_texts(previous_tail)).strip()]
@@ -0,0 +1,86 @@
+import os
+import numpy as np
+import pandas as pd
+
+from modules.utils.stage_cache import StageCache
+from modules.whisper.faster_whisper_inference import FasterWhisperInference
+
+
+def test_stage_cache_roundtrip(tmp_path):
+    stage_cache = StageCache(cache_dir=str(tmp_path))
+    audio = np.random.uniform(-1, 1, size=16000).astype(np.float32)
+    audio_key = stage_cache.hash_audio(audio)
+    audio_path = os.path.join(tmp_path, "audio.npy")
+    np.save(audio_path, audio)
+
+    assert audio_key == stage_cache.hash_audio(audio.copy())
+    assert audio_key != stage_cache.hash_audio(audio[:-1])
+    with open(audio_path, "rb") as f:
+        assert stage_cache.hash_audio(audio_path) == stage_cache.hash_audio(f)
+        assert f.tell() == 0
+
+    uvr_key = stage_cache.get_key("uvr", audio_key, {"uvr_model_size": "UVR-MDX-NET-Inst_HQ_4", "segment_size": 256})
+    assert uvr_key == stage_cache.get_key("uvr", audio_key, {"segment_size": 256,
+                                                             "uvr_model_size": "UVR-MDX-NET-Inst_HQ_4"})
+    assert uvr_key != stage_cache.get_key("uvr", audio_key, {"uvr_model_size": "UVR-MDX-NET-Inst_HQ_4",
+                                                             "segment_size": 512})
+    assert stage_cache.get_audio("uvr", uvr_key) is None
+    stage_cache.put_audio("uvr", uvr_key, audio)
+    assert np.array_equal(stage_cache.get_audio("uvr", uvr_key), audio)
+
+    vad_key = stage_cache.get_key("vad", uvr_key, {"threshold": 0.5})
+    speech_chunks = [{"start": 0, "end": 4000}, {"start": 8000, "end": 16000}]
+    stage_cache.put_speech_chunks(vad_key, speech_chunks)
+    assert stage_cache.get_speech_chunks(vad_key) == speech_chunks
+    stage_cache.put_speech_chunks(vad_key, [])
+    assert stage_cache.get_speech_chunks(vad_key) == []
+
+    speaker_turns = pd.DataFrame({
+        "start": [0.0, 1.5, 3.25],
+        "end": [1.5, 3.25, 4.0],
+        "speaker": ["SPEAKER_01", "SPEAKER_00", "SPEAKER_01"]
+    })
+    stage_cache.put_speaker_turns(uvr_key, speaker_turns)
+    assert stage_cache.get_speaker_turns(uvr_key).equals(speaker_turns)
+
+    stats = stage_cache.stats()
+    assert stats.entries == 3
+    assert stats.stages["uvr"].hits == 1 and stats.stages["uvr"].misses == 1
+    assert stats.stages["uvr"].hit_rate == 0.5
+    assert stats.stages["vad"].hits == 2 and stats.stages["vad"].misses == 0
+    assert stats.stages["diarization"].hit_rate == 1
+
+    # Outputs of the previous runs are reused
+    assert StageCache(cache_dir=str(tmp_path)).get_speech_chunks(vad_key) == []
+
+
+def test_stage_cache_evicts_least_recently_used(tmp_path):
+    audio = np.zeros(1000, dtype=np.float32)
+    stage_cache = StageCache(cache_dir=str(tmp_path))
+    stage_cache.put_audio("uvr", "a", audio)
+    entry_size = os.path.getsize(stage_cache.get_path("uvr", "a", ".npy"))
+    stage_cache.max_size = entry_size * 2
+
+    stage_cache.put_audio("uvr", "b", audio)
+    assert stage_cache.get_audio("uvr", "a") is not None
+    stage_cache.put_audio("uvr", "c", audio)
+
+    assert stage_cache.get_audio("uvr", "b") is None
+    assert stage_cache.get_audio("uvr", "a") is not None
+    assert stage_cache.get_audio("uvr", "c") is not None
+    assert not os.path.exists(stage_cache.get_path("uvr", "b", ".npy"))
+    stats = stage_cache.stats()
+    assert stats.evictions == 1
+    assert stats.size == entry_size * 2
+
+
+def test_pipeline_creates_stage_cache_on_first_use(tmp_path):
+    pipeline = FasterWhisperInference()
+    assert pipeline._stage_cache is None
+
+    stage_cache = StageCache(cache_dir=str(tmp_path))
+    pipeline.stage_cache = stage_cache
+    assert pipeline.stage_cache is stage_cache
+
+    pipeline.stage_cache = None
+    assert pipeline.stage_cache is None
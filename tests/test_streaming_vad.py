@@ -0,0 +1,62 @@
+import numpy as np
+from faster_whisper.vad import VadOptions
+
+from modules.vad.streaming_vad import StreamingVAD
+
+
+def get_test_audio(seconds: float = 3) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    t = np.arange(int(16000 * seconds)) / 16000
+    # Modulated tone with the noise
+    return (np.sin(2 * np.pi * 220 * t) * np.sin(2 * np.pi * 3 * t) * 0.5
+            + rng.standard_normal(t.shape[0]) * 0.01).astype(np.float32)
+
+
+def test_streaming_vad_matches_whole_audio():
+    vad = StreamingVAD()
+    audio = get_test_audio()
+    num_samples = audio.shape[0] // vad.window_size_samples * vad.window_size_samples
+    expected = vad.vad.model(audio[:num_samples].reshape(1, -1)).squeeze()
+
+    # Frames of the irregular sizes that don't align with the windows of the VAD
+    probs = []
+    position = 0
+    for size in [100, 1000, 333, 5000] * 20:
+        if position >= num_samples:
+            break
+        probs.extend(vad.get_speech_probs(audio[position:min(position + size, num_samples)]))
+        position += size
+
+    np.testing.assert_allclose(np.array(probs), expected, atol=1e-6)
+
+
+def test_streaming_vad_completes_speech_after_silence():
+    vad = StreamingVAD(vad_options=VadOptions(min_silence_duration_ms=300, speech_pad_ms=0))
+    silence = np.zeros(16000, dtype=np.float32)
+    speech = np.concatenate([silence, get_test_audio(2), silence, silence])
+
+    speeches = []
+    for position in range(0, speech.shape[0], 1600):
+        speeches += vad.feed(speech[position:position + 1600])
+    speeches += vad.flush()
+
+    assert speeches
+    assert all(start < end for start, end in speeches)
+    assert speeches[0][0] >= 16000 - vad.window_size_samples
+    assert speeches[-1][1] <= 3 * 16000 + vad.window_size_samples
+
+
+def test_streaming_vad_matches_offline_speeches():
+    options = VadOptions(min_silence_duration_ms=300, speech_pad_ms=0, max_speech_duration_s=1.5)
+    vad = StreamingVAD(vad_options=options)
+    silence = np.zeros(8000, dtype=np.float32)
+    audio = np.concatenate([silence, get_test_audio(2), silence, get_test_audio(3), silence])
+    audio = audio[:audio.shape[0] // vad.window_size_samples * vad.window_size_samples]
+
+    speeches = []
+    for position in range(0, audio.shape[0], 1000):
+        speeches += vad.feed(audio[position:position + 1000])
+    speeches += vad.flush()
+
+    expected = vad.vad.get_speech_timestamps(audio, vad_options=options)
+    assert speeches == [(speech["start"], speech["end"]) for speech in expected]
@@ -90,3 +90,50 @@ def test_transcribe(
     assert wer < 0.1, f"WER is too high, it's {wer}"
 
 
+def test_faster_whisper_batched_transcribe():
+    whisper_inferencer = WhisperFactory.create_whisper_inference(
+        whisper_type=WhisperImpl.FASTER_WHISPER.value,
+    )
+
+    results = {}
+    for batched_inference in [False, True]:
+        params = WhisperParams(
+            model_size=TEST_WHISPER_MODEL,
+            compute_type=whisper_inferencer.current_compute_type,
+            batch_size=8,
+            batched_inference=batched_inference
+        )
+        segments, elapsed_time = whisper_inferencer.transcribe(
+            TEST_FILE_PATH,
+            gr.Progress(),
+            *params.to_list()
+        )
+        results[batched_inference] = segments
+
+    sequential, batched = results[False], results[True]
+    text = " ".join(seg.text.strip() for seg in batched).replace(",", "").replace(".", "")
+    assert calculate_wer(TEST_ANSWER, text) < 0.1
+    assert abs(batched[0].start - sequential[0].start) < 1
+    assert abs(batched[-1].end - sequential[-1].end) < 1
+
+
+@pytest.mark.parametrize("vad_filter", [False, True])
+def test_run_stream(vad_filter: bool):
+    whisper_inferencer = WhisperFactory.create_whisper_inference(
+        whisper_type=WhisperImpl.FASTER_WHISPER.value,
+    )
+    hparams = TranscriptionPipelineParams(
+        whisper=WhisperParams(
+            model_size=TEST_WHISPER_MODEL,
+            compute_type=whisper_inferencer.current_compute_type
+        ),
+        vad=VadParams(
+            vad_filter=vad_filter
+        ),
+    ).to_list()
+
+    segments, elapsed_time = whisper_inferencer.run(TEST_FILE_PATH, gr.Progress(), "SRT", False, *hparams)
+    streamed_segments = list(whisper_inferencer.run_stream(TEST_FILE_PATH, gr.Progress(), "SRT", False, *hparams))
+
+    assert [seg.text for seg in streamed_segments] == [seg.text for seg in segments]
+    assert [seg.start for seg in streamed_segments] == [seg.start for seg in segments]
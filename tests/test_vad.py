@@ -1,9 +1,12 @@
+import io
 import gradio as gr
 import pytest
 import os
+import numpy as np
 
 from modules.whisper.data_classes import *
-from modules.vad.silero_vad import SileroVAD
+from modules.vad.silero_vad import SileroVAD, SpeechDetector
+from modules.vad.chunked_audio import ChunkedAudio
 from test_config import *
 from test_transcription import download_file, test_transcribe
 from faster_whisper.vad import VadOptions, get_speech_timestamps
@@ -56,3 +59,165 @@ def test_vad(
     )
 
     assert speech_chunks
+
+
+def get_speech_audio(seconds: float = 60) -> np.ndarray:
+    """Noise with the modulated tones of the random durations as the speeches"""
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(int(16000 * seconds)) * 0.005).astype(np.float32)
+    position = 0
+    while position < audio.shape[0]:
+        duration, silence = int(rng.uniform(0.2, 12) * 16000), int(rng.uniform(0.05, 3) * 16000)
+        t = np.arange(min(duration, audio.shape[0] - position)) / 16000
+        audio[position:position + t.shape[0]] += (np.sin(2 * np.pi * 220 * t) * np.sin(2 * np.pi * 3 * t) * 0.5 +
+                                                  rng.standard_normal(t.shape[0]) * 0.1).astype(np.float32)
+        position += duration + silence
+    return audio
+
+
+@pytest.mark.parametrize(
+    "vad_options",
+    [
+        VadOptions(),
+        VadOptions(min_silence_duration_ms=160, max_speech_duration_s=5, speech_pad_ms=400),
+    ]
+)
+@pytest.mark.parametrize("block_duration", [0.5, 7.3, 1000])
+def test_chunked_vad_matches_whole_audio(vad_options: VadOptions, block_duration: float):
+    audio = get_speech_audio()
+    vad_model = SileroVAD()
+
+    speech_chunks = list(vad_model.iter_speech_timestamps(audio, vad_options, block_duration=block_duration))
+
+    assert speech_chunks
+    assert speech_chunks == get_speech_timestamps(audio, vad_options)
+
+
+@pytest.mark.parametrize("batch_size", [1, 4, 64])
+def test_batch_vad_matches_file_by_file(batch_size: int):
+    audio = get_speech_audio()
+    rng = np.random.default_rng(0)
+    # Lengths around the window size and the exact multiples of it
+    lengths = [1, 511, 512, 1024, 16000 * 3 + 17, 16000 * 7 + 512 * 3] + rng.integers(16000, 16000 * 20, 10).tolist()
+    audios = [audio[start:start + length] for start, length in zip(rng.integers(0, 16000 * 30, len(lengths)), lengths)]
+    vad_options = VadOptions(min_silence_duration_ms=160, max_speech_duration_s=5, speech_pad_ms=400)
+    vad_model = SileroVAD()
+
+    speech_chunks = vad_model.get_speech_timestamps_batch(audios, vad_options, batch_size=batch_size, num_workers=2)
+
+    assert any(speech_chunks)
+    assert speech_chunks == [vad_model.get_speech_timestamps(audio, vad_options) for audio in audios]
+    assert vad_model.get_speech_timestamps_batch([], vad_options) == []
+
+
+def test_batch_vad_skips_undecodable_files():
+    audio = get_speech_audio()[:16000 * 10]
+    undecodable = io.BytesIO(b"not an audio file")
+    vad_options = VadOptions(min_silence_duration_ms=160)
+    vad_model = SileroVAD()
+
+    speech_chunks = vad_model.get_speech_timestamps_batch([audio, undecodable, audio], vad_options, batch_size=2)
+
+    expected = vad_model.get_speech_timestamps(audio, vad_options)
+    assert expected
+    assert speech_chunks == [expected, None, expected]
+    assert vad_model.get_speech_timestamps_batch([undecodable], vad_options) == [None]
+
+
+def test_vad_keeps_views_of_chunks():
+    audio = get_speech_audio()
+    chunked_audio, speech_chunks = SileroVAD().run(audio, VadOptions(min_silence_duration_ms=500))
+
+    assert len(speech_chunks) > 1
+    assert all(np.shares_memory(view, audio) for view in chunked_audio)
+    np.testing.assert_array_equal(np.asarray(chunked_audio), SileroVAD.collect_chunks(audio, speech_chunks))
+
+
+def test_chunked_audio_slices():
+    audio = np.arange(1000, dtype=np.float32)
+    chunks = [{"start": 10, "end": 200}, {"start": 300, "end": 300},
+              {"start": 350, "end": 700}, {"start": 900, "end": 1000}]
+    chunked_audio = ChunkedAudio(audio, chunks)
+    expected = SileroVAD.collect_chunks(audio, chunks)
+    assert chunked_audio.shape == expected.shape
+
+    rng = np.random.default_rng(0)
+    slices = [(0, None), (None, 5), (-50, None), (190, 200), (550, 540)] + rng.integers(0, 700, (100, 2)).tolist()
+    for start, stop in slices:
+        np.testing.assert_array_equal(chunked_audio[start:stop], expected[start:stop])
+    # Slices within one chunk are not copied
+    assert np.shares_memory(chunked_audio[200:500], audio)
+
+    array = np.asarray(chunked_audio)
+    np.testing.assert_array_equal(array, expected)
+    assert np.asarray(chunked_audio) is array
+
+
+def test_chunked_vad_yields_before_end():
+    class ReadTracker:
+        """Audio that tracks the last sample read by the VAD"""
+        def __init__(self, audio: np.ndarray):
+            self.audio = audio
+            self.max_read = 0
+
+        def __len__(self):
+            return self.audio.shape[0]
+
+        def __getitem__(self, item: slice):
+            self.max_read = max(self.max_read, item.stop)
+            return self.audio[item]
+
+    audio = ReadTracker(get_speech_audio(600))
+    first_chunk = next(SileroVAD().iter_speech_timestamps(audio, block_duration=30))
+
+    assert first_chunk["end"] <= audio.max_read < len(audio) // 2
+
+
+def get_random_speech_probs(rng: np.random.Generator, threshold: float, neg_threshold: float) -> np.ndarray:
+    """Runs of the random probabilities around the thresholds, including the probabilities equal to them"""
+    runs = []
+    while sum(len(run) for run in runs) < 3000:
+        length = int(rng.geometric(rng.choice([0.5, 0.05, 0.005])))
+        kind = rng.integers(5)
+        if kind == 0:
+            run = rng.uniform(0, 1, length)
+        elif kind == 1:
+            run = rng.choice([threshold, neg_threshold, np.nextafter(threshold, 0), np.nextafter(neg_threshold, 0)],
+                             length)
+        else:
+            low, high = [(0, min(threshold, neg_threshold)), (threshold, 1),
+                         (min(threshold, neg_threshold), max(threshold, neg_threshold))][kind - 2]
+            run = rng.uniform(low, high, length)
+        runs.append(run)
+    return np.concatenate(runs).astype(np.float32)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_speech_detector_matches_window_by_window(seed: int):
+    rng = np.random.default_rng(seed)
+    for _ in range(10):
+        threshold = float(rng.choice([0.5, 0.3, float(rng.uniform(0.05, 0.95))]))
+        vad_options = VadOptions(
+            threshold=threshold,
+            # Negative threshold above the threshold makes the windows both speech and silence
+            neg_threshold=rng.choice([None, float(rng.uniform(0.01, 0.99))]),
+            min_speech_duration_ms=int(rng.choice([0, 250, rng.integers(0, 3000)])),
+            max_speech_duration_s=float(rng.choice([float("inf"), 0, rng.uniform(0, 5), rng.uniform(0, 60)])),
+            min_silence_duration_ms=int(rng.choice([0, 100, 2000, rng.integers(0, 5000)])),
+            speech_pad_ms=int(rng.choice([0, 400, rng.integers(0, 2000)])),
+        )
+        expected_detector = SpeechDetector(vad_options)
+        speech_probs = get_random_speech_probs(rng, threshold, expected_detector.neg_threshold)
+        expected = []
+        for i, speech_prob in enumerate(speech_probs):
+            expected_detector.step(i, speech_prob, expected)
+        expected.extend(expected_detector.finish(len(speech_probs) * 512))
+
+        detector = SpeechDetector(vad_options)
+        speeches = []
+        splits = np.sort(rng.integers(0, len(speech_probs), rng.integers(0, 5)))
+        for start, end in zip([0, *splits], [*splits, len(speech_probs)]):
+            speeches.extend(detector.process(speech_probs[start:end], offset=int(start)))
+        speeches.extend(detector.finish(len(speech_probs) * 512))
+
+        assert speeches == expected